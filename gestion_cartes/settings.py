@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,15 +42,25 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Tout en tête : durée, statut et SQL de chaque requête (membres.metriques)
+    'membres.middleware.MetriquesMiddleware',
+    # En premier : minifie et compresse le corps final des réponses
+    'membres.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'membres.middleware.NavigationMiddleware',
+    # Profil cProfile d'une requête à la demande du personnel (PROFILAGE_ACTIF)
+    'membres.middleware.ProfilageMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Minification du HTML rendu par membres.middleware.CompressionMiddleware
+MINIFIER_HTML = True
+
 ROOT_URLCONF = 'gestion_cartes.urls'
 
 TEMPLATES = [
@@ -63,6 +74,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'membres.context_processors.navigation',
+                'membres.context_processors.fizato',
             ],
         },
     },
@@ -82,6 +95,55 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# FIZATO_CACHE_BACKEND choisit le moteur des caches nommés :
+# - 'file' (défaut) : fichiers sous FIZATO_CACHE_DIR, partagés par les processus d'un serveur
+# - 'redis'         : tout serveur parlant le protocole Redis (nécessite le paquet redis),
+#                     pour plusieurs serveurs
+# - 'locmem'        : mémoire locale du processus, pour les tests et un serveur à processus
+#                     unique (les invalidations n'atteignent pas les autres processus)
+
+FIZATO_CACHE_BACKEND = os.environ.get('FIZATO_CACHE_BACKEND', 'file')
+FIZATO_CACHE_DIR = Path(os.environ.get('FIZATO_CACHE_DIR', BASE_DIR / 'cache'))
+FIZATO_REDIS_URL = os.environ.get('FIZATO_REDIS_URL', 'redis://127.0.0.1:6379/1')
+
+
+def _cache(alias, timeout=300):
+    if FIZATO_CACHE_BACKEND == 'redis':
+        config = {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': FIZATO_REDIS_URL,
+        }
+    elif FIZATO_CACHE_BACKEND == 'file':
+        config = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(FIZATO_CACHE_DIR / alias),
+            # Le nettoyage (un tiers des fichiers au-delà de MAX_ENTRIES) évincerait aussi les versions
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    else:
+        config = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'fizato-{alias}',
+        }
+    config['TIMEOUT'] = timeout
+    config['KEY_PREFIX'] = f'fizato:{alias}'
+    return config
+
+
+CACHES = {
+    'default': _cache('default'),
+    # Statistiques calculées (compteurs du tableau de bord, page FIZATO...)
+    'stats': _cache('stats', timeout=600),
+    # Fragments de pages rendus
+    'fragments': _cache('fragments', timeout=3600),
+    # Métadonnées des dérivés d'images (miniatures, dimensions...)
+    'medias': _cache('medias', timeout=24 * 3600),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -118,10 +180,91 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Bootstrap, Popper, Font Awesome et feuilles de style de l'application (plus de CDN)
+STATICFILES_DIRS = [BASE_DIR / 'static']
+
+# collectstatic : noms empreintés + variantes .gz/.br (membres.stockage)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'membres.stockage.StockagePrecompresse'},
+}
 
 # Media files
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Service des fichiers média (membres.views.servir_media)
+# MEDIA_ENVOI_DELEGUE : None (Django envoie le fichier), 'x-sendfile' (Apache, lighttpd)
+# ou 'x-accel-redirect' (nginx, avec un emplacement interne MEDIA_X_ACCEL_PREFIXE -> MEDIA_ROOT)
+MEDIA_ENVOI_DELEGUE = os.environ.get('FIZATO_MEDIA_ENVOI_DELEGUE') or None
+MEDIA_X_ACCEL_PREFIXE = '/media-interne/'
+# Dossiers de MEDIA_ROOT réservés aux utilisateurs connectés
+MEDIA_DOSSIERS_PRIVES = ['photos/']
+# Logo des cartes quand InfoFizato n'a pas de logo (membres.fizato)
+LOGO_FIZATO_DEFAUT = 'logos/fizato/FIZATO.png'
+# Fichiers média utilisés sans référence en base (jamais supprimés par nettoyer_medias)
+MEDIAS_PROTEGES = [
+    LOGO_FIZATO_DEFAUT,
+]
+
+# Durée (secondes) de mise en cache du résultat d'une vérification de carte par QR code
+VERIFICATION_DUREE = 60
+# Adresse publique du site (https://cartes.exemple.org), imprimée dans les QR codes des cartes :
+# à définir hors DEBUG (avertissement membres.W001), sinon l'hôte de la requête d'impression est utilisé
+URL_PUBLIQUE = os.environ.get('FIZATO_URL_PUBLIQUE', '').rstrip('/')
+# Clé HMAC des paquets de vérification hors ligne, partagée avec les lecteurs (dérivée de SECRET_KEY si vide)
+VERIFICATION_CLE_APPAREILS = os.environ.get('VERIFICATION_CLE_APPAREILS', '')
+
+# Flux de changements (membres.journal) : les entrées plus récentes que ce délai (secondes) attendent
+# la page suivante (sous PostgreSQL, ce délai avant la plus ancienne transaction d'écriture ouverte)
+CHANGEMENTS_DELAI_VISIBILITE = 2
+
+# Profilage à la demande (membres.profilage) : ?_profil=1 ou en-tête X-Profil: 1, personnel uniquement
+PROFILAGE_ACTIF = os.environ.get('PROFILAGE_ACTIF', '') == '1'
+PROFILAGE_DOSSIER = Path(os.environ.get('PROFILAGE_DOSSIER', BASE_DIR / 'profils'))
+# Nombre de captures conservées (les plus anciennes sont supprimées)
+PROFILAGE_MAX_FICHIERS = 50
+
+# Métriques Prometheus (membres.metriques) : un fichier mmap par processus dans METRIQUES_DOSSIER
+# (propre à la machine), ceux des processus terminés étant regroupés dans agrege.db. /metrics est ouvert au personnel connecté, aux requêtes portant
+# l'en-tête "Authorization: Bearer <METRIQUES_JETON>" et aux adresses de METRIQUES_IPS_AUTORISEES.
+# Derrière un proxy (nginx), REMOTE_ADDR est l'adresse du proxy : utiliser le jeton, pas la liste.
+METRIQUES_ACTIVES = os.environ.get('METRIQUES_ACTIVES', '1') == '1'
+METRIQUES_DOSSIER = Path(os.environ.get('METRIQUES_DOSSIER', BASE_DIR / 'metriques'))
+METRIQUES_JETON = os.environ.get('METRIQUES_JETON', '')
+METRIQUES_IPS_AUTORISEES = [ip for ip in os.environ.get('METRIQUES_IPS_AUTORISEES', '').split(',') if ip]
+
+# Journal des requêtes SQL lentes (membres.requetes_lentes) : seuil en millisecondes, 0 le désactive
+REQUETES_LENTES_SEUIL_MS = float(os.environ.get('REQUETES_LENTES_SEUIL_MS', '200'))
+
+# Durée de conservation des mots de passe temporaires d'un lot d'identifiants non clôturé (secondes)
+IDENTIFIANTS_DUREE_CONSERVATION = 24 * 3600
+
+# File de tâches (membres.taches), exécutée par `manage.py run_workers --concurrency N`
+# Attente avant la première reprise d'une tâche en échec (doublée à chaque tentative) et plafond, en secondes
+TACHES_DELAI_REPRISE = 30
+TACHES_DELAI_REPRISE_MAX = 3600
+# Une tâche en cours sans avancement signalé depuis ce délai est considérée abandonnée
+TACHES_DELAI_ABANDON = 3600
+# Traitements portant sur au plus ce nombre de lignes (membres, mandats...) : exécutés tout de suite, sans la file
+TACHES_SEUIL_DIRECT = 100
+
+# Mesure mémoire (membres.memoire) des impressions, listes, actions d'administration et commandes
+MEMOIRE_ACTIVE = os.environ.get('MEMOIRE_ACTIVE', '') == '1'
+# Cadres de pile conservés par allocation, nombre de sites d'allocation journalisés
+MEMOIRE_CADRES = 1
+MEMOIRE_NOMBRE_SITES = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Rapports de membres.memoire (niveau INFO)
+        'membres.memoire': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -15,15 +15,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from membres.views import servir_media, liste_profils, detail_profil, metriques_prometheus
 
 urlpatterns = [
+    # Captures du profilage à la demande (membres.profilage), réservées au personnel
+    path('admin/profils/', admin.site.admin_view(liste_profils), name='liste_profils'),
+    path('admin/profils/<str:nom>/', admin.site.admin_view(detail_profil), name='detail_profil'),
     path('admin/', admin.site.urls),
+    # Métriques Prometheus (membres.metriques), personnel ou adresses autorisées
+    path('metrics', metriques_prometheus, name='metriques_prometheus'),
     path('', include('membres.urls')),
+    # Fichiers média (cache, requêtes conditionnelles, Range, X-Sendfile / X-Accel-Redirect)
+    re_path(r'^%s(?P<chemin>.+)$' % settings.MEDIA_URL.lstrip('/'), servir_media, name='servir_media'),
 ]
-
-# Servir les fichiers média en développement
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,11 +1,14 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from .models import Association, Membre, CarteMembre, InfoFizato, FonctionBureau, MembreBureau
-import secrets
-import string
+from django.db.models import Count
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from .models import Association, Membre, CarteMembre, InfoFizato, FonctionBureau, MembreBureau, LotIdentifiants, IdentifiantEmis, Evenement, RequeteLente, Tache
+from .identifiants import creer_lot, appliquer_lot, cloturer_lot, expirer_lots, flux_html, generer_pdf
+from .suppression import masquer_association
+from .taches import file_active, lancer, message_mise_en_file
+from .memoire import mesure_memoire
 
 @admin.register(Association)
 class AssociationAdmin(admin.ModelAdmin):
@@ -28,6 +31,23 @@ class AssociationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         })
     )
+    
+    def delete_model(self, request, obj):
+        # Masquer tout de suite, supprimer membres, cartes et fichiers (en arrière-plan si l'association est grosse)
+        masquer_association(obj)
+        tache, _ = lancer(
+            'suppression.association', obj.id,
+            taille=Membre.objects.filter(association_id=obj.id).count(), cree_par=request.user,
+        )
+        if tache is not None:
+            self.message_user(
+                request, f'Association "{obj.nom}" masquée ; la suppression de ses membres est {message_mise_en_file(tache)}',
+                level=messages.WARNING,
+            )
+    
+    def delete_queryset(self, request, queryset):
+        for association in queryset:
+            self.delete_model(request, association)
 
 # Filtre personnalisé pour les comptes utilisateurs
 class UserAccountFilter(admin.SimpleListFilter):
@@ -52,72 +72,78 @@ class MembreAdmin(admin.ModelAdmin):
     list_filter = ['association', 'filiere', 'created_at', UserAccountFilter]
     search_fields = ['nom', 'prenom', 'numero_cin', 'numero_carte', 'user__username']
     readonly_fields = ['created_at', 'updated_at']
-    actions = ['create_user_accounts', 'print_credentials']
+    actions = ['create_user_accounts', 'print_credentials', 'print_credentials_pdf']
+    
+    def delete_queryset(self, request, queryset):
+        """Suppression en masse par lots SQL (cartes, bureau, photos...), en arrière-plan si la sélection est grosse"""
+        membres_ids = list(queryset.values_list('id', flat=True))
+        tache, _ = lancer('suppression.membres', membres_ids, taille=len(membres_ids), cree_par=request.user)
+        if tache is not None:
+            self.message_user(
+                request, f"La suppression de {len(membres_ids)} membre(s) est {message_mise_en_file(tache)}",
+                level=messages.WARNING,
+            )
     
     def has_user_account(self, obj):
         return obj.user is not None
     has_user_account.boolean = True
     has_user_account.short_description = 'Compte utilisateur'
     
+    @mesure_memoire()
     def create_user_accounts(self, request, queryset):
         """Action pour créer des comptes utilisateur pour les membres sélectionnés"""
-        created_count = 0
-        for membre in queryset:
-            if not membre.user:
-                # Générer un nom d'utilisateur unique
-                username = f"{membre.prenom.lower()}.{membre.nom.lower()}"
-                counter = 1
-                original_username = username
-                while User.objects.filter(username=username).exists():
-                    username = f"{original_username}{counter}"
-                    counter += 1
-                
-                # Générer un mot de passe aléatoire
-                password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(8))
-                
-                # Créer l'utilisateur
-                user = User.objects.create_user(
-                    username=username,
-                    password=password,
-                    first_name=membre.prenom,
-                    last_name=membre.nom,
-                    email=membre.email or ''
-                )
-                
-                # Lier l'utilisateur au membre
-                membre.user = user
-                membre.save()
-                created_count += 1
+        membres_ids = list(queryset.filter(user__isnull=True).values_list('id', flat=True))
+        
+        # Pour les grosses sélections, la création se fait en arrière-plan
+        tache, resultat = lancer('comptes.creation', membres_ids, taille=len(membres_ids), cree_par=request.user)
+        if tache is not None:
+            self.message_user(
+                request, f"La création de {len(membres_ids)} compte(s) utilisateur est {message_mise_en_file(tache)}",
+                level=messages.WARNING,
+            )
+            return
         
-        self.message_user(request, f"{created_count} compte(s) utilisateur créé(s).")
+        self.message_user(request, f"{resultat['comptes']} compte(s) utilisateur créé(s).")
     create_user_accounts.short_description = "Créer des comptes utilisateur"
     
+    @mesure_memoire()
     def print_credentials(self, request, queryset):
         """Action pour imprimer les identifiants des membres sélectionnés"""
-        membres_with_users = queryset.filter(user__isnull=False)
-        
-        # Générer les mots de passe temporaires pour l'impression
-        credentials_data = []
-        for membre in membres_with_users:
-            # Générer un nouveau mot de passe temporaire
-            temp_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(8))
-            membre.user.set_password(temp_password)
-            membre.user.save()
-            
-            credentials_data.append({
-                'membre': membre,
-                'username': membre.user.username,
-                'password': temp_password
-            })
+        lot = self._emettre_lot(request, queryset)
+        if lot is None:
+            return None
         
-        # Rendre le template d'impression
-        html_content = render_to_string('admin/print_credentials.html', {
-            'credentials_data': credentials_data
-        })
+        # La feuille est rendue page par page pendant l'envoi
+        return StreamingHttpResponse(flux_html(lot), content_type='text/html')
+    print_credentials.short_description = "Imprimer les identifiants"
+    
+    @mesure_memoire()
+    def print_credentials_pdf(self, request, queryset):
+        """Action pour imprimer les identifiants des membres sélectionnés au format PDF"""
+        lot = self._emettre_lot(request, queryset)
+        if lot is None:
+            return None
         
-        response = HttpResponse(html_content, content_type='text/html')
+        response = HttpResponse(content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="identifiants_lot_{lot.id}.pdf"'
+        generer_pdf(lot, response)
         return response
-    print_credentials.short_description = "Imprimer les identifiants"
+    print_credentials_pdf.short_description = "Imprimer les identifiants (PDF)"
+    
+    def _emettre_lot(self, request, queryset):
+        """Tire et applique les mots de passe temporaires dans un nouveau lot"""
+        membres_ids = queryset.filter(user__isnull=False).values_list('id', flat=True)
+        lot = creer_lot(membres_ids, cree_par=request.user)
+        try:
+            appliquer_lot(lot)
+        except Exception as e:
+            self.message_user(
+                request,
+                f"Échec du lot d'identifiants n°{lot.id} : {e}. Il peut être repris depuis les lots d'identifiants.",
+                level=messages.ERROR,
+            )
+            return None
+        return lot
     
     fieldsets = (
         ('Informations personnelles', {
@@ -205,6 +231,10 @@ class InfoFizatoAdmin(admin.ModelAdmin):
         })
     )
 
+    def has_add_permission(self, request):
+        # Une seule fiche FIZATO : on ne peut que modifier celle qui existe
+        return super().has_add_permission(request) and not InfoFizato.objects.exists()
+
 
 @admin.register(FonctionBureau)
 class FonctionBureauAdmin(admin.ModelAdmin):
@@ -232,7 +262,169 @@ class MembreBureauAdmin(admin.ModelAdmin):
     )
 
 
+class IdentifiantEmisInline(admin.TabularInline):
+    model = IdentifiantEmis
+    extra = 0
+    can_delete = False
+    fields = ['membre', 'username', 'est_applique']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LotIdentifiants)
+class LotIdentifiantsAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'cree_par', 'statut', 'nombre_identifiants', 'date_creation', 'date_fin', 'date_cloture']
+    list_filter = ['statut', 'date_creation']
+    readonly_fields = ['cree_par', 'statut', 'erreur', 'date_creation', 'date_fin', 'date_cloture']
+    inlines = [IdentifiantEmisInline]
+    actions = ['reprendre_lots', 'reimprimer_lot', 'reimprimer_lot_pdf', 'cloturer_lots']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(nb_identifiants=Count('identifiants'))
+    
+    def nombre_identifiants(self, obj):
+        return obj.nb_identifiants
+    nombre_identifiants.short_description = 'Identifiants'
+    nombre_identifiants.admin_order_field = 'nb_identifiants'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @mesure_memoire()
+    def reprendre_lots(self, request, queryset):
+        """Reprendre les lots en échec (les mots de passe déjà tirés sont conservés)"""
+        repris = 0
+        # Les lots expirés sont inclus : appliquer_lot les refuse avec un message explicite
+        for lot in queryset.exclude(statut=LotIdentifiants.STATUT_TERMINE):
+            try:
+                appliquer_lot(lot)
+                repris += 1
+            except Exception as e:
+                self.message_user(request, f"Le lot n°{lot.id} a de nouveau échoué : {e}", level=messages.ERROR)
+        self.message_user(request, f"{repris} lot(s) repris.")
+    reprendre_lots.short_description = "Reprendre les lots en échec"
+    
+    def _lot_imprimable(self, request, queryset):
+        expirer_lots()
+        lot = queryset.first()
+        if queryset.count() != 1 or lot.statut != LotIdentifiants.STATUT_TERMINE or lot.date_cloture:
+            self.message_user(request, "Sélectionnez un seul lot terminé et non clôturé.", level=messages.WARNING)
+            return None
+        return lot
+    
+    @mesure_memoire()
+    def reimprimer_lot(self, request, queryset):
+        lot = self._lot_imprimable(request, queryset)
+        if lot is None:
+            return None
+        return StreamingHttpResponse(flux_html(lot), content_type='text/html')
+    reimprimer_lot.short_description = "Réimprimer le lot"
+    
+    @mesure_memoire()
+    def reimprimer_lot_pdf(self, request, queryset):
+        lot = self._lot_imprimable(request, queryset)
+        if lot is None:
+            return None
+        response = HttpResponse(content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="identifiants_lot_{lot.id}.pdf"'
+        generer_pdf(lot, response)
+        return response
+    reimprimer_lot_pdf.short_description = "Réimprimer le lot (PDF)"
+    
+    @mesure_memoire()
+    def cloturer_lots(self, request, queryset):
+        """Effacer les mots de passe temporaires des lots distribués"""
+        for lot in queryset:
+            cloturer_lot(lot)
+        self.message_user(request, f"{queryset.count()} lot(s) clôturé(s).")
+    cloturer_lots.short_description = "Clôturer (effacer les mots de passe temporaires)"
+
+
 # Personnalisation du site admin
 admin.site.site_header = "Administration FIZATO"
 admin.site.site_title = "FIZATO Admin"
 admin.site.index_title = "Gestion des Cartes Membres"
+
+
+@admin.register(Evenement)
+class EvenementAdmin(admin.ModelAdmin):
+    list_display = ['nom', 'date', 'lieu', 'nombre_presents', 'nombre_scans', 'nombre_refuses']
+    search_fields = ['nom', 'lieu']
+    list_filter = ['date']
+    readonly_fields = ['nombre_presents', 'nombre_scans', 'nombre_refuses', 'created_at', 'updated_at']
+
+
+@admin.register(RequeteLente)
+class RequeteLenteAdmin(admin.ModelAdmin):
+    list_display = ['sql_court', 'nombre', 'duree_moyenne', 'duree_max', 'emplacement', 'derniere_date']
+    search_fields = ['sql', 'emplacement']
+    list_filter = ['derniere_date']
+    readonly_fields = [
+        'empreinte', 'sql', 'exemple', 'parametres', 'emplacement', 'plan',
+        'nombre', 'duree_totale', 'duree_max', 'premiere_date', 'derniere_date',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    def sql_court(self, obj):
+        return obj.sql[:120]
+    sql_court.short_description = 'Requête'
+
+    def duree_moyenne(self, obj):
+        return round(obj.duree_totale / obj.nombre, 1) if obj.nombre else None
+    duree_moyenne.short_description = 'Durée moyenne (ms)'
+
+
+@admin.register(Tache)
+class TacheAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'statut', 'progression', 'tentatives', 'travailleur', 'cree_par', 'date_creation', 'date_fin']
+    list_filter = ['statut', 'nom', 'date_creation']
+    search_fields = ['nom', 'message', 'erreur']
+    readonly_fields = [
+        'nom', 'arguments', 'statut', 'tentatives', 'tentatives_max', 'executer_apres', 'travailleur',
+        'avancement', 'avancement_total', 'message', 'resultat', 'erreur', 'cree_par',
+        'date_creation', 'date_debut', 'date_signal', 'date_fin',
+    ]
+    actions = ['relancer_taches', 'annuler_taches']
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        # Signaler ce qui attend un travailleur ou une intervention
+        etat = file_active(limite=0)
+        if etat['file_en_retard']:
+            self.message_user(
+                request, "Des tâches attendent depuis plus de 5 minutes : aucun travailleur (manage.py run_workers) ne traite la file.",
+                level=messages.WARNING,
+            )
+        if etat['taches_echouees']:
+            self.message_user(
+                request, f"{etat['taches_echouees']} tâche(s) en échec : voir le filtre « Échouée », puis les relancer.",
+                level=messages.ERROR,
+            )
+        return super().changelist_view(request, extra_context)
+
+    def progression(self, obj):
+        return obj.progression()
+    progression.short_description = 'Avancement'
+
+    def relancer_taches(self, request, queryset):
+        """Remettre en file les tâches échouées ou annulées (nouvelle série de tentatives)"""
+        nombre = queryset.filter(statut__in=[Tache.STATUT_ECHOUEE, Tache.STATUT_ANNULEE]).update(
+            statut=Tache.STATUT_EN_ATTENTE, tentatives=0, executer_apres=timezone.now(),
+            travailleur='', erreur='', date_fin=None,
+        )
+        self.message_user(request, f"{nombre} tâche(s) remise(s) en file.")
+    relancer_taches.short_description = "Relancer les tâches échouées ou annulées"
+
+    def annuler_taches(self, request, queryset):
+        """Annuler les tâches qui n'ont pas encore démarré"""
+        nombre = queryset.filter(statut=Tache.STATUT_EN_ATTENTE).update(
+            statut=Tache.STATUT_ANNULEE, date_fin=timezone.now(),
+        )
+        self.message_user(request, f"{nombre} tâche(s) annulée(s).")
+    annuler_taches.short_description = "Annuler les tâches en attente"
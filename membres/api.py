@@ -0,0 +1,226 @@
+"""
+API JSON en lecture (version 1) : associations, membres, cartes, mandats,
+bureau et comité des doyens.
+
+Chaque ressource déclare ses champs publiés et le chemin ORM de chacun.
+Le paramètre ?fields= choisit les champs renvoyés ; la requête ne lit que
+leurs colonnes (projection values()) et ne joint que les tables qu'ils
+traversent (association__nom ajoute la jointure vers l'association, les
+autres champs n'en demandent aucune).
+
+Les données personnelles des membres (date de naissance, e-mail,
+téléphone, adresse) ne sont servies qu'aux administrateurs, comme dans les
+pages HTML : les demander sans ce droit renvoie 403. Il en va de même du
+numéro unique des cartes, qui suffit à fabriquer un QR code accepté par
+les lecteurs hors ligne (hors_ligne.py).
+
+La pagination se fait par clé (?apres=<id>, tri par identifiant) : une
+page coûte une seule requête, quelle que soit sa taille ou sa position, et
+il n'y a jamais de COUNT. L'ETag d'une page dépend du dernier curseur du
+journal des modifications (journal.py), lu sur l'index de sa clé primaire :
+une requête conditionnelle qui aboutit à 304 ne lit aucune page.
+"""
+import hashlib
+
+from django.db.models import Max
+
+from .models import Association, Membre, CarteMembre, Mandat, MembreBureau, ComiteDoyen, Changement
+
+VERSION = 'v1'
+LIMITE_DEFAUT = 50
+LIMITE_MAXIMALE = 500
+
+
+class RequeteInvalide(Exception):
+    """Paramètre de requête invalide (réponse 400)"""
+
+
+class AccesRefuse(Exception):
+    """Champs réservés aux administrateurs demandés par un autre utilisateur (réponse 403)"""
+
+
+class Ressource:
+    """Ressource publiée : queryset de base, champs (nom publié -> chemin ORM) et filtres"""
+
+    def __init__(self, queryset, champs, defaut, filtres=None, fichiers=(), prives=()):
+        self.queryset = queryset
+        self.champs = champs
+        self.defaut = defaut
+        self.filtres = filtres or {}
+        self.fichiers = set(fichiers)
+        # Données personnelles et numéros uniques des cartes : réservés aux administrateurs
+        self.prives = set(prives)
+
+    def champs_demandes(self, parametre, personnel=False):
+        if not parametre:
+            return self.defaut
+        noms = [nom.strip() for nom in parametre.split(',') if nom.strip()]
+        inconnus = [nom for nom in noms if nom not in self.champs]
+        if inconnus:
+            raise RequeteInvalide(f"Champs inconnus : {', '.join(inconnus)}")
+        refuses = [nom for nom in noms if nom in self.prives]
+        if refuses and not personnel:
+            raise AccesRefuse(f"Champs réservés aux administrateurs : {', '.join(refuses)}")
+        # L'identifiant est toujours renvoyé : il sert de curseur
+        return ['id'] + [nom for nom in dict.fromkeys(noms) if nom != 'id']
+
+    def filtrer(self, queryset, parametres):
+        for parametre, (chemin, conversion) in self.filtres.items():
+            valeur = parametres.get(parametre)
+            if valeur is None:
+                continue
+            try:
+                queryset = queryset.filter(**{chemin: conversion(valeur)})
+            except ValueError:
+                raise RequeteInvalide(f"Valeur invalide pour {parametre} : {valeur!r}")
+        return queryset
+
+    def modele(self):
+        return self.queryset.model
+
+
+def _booleen(valeur):
+    if valeur.lower() in ('1', 'true', 'oui'):
+        return True
+    if valeur.lower() in ('0', 'false', 'non'):
+        return False
+    raise ValueError(valeur)
+
+
+RESSOURCES = {
+    'associations': Ressource(
+        Association.objects.all(),
+        {
+            'id': 'id', 'nom': 'nom', 'devise': 'devise', 'description': 'description',
+            'date_creation': 'date_creation', 'logo_association': 'logo_association',
+            'logo_universite': 'logo_universite', 'updated_at': 'updated_at',
+        },
+        defaut=['id', 'nom', 'devise', 'date_creation'],
+        fichiers=['logo_association', 'logo_universite'],
+    ),
+    'membres': Ressource(
+        Membre.actifs.all(),
+        {
+            'id': 'id', 'nom': 'nom', 'prenom': 'prenom', 'numero_carte': 'numero_carte',
+            'filiere': 'filiere', 'parcours': 'parcours', 'etablissement': 'etablissement',
+            'date_naissance': 'date_naissance', 'email': 'email', 'telephone': 'telephone',
+            'adresse': 'adresse', 'photo': 'photo', 'updated_at': 'updated_at',
+            'association': 'association_id', 'association_nom': 'association__nom',
+            'carte': 'carte__numero_unique',
+        },
+        defaut=['id', 'nom', 'prenom', 'numero_carte', 'association', 'association_nom'],
+        filtres={'association': ('association_id', int)},
+        fichiers=['photo'],
+        prives=['date_naissance', 'email', 'telephone', 'adresse', 'carte'],
+    ),
+    'cartes': Ressource(
+        CarteMembre.objects.filter(membre__association__est_supprimee=False),
+        {
+            'id': 'id', 'numero_unique': 'numero_unique', 'date_generation': 'date_generation',
+            'est_imprimee': 'est_imprimee', 'date_impression': 'date_impression',
+            'membre': 'membre_id', 'membre_nom': 'membre__nom', 'membre_prenom': 'membre__prenom',
+            'numero_carte': 'membre__numero_carte', 'association': 'membre__association_id',
+            'association_nom': 'membre__association__nom',
+        },
+        defaut=['id', 'membre', 'numero_carte', 'est_imprimee'],
+        filtres={'association': ('membre__association_id', int), 'imprimee': ('est_imprimee', _booleen)},
+        prives=['numero_unique'],
+    ),
+    'mandats': Ressource(
+        Mandat.objects.all(),
+        {
+            'id': 'id', 'nom': 'nom', 'date_debut': 'date_debut', 'date_fin': 'date_fin',
+            'est_actuel': 'est_actuel', 'description': 'description', 'updated_at': 'updated_at',
+        },
+        defaut=['id', 'nom', 'date_debut', 'date_fin', 'est_actuel'],
+        filtres={'actuel': ('est_actuel', _booleen)},
+    ),
+    'bureau': Ressource(
+        MembreBureau.objects.all(),
+        {
+            'id': 'id', 'date_debut': 'date_debut', 'date_fin': 'date_fin', 'est_actuel': 'est_actuel',
+            'membre': 'membre_id', 'membre_nom': 'membre__nom', 'membre_prenom': 'membre__prenom',
+            'fonction': 'fonction_id', 'fonction_nom': 'fonction__nom',
+            'niveau_hierarchique': 'fonction__niveau_hierarchique',
+            'mandat': 'mandat_id', 'mandat_nom': 'mandat__nom', 'updated_at': 'updated_at',
+        },
+        defaut=['id', 'membre', 'membre_nom', 'membre_prenom', 'fonction_nom', 'est_actuel'],
+        filtres={'actuel': ('est_actuel', _booleen), 'mandat': ('mandat_id', int)},
+    ),
+    'doyens': Ressource(
+        ComiteDoyen.objects.all(),
+        {
+            'id': 'id', 'titre': 'titre', 'date_nomination': 'date_nomination', 'date_fin': 'date_fin',
+            'est_actif': 'est_actif', 'ordre_affichage': 'ordre_affichage',
+            'membre': 'membre_id', 'membre_nom': 'membre__nom', 'membre_prenom': 'membre__prenom',
+            'mandat': 'mandat_id', 'updated_at': 'updated_at',
+        },
+        defaut=['id', 'membre', 'membre_nom', 'membre_prenom', 'titre', 'est_actif'],
+        filtres={'actif': ('est_actif', _booleen), 'mandat': ('mandat_id', int)},
+    ),
+}
+
+
+def version_donnees():
+    """Dernier curseur du journal des modifications : change à chaque écriture suivie"""
+    return Changement.objects.aggregate(dernier=Max('id'))['dernier'] or 0
+
+
+def etag_requete(request, ressource, pk=None):
+    """
+    ETag d'une réponse : version des données, paramètres de la requête et
+    utilisateur (les champs servis dépendent de ses droits). Une requête indexée.
+    """
+    if ressource not in RESSOURCES:
+        return None
+    utilisateur = (request.user.pk, request.user.is_staff, request.user.is_superuser)
+    empreinte = repr((VERSION, ressource, pk, version_donnees(), utilisateur, sorted(request.GET.lists())))
+    return hashlib.md5(empreinte.encode('utf-8')).hexdigest()
+
+
+def _entier(parametres, nom, defaut):
+    try:
+        return int(parametres.get(nom, defaut))
+    except ValueError:
+        raise RequeteInvalide(f"{nom} doit être un entier.")
+
+
+def _lignes(ressource, queryset, noms):
+    chemins = [ressource.champs[nom] for nom in noms]
+    stockages = {
+        nom: ressource.modele()._meta.get_field(ressource.champs[nom]).storage
+        for nom in noms if nom in ressource.fichiers
+    }
+    for ligne in queryset.values_list(*chemins):
+        objet = dict(zip(noms, ligne))
+        for nom, stockage in stockages.items():
+            objet[nom] = stockage.url(objet[nom]) if objet[nom] else ''
+        yield objet
+
+
+def lire_page(nom_ressource, parametres, personnel=False):
+    """
+    Page de la ressource `nom_ressource` selon les paramètres GET :
+    fields, apres (curseur), limite et les filtres propres à la ressource.
+    Les champs privés ne sont servis qu'au `personnel` (AccesRefuse sinon).
+    Retourne {'resultats': [...], 'suivant': curseur ou None}.
+    """
+    ressource = RESSOURCES[nom_ressource]
+    noms = ressource.champs_demandes(parametres.get('fields'), personnel)
+    apres = _entier(parametres, 'apres', 0)
+    limite = max(1, min(_entier(parametres, 'limite', LIMITE_DEFAUT), LIMITE_MAXIMALE))
+
+    queryset = ressource.filtrer(ressource.queryset, parametres).filter(pk__gt=apres).order_by('pk')
+    resultats = list(_lignes(ressource, queryset[:limite + 1], noms))
+    suivant = None
+    if len(resultats) > limite:
+        resultats = resultats[:limite]
+        suivant = resultats[-1]['id']
+    return {'resultats': resultats, 'suivant': suivant}
+
+
+def lire_objet(nom_ressource, pk, parametres, personnel=False):
+    """Un objet de la ressource (champs choisis par fields), None s'il n'existe pas"""
+    ressource = RESSOURCES[nom_ressource]
+    noms = ressource.champs_demandes(parametres.get('fields'), personnel)
+    return next(_lignes(ressource, ressource.queryset.filter(pk=pk), noms), None)
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class MembresConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'membres'
+
+    def ready(self):
+        # Connexion des signaux (invalidation des caches)
+        from . import signals  # noqa: F401
+        # Vérifications de configuration (manage.py check)
+        from . import checks  # noqa: F401
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+
+        from . import requetes_lentes
+
+        # Journal des requêtes SQL lentes, enregistré en fin de requête HTTP
+        connection_created.connect(requetes_lentes.installer)
+        request_finished.connect(requetes_lentes.enregistrer)
@@ -0,0 +1,204 @@
+"""
+Couche de cache de l'application membres.
+
+Trois caches nommés sont déclarés dans CACHES (voir settings) :
+- 'stats'     : statistiques calculées (compteurs du tableau de bord, FIZATO...)
+- 'fragments' : fragments de pages déjà rendus
+- 'medias'    : métadonnées des dérivés d'images (miniatures, dimensions...)
+
+Les clés sont versionnées par espace de noms : invalider un espace revient à
+incrémenter sa version, les anciennes entrées expirent d'elles-mêmes.
+La version vit dans le cache lui-même : elle n'est partagée entre les
+processus qu'avec un moteur partagé (fichiers ou Redis, voir settings).
+Une version évincée est recréée à partir de l'horloge, jamais à 1 : elle
+dépasse toutes celles déjà servies et aucune entrée périmée ne redevient
+valide.
+Le recalcul d'une valeur absente est protégé contre l'effet de meute :
+un seul processus la recalcule pendant que les autres attendent le résultat.
+
+Le verrou de recalcul (add) et le changement de version (incr) reposent sur
+des opérations atomiques avec Redis ou memcached. Le moteur fichier de
+Django les exécute en lecture puis écriture : ils sont alors faits sous un
+verrou de fichier (flock, voir _exclusif). Sans flock (Windows) ou avec un
+autre moteur non atomique (base de données), deux processus peuvent
+calculer la même valeur et une invalidation concurrente peut être perdue.
+"""
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.backends.filebased import FileBasedCache
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou de fichier (voir plus haut)
+    fcntl = None
+
+from . import instrumentation
+
+CACHE_STATS = 'stats'
+CACHE_FRAGMENTS = 'fragments'
+CACHE_MEDIAS = 'medias'
+
+# Durée de vie par défaut des entrées et du verrou de recalcul (secondes)
+DUREE_DEFAUT = 300
+DUREE_VERROU = 30
+# Attente maximale d'un calcul mené par un autre processus
+ATTENTE_MAX = 5.0
+INTERVALLE_ATTENTE = 0.05
+# Fichiers de verrou du moteur fichier : les clés se répartissent sur ce nombre de fichiers
+NOMBRE_VERROUS = 64
+
+_ABSENT = object()
+
+
+def get_cache(nom):
+    """Retourne le cache nommé, ou le cache par défaut s'il n'est pas configuré"""
+    try:
+        return caches[nom]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+@contextmanager
+def _exclusif(cache, cle_verrou):
+    """
+    Section critique entre processus autour d'un add ou d'un incr du moteur
+    fichier (dossier verrous/ du cache, jamais nettoyé par le moteur) ;
+    sans effet pour les autres moteurs.
+    """
+    if fcntl is None or not isinstance(cache, FileBasedCache):
+        yield
+        return
+    numero = int(hashlib.md5(cle_verrou.encode('utf-8')).hexdigest(), 16) % NOMBRE_VERROUS
+    dossier = os.path.join(cache._dir, 'verrous')
+    os.makedirs(dossier, exist_ok=True)
+    with open(os.path.join(dossier, f'{numero:02d}.lock'), 'a') as fichier:
+        fcntl.flock(fichier, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fichier, fcntl.LOCK_UN)
+
+
+def _cle_version(espace):
+    return f'version:{espace}'
+
+
+def _version_initiale():
+    # Microsecondes : une incrémentation par microseconde ne sera jamais atteinte
+    return time.time_ns() // 1000
+
+
+def version(nom_cache, espace):
+    """Version courante de l'espace de noms `espace` dans le cache `nom_cache`"""
+    cache = get_cache(nom_cache)
+    valeur = cache.get(_cle_version(espace))
+    if valeur is None:
+        # add() évite d'écraser une version posée entre-temps par un autre processus
+        with _exclusif(cache, _cle_version(espace)):
+            cache.add(_cle_version(espace), _version_initiale(), timeout=None)
+        valeur = cache.get(_cle_version(espace))
+        if valeur is None:
+            # Évincée aussitôt (cache plein) : une version neuve reste sûre pour cet appel
+            valeur = _version_initiale()
+    return valeur
+
+
+def invalider(nom_cache, espace):
+    """Invalide toutes les entrées d'un espace de noms en changeant sa version"""
+    cache = get_cache(nom_cache)
+    with _exclusif(cache, _cle_version(espace)):
+        try:
+            cache.incr(_cle_version(espace))
+        except ValueError:
+            # Version absente : en poser une plus récente que toutes les précédentes
+            if not cache.add(_cle_version(espace), _version_initiale(), timeout=None):
+                cache.incr(_cle_version(espace))
+    instrumentation.incrementer(f'cache.{nom_cache}.invalidations')
+
+
+def cle(nom_cache, espace, *parties):
+    """Construit une clé versionnée : espace:v<version>:partie1:partie2..."""
+    suffixe = ':'.join(str(partie) for partie in parties)
+    return f'{espace}:v{version(nom_cache, espace)}:{suffixe}'
+
+
+def lire(nom_cache, espace, *parties, defaut=None):
+    """Lecture simple d'une entrée versionnée, avec comptage hit/miss"""
+    cache = get_cache(nom_cache)
+    valeur = cache.get(cle(nom_cache, espace, *parties), _ABSENT)
+    if valeur is _ABSENT:
+        instrumentation.incrementer(f'cache.{nom_cache}.misses')
+        return defaut
+    instrumentation.incrementer(f'cache.{nom_cache}.hits')
+    return valeur
+
+
+def ecrire(nom_cache, espace, *parties, valeur, duree=DUREE_DEFAUT):
+    """Écriture d'une entrée versionnée"""
+    get_cache(nom_cache).set(cle(nom_cache, espace, *parties), valeur, timeout=duree)
+
+
+def obtenir_ou_calculer(nom_cache, espace, parties, calcul, duree=DUREE_DEFAUT):
+    """
+    Retourne la valeur en cache ou la calcule avec `calcul()`.
+
+    Un seul appelant à la fois recalcule une clé absente (verrou posé avec
+    cache.add, sous _exclusif pour le moteur fichier) ; les autres attendent
+    que la valeur apparaisse, puis la calculent eux-mêmes si l'attente
+    dépasse ATTENTE_MAX.
+    """
+    cache = get_cache(nom_cache)
+    cle_valeur = cle(nom_cache, espace, *parties)
+
+    valeur = cache.get(cle_valeur, _ABSENT)
+    if valeur is not _ABSENT:
+        instrumentation.incrementer(f'cache.{nom_cache}.hits')
+        return valeur
+    instrumentation.incrementer(f'cache.{nom_cache}.misses')
+
+    cle_verrou = f'verrou:{cle_valeur}'
+    with _exclusif(cache, cle_verrou):
+        obtenu = cache.add(cle_verrou, 1, timeout=DUREE_VERROU)
+    if obtenu:
+        try:
+            valeur = calcul()
+            cache.set(cle_valeur, valeur, timeout=duree)
+            return valeur
+        finally:
+            cache.delete(cle_verrou)
+
+    # Un autre processus calcule déjà cette valeur : attendre son résultat
+    limite = time.monotonic() + ATTENTE_MAX
+    while time.monotonic() < limite:
+        time.sleep(INTERVALLE_ATTENTE)
+        valeur = cache.get(cle_valeur, _ABSENT)
+        if valeur is not _ABSENT:
+            instrumentation.incrementer(f'cache.{nom_cache}.attentes')
+            return valeur
+
+    instrumentation.incrementer(f'cache.{nom_cache}.attentes_expirees')
+    valeur = calcul()
+    cache.set(cle_valeur, valeur, timeout=duree)
+    return valeur
+
+
+def statistiques():
+    """Compteurs hit/miss par cache nommé, pour le processus courant"""
+    resultat = {}
+    for nom in getattr(settings, 'CACHES', {}):
+        hits = instrumentation.lire(f'cache.{nom}.hits')
+        misses = instrumentation.lire(f'cache.{nom}.misses')
+        total = hits + misses
+        resultat[nom] = {
+            'hits': hits,
+            'misses': misses,
+            'invalidations': instrumentation.lire(f'cache.{nom}.invalidations'),
+            'taux_hit': round(hits / total, 3) if total else None,
+        }
+    return resultat
@@ -0,0 +1,24 @@
+"""
+Vérifications de configuration exécutées au démarrage (manage.py check,
+runserver, migrate...).
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.security)
+def verifier_url_publique(app_configs, **kwargs):
+    """
+    Hors DEBUG, URL_PUBLIQUE doit être définie : sans elle, les QR codes des
+    cartes encodent l'hôte de la requête d'impression (proxy interne...)
+    et restent faux une fois imprimés.
+    """
+    if settings.DEBUG or getattr(settings, 'URL_PUBLIQUE', ''):
+        return []
+    return [
+        Warning(
+            "URL_PUBLIQUE n'est pas définie : les QR codes des cartes utiliseront l'hôte de la requête d'impression.",
+            hint="Définir FIZATO_URL_PUBLIQUE (https://cartes.exemple.org).",
+            id='membres.W001',
+        )
+    ]
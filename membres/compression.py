@@ -0,0 +1,97 @@
+"""
+Minification du HTML rendu et compression des réponses (gzip / brotli).
+
+La minification ne touche qu'au texte entre les balises : les blocs <pre>,
+<textarea>, <script> et <style> sont recopiés tels quels, comme le contenu
+des balises elles-mêmes (attributs compris). Les espaces consécutifs sont
+ramenés à un seul caractère, ce qui ne change pas le rendu du navigateur.
+"""
+import re
+
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # Optionnel : sans brotli, seul gzip est proposé
+    brotli = None
+
+# Blocs dont le contenu est significatif caractère par caractère
+BLOC_PRESERVE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# Commentaires HTML, sauf commentaires conditionnels (<!--[if IE]>)
+COMMENTAIRE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+BALISE = re.compile(r'(<[^>]*>)')
+ESPACES = re.compile(r'\s+')
+
+TYPES_COMPRESSIBLES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Octets aléatoires ajoutés à l'en-tête gzip contre BREACH, comme GZipMiddleware
+OCTETS_ALEATOIRES = 100
+
+
+def _reduire_espaces(correspondance):
+    return '\n' if '\n' in correspondance.group() else ' '
+
+
+def _minifier_texte(segment):
+    segment = COMMENTAIRE.sub('', segment)
+    morceaux = BALISE.split(segment)
+    # Indices pairs : texte entre les balises ; impairs : balises, recopiées
+    for i in range(0, len(morceaux), 2):
+        morceaux[i] = ESPACES.sub(_reduire_espaces, morceaux[i])
+    return ''.join(morceaux)
+
+
+def minifier_html(html):
+    """Retire commentaires et espaces superflus d'un document HTML"""
+    morceaux = BLOC_PRESERVE.split(html)
+    resultat = []
+    # split() avec deux groupes : texte, bloc préservé, nom de balise, texte...
+    for i in range(0, len(morceaux), 3):
+        resultat.append(_minifier_texte(morceaux[i]))
+        if i + 1 < len(morceaux):
+            resultat.append(morceaux[i + 1])
+    return ''.join(resultat)
+
+
+def _qualites(accept_encoding):
+    """{'br': 1.0, 'gzip': 0.8, ...} à partir d'un en-tête Accept-Encoding"""
+    qualites = {}
+    for element in accept_encoding.split(','):
+        nom, _, parametres = element.strip().partition(';')
+        nom = nom.strip().lower()
+        if not nom:
+            continue
+        qualite = 1.0
+        parametre = parametres.strip()
+        if parametre.startswith('q='):
+            try:
+                qualite = float(parametre[2:])
+            except ValueError:
+                qualite = 0.0
+        qualites[nom] = qualite
+    return qualites
+
+
+def choisir_encodage(accept_encoding):
+    """Encodage à utiliser ('br', 'gzip') selon Accept-Encoding, None si aucun n'est accepté"""
+    qualites = _qualites(accept_encoding or '')
+    joker = qualites.get('*', 0.0)
+    candidats = (['br'] if brotli is not None else []) + ['gzip']
+    meilleur, meilleure_qualite = None, 0.0
+    for encodage in candidats:
+        qualite = qualites.get(encodage, joker)
+        # À qualité égale, l'ordre des candidats (brotli d'abord) l'emporte
+        if qualite > meilleure_qualite:
+            meilleur, meilleure_qualite = encodage, qualite
+    return meilleur
+
+
+def type_compressible(content_type):
+    return (content_type or '').split(';')[0].strip().lower().startswith(TYPES_COMPRESSIBLES)
+
+
+def compresser(contenu, encodage):
+    """Contenu compressé avec `encodage` ('br' ou 'gzip')"""
+    if encodage == 'br':
+        # Qualité 5 : bon compromis taux / temps pour une compression à la volée
+        return brotli.compress(contenu, quality=5)
+    return compress_string(contenu, max_random_bytes=OCTETS_ALEATOIRES)
@@ -0,0 +1,145 @@
+"""
+Création des comptes utilisateur des membres par lots.
+
+Les noms d'utilisateur de tout le lot sont résolus avec une seule requête
+par préfixe, les mots de passe sont hachés dans un pool de processus et les
+comptes sont insérés avec bulk_create puis liés aux membres par un seul
+bulk_update.
+"""
+import multiprocessing
+import os
+import secrets
+import string
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from operator import or_
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .journal import MODIFICATION, journaliser
+from .models import Membre
+
+# En dessous de ce nombre de mots de passe, le pool de processus coûte plus qu'il ne rapporte
+# (chaque processus démarré par spawn réimporte Django, soit environ une seconde)
+SEUIL_POOL = 64
+# Nombre maximal de préfixes par requête (limite de profondeur des expressions SQLite)
+PREFIXES_PAR_REQUETE = 200
+TAILLE_LOT = 500
+TENTATIVES = 3
+
+
+def generer_mot_de_passe(longueur=8):
+    """Mot de passe aléatoire composé de lettres et de chiffres"""
+    return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(longueur))
+
+
+def nom_utilisateur_base(membre):
+    """Nom d'utilisateur souhaité pour un membre : prenom.nom"""
+    return f"{membre.prenom.lower()}.{membre.nom.lower()}"
+
+
+def resoudre_noms_utilisateur(bases):
+    """
+    Attribue un nom d'utilisateur unique à chaque base de la liste (dans l'ordre).
+
+    Les noms déjà pris sont lus en une requête par préfixe ; les suffixes
+    numériques suivent la même règle qu'auparavant : base, base1, base2...
+    """
+    bases_uniques = sorted(set(bases))
+    pris = set()
+    for debut in range(0, len(bases_uniques), PREFIXES_PAR_REQUETE):
+        paquet = bases_uniques[debut:debut + PREFIXES_PAR_REQUETE]
+        filtre = reduce(or_, (Q(username__startswith=base) for base in paquet))
+        pris.update(User.objects.filter(filtre).values_list('username', flat=True))
+
+    noms = []
+    for base in bases:
+        username = base
+        counter = 1
+        while username in pris:
+            username = f"{base}{counter}"
+            counter += 1
+        pris.add(username)
+        noms.append(username)
+    return noms
+
+
+def hacher_mots_de_passe(mots_de_passe, processus=None):
+    """
+    Hache une liste de mots de passe, en parallèle au-delà de SEUIL_POOL.
+
+    Les processus du pool sont démarrés par spawn, jamais par fork : l'appelant
+    peut être un processus web à plusieurs fils d'exécution et connexions à
+    la base ouvertes, qu'un fork recopierait dans un état incohérent.
+    Chaque processus neuf configure Django (django.setup) avant de hacher ;
+    l'initialiseur ne doit pas venir d'un module qui importe les modèles.
+    """
+    if len(mots_de_passe) < SEUIL_POOL:
+        return [make_password(mot_de_passe) for mot_de_passe in mots_de_passe]
+
+    processus = processus or min(os.cpu_count() or 1, 8)
+    taille_paquet = max(1, len(mots_de_passe) // (processus * 4))
+    contexte = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processus, mp_context=contexte, initializer=django.setup) as pool:
+        return list(pool.map(make_password, mots_de_passe, chunksize=taille_paquet))
+
+
+def _creer_lot(membres):
+    bases = [nom_utilisateur_base(membre) for membre in membres]
+    mots_de_passe = [generer_mot_de_passe() for _ in membres]
+    hashes = hacher_mots_de_passe(mots_de_passe)
+
+    for tentative in range(TENTATIVES):
+        noms = resoudre_noms_utilisateur(bases)
+        users = [
+            User(
+                username=username,
+                password=hash_,
+                first_name=membre.prenom,
+                last_name=membre.nom,
+                email=membre.email or '',
+            )
+            for membre, username, hash_ in zip(membres, noms, hashes)
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                for membre, user in zip(membres, users):
+                    membre.user = user
+                Membre.objects.bulk_update(membres, ['user'])
+                journaliser(Membre, [membre.pk for membre in membres], MODIFICATION)
+            break
+        except IntegrityError:
+            # Un nom a été pris entre la résolution et l'insertion : on recommence
+            if tentative == TENTATIVES - 1:
+                raise
+
+    return list(zip(membres, noms, mots_de_passe))
+
+
+def creer_comptes_utilisateurs(membres_ids, progression=None):
+    """
+    Crée un compte utilisateur pour chaque membre de `membres_ids` qui n'en a pas.
+    `progression(faits, total)` est appelée après chaque lot.
+
+    Retourne la liste des triplets (membre, username, mot_de_passe) créés.
+    """
+    ids = list(
+        Membre.objects.filter(id__in=list(membres_ids), user__isnull=True)
+        .order_by('id').values_list('id', flat=True)
+    )
+    crees = []
+    for debut in range(0, len(ids), TAILLE_LOT):
+        lot = list(
+            Membre.objects.filter(id__in=ids[debut:debut + TAILLE_LOT], user__isnull=True)
+            .only('id', 'nom', 'prenom', 'email', 'user').order_by('id')
+        )
+        if lot:
+            crees.extend(_creer_lot(lot))
+        if progression:
+            progression(min(debut + TAILLE_LOT, len(ids)), len(ids))
+    return crees
@@ -0,0 +1,133 @@
+"""
+Validateurs HTTP (ETag / Last-Modified) des pages consultées bien plus
+souvent que leurs données ne changent.
+
+L'état d'une page est décrit par les tables qu'elle affiche : pour chacune,
+(nombre de lignes, max(updated_at)) obtenus par une seule requête agrégée.
+Un ajout ou une modification fait avancer max(updated_at), une suppression
+change le nombre de lignes. Les mises à jour ensemblistes (.update(),
+bulk_update) renseignent updated_at elles-mêmes (voir mandats.py,
+suppression.py, medias.py).
+
+L'ETag tient aussi compte de l'utilisateur (menus et boutons dépendent de
+ses droits, l'en-tête affiche son nom et sa photo), du jeton CSRF (les formulaires de la page en dépendent) et de
+la date des templates : une page ne reçoit 304 que si elle serait rendue
+à l'identique.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from .fizato import info_fizato, url_logo
+from .models import Association, Membre, CarteMembre, FonctionBureau, MembreBureau, Mandat, ComiteDoyen
+
+DOSSIER_TEMPLATES = os.path.join(os.path.dirname(__file__), 'templates')
+
+
+def etat_table(queryset):
+    """(nombre de lignes, max(updated_at)) de `queryset`, en une requête"""
+    resultat = queryset.order_by().aggregate(nombre=Count('pk'), dernier=Max('updated_at'))
+    return resultat['nombre'], resultat['dernier']
+
+
+@lru_cache(maxsize=None)
+def date_templates():
+    """Date de modification la plus récente des templates (identique dans tous les processus)"""
+    dernier = 0
+    for racine, _, fichiers in os.walk(DOSSIER_TEMPLATES):
+        for nom in fichiers:
+            dernier = max(dernier, os.stat(os.path.join(racine, nom)).st_mtime)
+    return datetime.fromtimestamp(int(dernier), tz=dt_timezone.utc)
+
+
+def _etat_memorise(request, etat_page, args, kwargs):
+    # etag_func et last_modified_func sont appelées toutes les deux : une seule série de requêtes
+    if not hasattr(request, '_etat_page'):
+        # Des messages en attente doivent être affichés : pas de 304
+        request._etat_page = None if len(get_messages(request)) else etat_page(request, *args, **kwargs)
+    return request._etat_page
+
+
+def page_conditionnelle(etat_page):
+    """
+    Décorateur de vue : `etat_page(request, *args, **kwargs)` retourne la liste
+    des états (etat_table, valeurs simples...) dont dépend la page, ou None
+    pour toujours rendre la page (objet introuvable...).
+    """
+    def etag(request, *args, **kwargs):
+        etat = _etat_memorise(request, etat_page, args, kwargs)
+        if etat is None:
+            return None
+        utilisateur = request.user
+        empreinte = repr((
+            etat,
+            utilisateur.pk, utilisateur.is_staff, utilisateur.is_superuser,
+            request.META.get('CSRF_COOKIE'),
+            # En-tête de base.html : lu dans la session, sans requête
+            sorted(dict(request.navigation).items()) if hasattr(request, 'navigation') else None,
+            date_templates().timestamp(),
+        ))
+        return hashlib.md5(empreinte.encode('utf-8')).hexdigest()
+
+    def derniere_modification(request, *args, **kwargs):
+        etat = _etat_memorise(request, etat_page, args, kwargs)
+        if etat is None:
+            return None
+        dates = [valeur for element in etat for valeur in element if isinstance(valeur, datetime)]
+        return max([date_templates(), *dates])
+
+    return condition(etag_func=etag, last_modified_func=derniere_modification)
+
+
+def etat_detail_association(request, association_id):
+    association = Association.objects.filter(id=association_id).values_list('updated_at').first()
+    if association is None:
+        return None
+    return [association, etat_table(Membre.objects.filter(association_id=association_id))]
+
+
+def etat_carte_membre(request, membre_id):
+    membre = Membre.objects.filter(id=membre_id).values_list('updated_at', 'association_id').first()
+    if membre is None:
+        return None
+    return [
+        membre,
+        etat_table(Association.tous.filter(id=membre[1])),
+        etat_fizato(),
+        # La vue marque la carte imprimée : l'état de la carte fait partie de la page
+        tuple(CarteMembre.objects.filter(membre_id=membre_id).values_list('est_imprimee', flat=True)),
+    ]
+
+
+def etat_fizato():
+    """Informations FIZATO et logo des cartes, lus en mémoire (voir fizato.py)"""
+    info = info_fizato()
+    return (info.updated_at if info else None, url_logo())
+
+
+def etat_bureau():
+    """Tables communes à la page FIZATO et à l'historique des mandats"""
+    return [
+        etat_table(Mandat.objects.all()),
+        etat_table(MembreBureau.objects.all()),
+        etat_table(ComiteDoyen.objects.all()),
+        etat_table(FonctionBureau.objects.all()),
+        etat_table(Membre.objects.all()),
+        etat_table(Association.tous.all()),
+    ]
+
+
+def etat_detail_fizato(request):
+    return etat_bureau() + [
+        etat_fizato(),
+        (CarteMembre.objects.count(),),
+    ]
+
+
+def etat_historique_fizato(request):
+    return etat_bureau()
@@ -0,0 +1,17 @@
+from django.utils.functional import SimpleLazyObject
+
+from .fizato import info_fizato, url_logo
+from .navigation import contexte_navigation
+
+
+def navigation(request):
+    """Expose {{ navigation }} (membre connecté, photo, droits) aux templates, sans requête s'il est en session"""
+    contexte = getattr(request, 'navigation', None)
+    if contexte is None:
+        contexte = SimpleLazyObject(lambda: contexte_navigation(request))
+    return {'navigation': contexte}
+
+
+def fizato(request):
+    """Expose {{ fizato.info }} et {{ fizato.logo_url }} à tous les templates (en mémoire, sans requête)"""
+    return {'fizato': SimpleLazyObject(lambda: {'info': info_fizato(), 'logo_url': url_logo()})}
@@ -47,7 +47,8 @@ def can_view_member_data(user, membre=None):
         return True
     
     # Si l'utilisateur est lié à un membre, il peut seulement voir ses propres données
-    if hasattr(user, 'membre') and membre:
-        return user.membre == membre
+    # (comparaison des identifiants : pas de requête sur user.membre)
+    if membre is not None:
+        return membre.user_id == user.pk
     
     return False
@@ -0,0 +1,93 @@
+"""
+Informations FIZATO gardées en mémoire dans chaque processus.
+
+InfoFizato n'a qu'une ligne, utilisée sur presque chaque carte et page
+(logo, nom, devise). Chaque processus en garde une copie, relue :
+
+- quand la version de l'espace 'info_fizato' du cache de statistiques
+  change (modification enregistrée, voir signals.py) : immédiat avec un
+  cache partagé entre processus ;
+- quand la date de modification de la ligne (updated_at, lue au plus une
+  fois toutes les DUREE_VERIFICATION secondes) a changé : c'est ce qui
+  borne le retard d'un processus que l'invalidation n'a pas atteint
+  (cache locmem, version évincée).
+
+Le logo réduit affiché sur les cartes est préparé au même moment, une
+fois par copie.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import CACHE_STATS, invalider, version
+from .medias import derive_image
+from .models import InfoFizato
+
+logger = logging.getLogger(__name__)
+
+ESPACE = 'info_fizato'
+# Largeur du logo réduit (pixels) : assez pour une impression nette des cartes
+LARGEUR_LOGO = 256
+# Intervalle maximal entre deux lectures de InfoFizato.updated_at (secondes)
+DUREE_VERIFICATION = 30
+
+_verrou = threading.Lock()
+_memoire = {}
+
+
+def _url_logo(info):
+    nom = info.logo.name if info and info.logo else getattr(settings, 'LOGO_FIZATO_DEFAUT', '')
+    if not nom:
+        return ''
+    stockage = InfoFizato._meta.get_field('logo').storage
+    try:
+        derive = derive_image(nom, LARGEUR_LOGO, stockage)
+    except OSError:
+        # Image illisible par Pillow : on sert l'original
+        logger.warning("Impossible de réduire le logo FIZATO %s", nom)
+        return stockage.url(nom)
+    return stockage.url(derive) if derive else ''
+
+
+def _a_jour(etat, courante, maintenant):
+    return etat is not None and etat[0] == courante and maintenant < etat[1] + DUREE_VERIFICATION
+
+
+def _etat():
+    """(version, instant de vérification, updated_at, instance, URL du logo réduit)"""
+    courante = version(CACHE_STATS, ESPACE)
+    maintenant = time.monotonic()
+    etat = _memoire.get('etat')
+    if _a_jour(etat, courante, maintenant):
+        return etat
+    with _verrou:
+        etat = _memoire.get('etat')
+        if _a_jour(etat, courante, maintenant):
+            return etat
+        modification = InfoFizato.objects.filter(pk=InfoFizato.SINGLETON_ID).values_list(
+            'updated_at', flat=True,
+        ).first()
+        if etat is not None and etat[0] == courante and etat[2] == modification:
+            # Ligne inchangée : seule l'heure de vérification avance
+            etat = (courante, maintenant) + etat[2:]
+        else:
+            info = InfoFizato.obtenir()
+            etat = (courante, maintenant, info.updated_at if info else None, info, _url_logo(info))
+        _memoire['etat'] = etat
+    return etat
+
+
+def info_fizato():
+    """Instance InfoFizato partagée par le processus (à ne pas modifier), None si elle n'existe pas"""
+    return _etat()[3]
+
+
+def url_logo():
+    """URL du logo FIZATO réduit ('' si aucun logo n'est disponible)"""
+    return _etat()[4]
+
+
+def invalider_info_fizato():
+    invalider(CACHE_STATS, ESPACE)
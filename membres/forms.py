@@ -1,6 +1,34 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.urls import reverse
 from .models import Association, Membre, CarteMembre, InfoFizato, FonctionBureau, MembreBureau, Mandat, ComiteDoyen
+from .recherche import libelle_membre, valeurs_membre
+
+
+class MembreAutocompleteWidget(forms.Widget):
+    """
+    Choix d'un membre par autocomplétion : un champ de saisie interroge
+    la vue autocompletion_membres et un champ caché porte l'identifiant.
+    Aucune liste de membres n'est rendue dans la page ; le ModelChoiceField
+    valide l'identifiant envoyé par une seule requête.
+    """
+    template_name = 'membres/widgets/membre_autocomplete.html'
+
+    class Media:
+        js = ['js/membre_autocomplete.js']
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        libelle = ''
+        if value not in (None, ''):
+            try:
+                membre = valeurs_membre(Membre.actifs.filter(pk=int(value))).first()
+            except (TypeError, ValueError):
+                membre = None
+            libelle = libelle_membre(membre) if membre else ''
+        context['widget']['libelle'] = libelle
+        context['widget']['url'] = reverse('autocompletion_membres')
+        return context
 
 class AssociationForm(forms.ModelForm):
     class Meta:
@@ -249,7 +277,7 @@ class MembreAutoEditForm(forms.ModelForm):
 
 class GenerationCarteForm(forms.Form):
     membres = forms.ModelMultipleChoiceField(
-        queryset=Membre.objects.all(),
+        queryset=Membre.actifs.all(),
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
@@ -260,7 +288,7 @@ class GenerationCarteForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Ne montrer que les membres qui n'ont pas encore de carte
-        self.fields['membres'].queryset = Membre.objects.filter(carte__isnull=True)
+        self.fields['membres'].queryset = Membre.actifs.filter(carte__isnull=True)
 
 
 class InfoFizatoForm(forms.ModelForm):
@@ -328,8 +356,8 @@ class MembreBureauForm(forms.ModelForm):
         model = MembreBureau
         fields = ['membre', 'fonction', 'date_debut', 'date_fin', 'est_actuel']
         widgets = {
-            'membre': forms.Select(attrs={
-                'class': 'form-select'
+            'membre': MembreAutocompleteWidget(attrs={
+                'class': 'form-control'
             }),
             'fonction': forms.Select(attrs={
                 'class': 'form-select'
@@ -349,8 +377,6 @@ class MembreBureauForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Ordonner les membres par nom
-        self.fields['membre'].queryset = Membre.objects.all().order_by('nom', 'prenom')
         # Ordonner les fonctions par niveau hiérarchique
         self.fields['fonction'].queryset = FonctionBureau.objects.all().order_by('niveau_hierarchique', 'nom')
 
@@ -406,7 +432,7 @@ class ComiteDoyenForm(forms.ModelForm):
         model = ComiteDoyen
         fields = ['membre', 'titre', 'date_nomination', 'ordre_affichage']
         widgets = {
-            'membre': forms.Select(attrs={'class': 'form-select'}),
+            'membre': MembreAutocompleteWidget(attrs={'class': 'form-control'}),
             'titre': forms.TextInput(attrs={'class': 'form-control'}),
             'date_nomination': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'ordre_affichage': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
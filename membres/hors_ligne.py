@@ -0,0 +1,298 @@
+"""
+Paquets de vérification hors ligne pour les lecteurs de cartes.
+
+Un paquet est un fichier binaire signé, produit en flux, que les appareils
+de contrôle utilisent sans connexion :
+
+    en-tête      32 octets  FORMAT_ENTETE (magie, versions, tailles)
+    index        8 x N      empreintes des cartes valides, triées (entiers non signés gros-boutistes)
+    filtre       M / 8      filtre de Bloom des cartes révoquées
+    signature    32 octets  HMAC-SHA256 de tout ce qui précède
+
+L'empreinte d'une carte est empreinte(b'U' + numero_unique) pour le QR code
+(voir verification.lire_jeton) et empreinte(b'N' + numero_carte) pour une
+saisie manuelle : les deux figurent dans l'index.
+
+Les versions sont des horodatages en millisecondes. Un paquet complet
+(depuis=0) contient toutes les cartes valides et un filtre vide. Un paquet
+différentiel (depuis=V) ne contient que les cartes générées (ou dont le
+membre a été modifié) et les révocations enregistrées depuis V : l'appareil
+ajoute l'index à ceux qu'il connaît et refuse toute carte présente dans un
+filtre plus récent. Quand le numéro de carte d'un membre change, l'ancien
+numéro est révoqué seul (RevocationCarte sans numero_unique).
+
+L'index est trié par fusion de séries triées écrites dans des fichiers
+temporaires (TAILLE_SERIE empreintes au plus en mémoire) : la mémoire ne
+dépend pas du nombre de cartes, seul le filtre de Bloom (environ 15 bits
+par révocation) est construit en mémoire.
+"""
+import hashlib
+import heapq
+import hmac
+import math
+import struct
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .models import CarteMembre, RevocationCarte
+
+MAGIE = b'FZV1'
+# magie, version depuis, version, nombre d'empreintes, bits du filtre, nombre de hachages
+FORMAT_ENTETE = '>4sQQIIB3x'
+EMPREINTE = struct.Struct('>Q')
+TAILLE_SERIE = 100_000
+TAILLE_LOT = 2000
+# Taux de faux positifs visé pour le filtre de Bloom des révocations
+TAUX_FAUX_POSITIFS = 0.001
+SEL = 'membres.hors_ligne.paquet'
+
+
+def empreinte(valeur):
+    """Empreinte 64 bits d'une valeur (octets préfixés b'U' ou b'N')"""
+    return EMPREINTE.unpack(hashlib.sha256(valeur).digest()[:8])[0]
+
+
+def empreintes_carte(numero_unique, numero_carte):
+    yield empreinte(b'U' + numero_unique.bytes)
+    if numero_carte:
+        yield empreinte(b'N' + numero_carte.encode('utf-8'))
+
+
+def cle_signature():
+    """Clé HMAC partagée avec les appareils (VERIFICATION_CLE_APPAREILS, dérivée de SECRET_KEY sinon)"""
+    cle = getattr(settings, 'VERIFICATION_CLE_APPAREILS', '')
+    if cle:
+        return cle.encode('utf-8')
+    return salted_hmac(SEL, 'cle-appareils', algorithm='sha256').digest()
+
+
+def version_courante():
+    return int(timezone.now().timestamp() * 1000)
+
+
+def date_version(version):
+    return datetime.fromtimestamp(version / 1000, tz=dt_timezone.utc)
+
+
+class FiltreBloom:
+    """Filtre de Bloom sur des empreintes 64 bits (double hachage sur leurs deux moitiés)"""
+
+    def __init__(self, nombre, taux=TAUX_FAUX_POSITIFS):
+        if nombre:
+            self.bits = max(8, math.ceil(-nombre * math.log(taux) / math.log(2) ** 2))
+            self.hachages = max(1, round(self.bits / nombre * math.log(2)))
+        else:
+            self.bits, self.hachages = 0, 0
+        self.octets = bytearray((self.bits + 7) // 8)
+
+    def positions(self, valeur):
+        h1, h2 = valeur & 0xFFFFFFFF, valeur >> 32
+        return ((h1 + i * h2) % self.bits for i in range(self.hachages))
+
+    def ajouter(self, valeur):
+        for position in self.positions(valeur):
+            self.octets[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, valeur):
+        if not self.bits:
+            return False
+        return all(self.octets[position >> 3] & (1 << (position & 7)) for position in self.positions(valeur))
+
+
+def _series_triees(valeurs):
+    """Découpe `valeurs` en séries triées écrites dans des fichiers temporaires"""
+    series = []
+    serie = []
+    for valeur in valeurs:
+        serie.append(valeur)
+        if len(serie) >= TAILLE_SERIE:
+            series.append(_ecrire_serie(serie))
+            serie = []
+    if serie:
+        series.append(_ecrire_serie(serie))
+    return series
+
+
+def _ecrire_serie(serie):
+    serie.sort()
+    fichier = tempfile.TemporaryFile()
+    for debut in range(0, len(serie), TAILLE_LOT):
+        fichier.write(b''.join(EMPREINTE.pack(v) for v in serie[debut:debut + TAILLE_LOT]))
+    fichier.seek(0)
+    return fichier
+
+
+def _lire_serie(fichier):
+    while True:
+        bloc = fichier.read(EMPREINTE.size * TAILLE_LOT)
+        if not bloc:
+            return
+        for (valeur,) in EMPREINTE.iter_unpack(bloc):
+            yield valeur
+
+
+def _cartes_valides_qs():
+    return CarteMembre.objects.filter(membre__association__est_supprimee=False)
+
+
+def _cartes_valides(depuis):
+    cartes = _cartes_valides_qs()
+    if depuis:
+        # Un membre modifié a pu changer de numéro de carte : sa nouvelle empreinte est renvoyée
+        cartes = cartes.filter(
+            Q(date_generation__gte=date_version(depuis)) | Q(membre__updated_at__gte=date_version(depuis)),
+        )
+    for numero_unique, numero_carte in cartes.order_by().values_list(
+        'numero_unique', 'membre__numero_carte',
+    ).iterator(chunk_size=TAILLE_LOT):
+        yield from empreintes_carte(numero_unique, numero_carte)
+
+
+def _filtre_revocations(depuis):
+    if not depuis:
+        return FiltreBloom(0)
+    revocations = RevocationCarte.objects.filter(date_revocation__gte=date_version(depuis)).order_by().annotate(
+        # Les numéros de carte sont réattribués : un numéro repris par une carte valide n'est pas révoqué
+        numero_reutilise=Exists(_cartes_valides_qs().filter(membre__numero_carte=OuterRef('numero_carte'))),
+    )
+    filtre = FiltreBloom(2 * revocations.count())
+    for numero_unique, numero_carte, numero_reutilise in revocations.values_list(
+        'numero_unique', 'numero_carte', 'numero_reutilise',
+    ).iterator(chunk_size=TAILLE_LOT):
+        # Sans numero_unique : seul l'ancien numéro d'une carte toujours valide est révoqué
+        if numero_unique is not None:
+            filtre.ajouter(empreinte(b'U' + numero_unique.bytes))
+        if numero_carte and not numero_reutilise:
+            filtre.ajouter(empreinte(b'N' + numero_carte.encode('utf-8')))
+    return filtre
+
+
+@contextmanager
+def _instantane():
+    """
+    Transaction dont toutes les requêtes voient le même état de la base.
+    PostgreSQL (READ COMMITTED par défaut) prend un instantané par requête :
+    la transaction passe en REPEATABLE READ, un seul instantané pour toutes.
+    SQLite (transaction sérialisée) et MySQL InnoDB (REPEATABLE READ par
+    défaut) le garantissent déjà. Dans une transaction déjà ouverte, le
+    niveau d'isolation ne peut plus changer : celui de l'appelant s'applique.
+    """
+    deja_ouverte = connection.in_atomic_block
+    with transaction.atomic():
+        if connection.vendor == 'postgresql' and not deja_ouverte:
+            with connection.cursor() as curseur:
+                curseur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def _fusion(series):
+    """Fusion sans doublons des séries triées"""
+    precedente = None
+    for valeur in heapq.merge(*(_lire_serie(fichier) for fichier in series)):
+        if valeur != precedente:
+            precedente = valeur
+            yield valeur
+
+
+def generer_paquet(depuis=0, version=None):
+    """
+    Produit le paquet (morceaux d'octets) des cartes valides et des
+    révocations depuis la version `depuis` (0 : paquet complet).
+
+    Les cartes générées ou révoquées exactement à l'instant `depuis` sont
+    reprises : un appareil peut recevoir deux fois la même empreinte, jamais
+    en manquer une.
+    """
+    version = version or version_courante()
+    # Un seul instantané : l'index et le filtre décrivent le même état de la base
+    with _instantane():
+        series = _series_triees(_cartes_valides(depuis))
+        filtre = _filtre_revocations(depuis)
+    try:
+        # Le nombre d'empreintes (sans doublons) n'est connu qu'après fusion : un premier passage le compte
+        nombre = sum(1 for _ in _fusion(series))
+        for fichier in series:
+            fichier.seek(0)
+
+        signature = hmac.new(cle_signature(), digestmod=hashlib.sha256)
+        entete = struct.pack(FORMAT_ENTETE, MAGIE, depuis, version, nombre, filtre.bits, filtre.hachages)
+        signature.update(entete)
+        yield entete
+
+        lot = []
+        for valeur in _fusion(series):
+            lot.append(valeur)
+            if len(lot) >= TAILLE_LOT:
+                morceau = b''.join(EMPREINTE.pack(v) for v in lot)
+                signature.update(morceau)
+                yield morceau
+                lot = []
+        if lot:
+            morceau = b''.join(EMPREINTE.pack(v) for v in lot)
+            signature.update(morceau)
+            yield morceau
+
+        morceau = bytes(filtre.octets)
+        signature.update(morceau)
+        yield morceau
+        yield signature.digest()
+    finally:
+        for fichier in series:
+            fichier.close()
+
+
+def lire_paquet(donnees):
+    """
+    Relit un paquet complet (tests, outils) : (entête dict, index, FiltreBloom).
+    Lève ValueError si la signature ou le format ne correspondent pas.
+    """
+    taille_entete = struct.calcsize(FORMAT_ENTETE)
+    corps, signature = donnees[:-32], donnees[-32:]
+    attendue = hmac.new(cle_signature(), corps, hashlib.sha256).digest()
+    if not hmac.compare_digest(signature, attendue):
+        raise ValueError("Signature du paquet invalide")
+    magie, depuis, version, nombre, bits, hachages = struct.unpack(FORMAT_ENTETE, corps[:taille_entete])
+    if magie != MAGIE:
+        raise ValueError("Format de paquet inconnu")
+    fin_index = taille_entete + nombre * EMPREINTE.size
+    index = [valeur for (valeur,) in EMPREINTE.iter_unpack(corps[taille_entete:fin_index])]
+    filtre = FiltreBloom(0)
+    filtre.bits, filtre.hachages = bits, hachages
+    filtre.octets = bytearray(corps[fin_index:])
+    entete = {'depuis': depuis, 'version': version, 'nombre': nombre}
+    return entete, index, filtre
+
+
+def revoquer_numero(membre_id, ancien_numero):
+    """
+    Révoque l'ancien numéro de carte d'un membre dont la carte reste valide
+    (changement de numéro) ; sans carte, le numéro n'a jamais été publié.
+    """
+    if ancien_numero and CarteMembre.objects.filter(membre_id=membre_id).exists():
+        RevocationCarte.objects.create(numero_unique=None, numero_carte=ancien_numero)
+
+
+def revoquer_cartes(cartes):
+    """Enregistre la révocation des cartes du queryset `cartes` (avant leur suppression)"""
+    maintenant = timezone.now()
+    lot = []
+    total = 0
+    for numero_unique, numero_carte in cartes.order_by().values_list(
+        'numero_unique', 'membre__numero_carte',
+    ).iterator(chunk_size=TAILLE_LOT):
+        lot.append(RevocationCarte(numero_unique=numero_unique, numero_carte=numero_carte or '', date_revocation=maintenant))
+        if len(lot) >= TAILLE_LOT:
+            RevocationCarte.objects.bulk_create(lot, ignore_conflicts=True)
+            total += len(lot)
+            lot = []
+    if lot:
+        RevocationCarte.objects.bulk_create(lot, ignore_conflicts=True)
+        total += len(lot)
+    return total
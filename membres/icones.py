@@ -0,0 +1,141 @@
+"""
+Police d'icônes réduite aux glyphes réellement utilisés.
+
+Font Awesome complet pèse près de 90 Ko de CSS et 250 Ko de polices alors
+que les templates n'utilisent que quelques dizaines d'icônes. On relit la
+feuille de style vendue (static/vendor/fontawesome-*), on ne garde que les
+règles des classes fa-* présentes dans les templates et on découpe les
+polices avec fontTools (dépendance de construction uniquement).
+"""
+import os
+import re
+
+SOURCE = 'vendor/fontawesome-6.0.0'
+NOM_SORTIE = 'icones'
+
+CLASSE_ICONE = re.compile(r'\bfa-[a-z0-9-]+')
+# .fa-user:before,.fa-user-alt:before{content:"\f007"}
+SELECTEUR_GLYPHE = re.compile(r'^\.(fa-[a-z0-9-]+)::?before$')
+CONTENU_GLYPHE = re.compile(r'^content:"(.+)"$')
+URL_POLICE = re.compile(r'url\(([^)]+\.woff2)\)')
+
+
+def classes_utilisees(dossiers):
+    """Classes fa-* employées dans les templates (.html) des dossiers donnés"""
+    classes = set()
+    for dossier in dossiers:
+        for racine, _, fichiers in os.walk(dossier):
+            for nom in fichiers:
+                if nom.endswith('.html'):
+                    with open(os.path.join(racine, nom), encoding='utf-8') as fichier:
+                        classes.update(CLASSE_ICONE.findall(fichier.read()))
+    return classes
+
+
+def _regles(css):
+    """Découpe une feuille de style minifiée en blocs de premier niveau (prélude, corps)"""
+    niveau = 0
+    debut = corps = 0
+    for position, caractere in enumerate(css):
+        if caractere == '{':
+            if niveau == 0:
+                corps = position
+            niveau += 1
+        elif caractere == '}':
+            niveau -= 1
+            if niveau == 0:
+                yield css[debut:corps].strip(), css[corps + 1:position]
+                debut = position + 1
+
+
+def _point_de_code(contenu):
+    if contenu.startswith('\\'):
+        return int(contenu[1:], 16)
+    return ord(contenu)
+
+
+def reduire_css(css, classes):
+    """
+    Retourne (css réduite, points de code utilisés, polices woff2 référencées).
+
+    Les règles de glyphes inutilisés sont supprimées, les autres règles
+    (tailles, animations, @font-face...) sont conservées telles quelles.
+    """
+    morceaux = []
+    points = set()
+    polices = []
+    for prelude, corps in _regles(css):
+        selecteurs = prelude.split(',')
+        correspondances = [SELECTEUR_GLYPHE.match(s) for s in selecteurs]
+        contenu = CONTENU_GLYPHE.match(corps)
+        if contenu and all(correspondances):
+            gardes = [s for s, m in zip(selecteurs, correspondances) if m.group(1) in classes]
+            if not gardes:
+                continue
+            points.add(_point_de_code(contenu.group(1)))
+            prelude = ','.join(gardes)
+        elif prelude == '@font-face':
+            police = URL_POLICE.search(corps)
+            # Les familles de compatibilité v4/v5 ne servent pas aux templates
+            if not police or 'Font Awesome 6' not in corps:
+                continue
+            if police.group(1) not in polices:
+                polices.append(police.group(1))
+            # Seule la variante woff2 (réduite) est référencée
+            corps = re.sub(r'src:[^;}]+', f'src:url({police.group(1)}) format("woff2")', corps)
+        morceaux.append(f'{prelude}{{{corps}}}')
+    return '\n'.join(morceaux) + '\n', points, polices
+
+
+def reduire_police(source, destination, points):
+    """Écrit dans `destination` la police woff2 `source` limitée aux points de code donnés"""
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['*']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    police = subset.load_font(source, options)
+    sous_ensemble = subset.Subsetter(options)
+    sous_ensemble.populate(unicodes=points)
+    sous_ensemble.subset(police)
+    if not police.getBestCmap():
+        return False
+    subset.save_font(police, destination, options)
+    return True
+
+
+def construire(racine_static, classes):
+    """
+    Produit css/icones.css et webfonts/icones-*.woff2 dans `racine_static`.
+
+    Retourne (chemins écrits, nombre de glyphes).
+    """
+    source = os.path.join(racine_static, SOURCE)
+    with open(os.path.join(source, 'css', 'all.min.css'), encoding='utf-8') as fichier:
+        entete, _, css = fichier.read().partition('*/')
+    css, points, polices = reduire_css(css, classes)
+
+    os.makedirs(os.path.join(racine_static, 'webfonts'), exist_ok=True)
+    ecrits = []
+    for url in polices:
+        nom = os.path.basename(url)
+        destination = os.path.join(racine_static, 'webfonts', f'{NOM_SORTIE}-{nom}')
+        # Découpe faite depuis la version .ttf, plus fiable à relire que le woff2 publié
+        ttf = os.path.join(source, 'webfonts', os.path.splitext(nom)[0] + '.ttf')
+        if reduire_police(ttf, destination, points):
+            ecrits.append(destination)
+            css = css.replace(url, f'../webfonts/{NOM_SORTIE}-{nom}')
+        else:
+            # Aucun glyphe utilisé dans cette police : on retire son @font-face
+            css = re.sub(r'@font-face\{[^}]*' + re.escape(url) + r'[^}]*\}\n?', '', css)
+            if os.path.exists(destination):
+                os.remove(destination)
+
+    chemin_css = os.path.join(racine_static, 'css', f'{NOM_SORTIE}.css')
+    os.makedirs(os.path.dirname(chemin_css), exist_ok=True)
+    with open(chemin_css, 'w', encoding='utf-8') as fichier:
+        fichier.write(f'{entete}*/\n/* Généré par manage.py construire_icones : ne pas modifier à la main */\n{css}')
+    ecrits.insert(0, chemin_css)
+    return ecrits, len(points)
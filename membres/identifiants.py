@@ -0,0 +1,260 @@
+"""
+Émission par lots des identifiants temporaires des membres.
+
+Chaque lot garde la trace des identifiants qu'il a émis : les mots de passe
+sont tirés et enregistrés avant le hachage, hachés en parallèle, puis
+appliqués à tous les comptes dans une seule transaction (bulk_update).
+Un lot interrompu peut être repris : les mots de passe déjà tirés sont
+réutilisés et seuls les comptes non encore mis à jour sont écrits.
+
+Les mots de passe temporaires sont conservés chiffrés (clé dérivée de
+SECRET_KEY, voir chiffrer) le temps d'imprimer et de réimprimer les
+feuilles : un lot est clôturé à la main une fois les feuilles distribuées,
+et au plus tard IDENTIFIANTS_DUREE_CONSERVATION après sa création
+(expirer_lots, appelé par les travailleurs de membres.taches et à chaque
+lecture des mots de passe). Un lot expiré ne peut plus être repris.
+"""
+import base64
+import hashlib
+import hmac
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from . import instrumentation
+from .comptes import generer_mot_de_passe, hacher_mots_de_passe
+from .models import IdentifiantEmis, LotIdentifiants, Membre
+
+# Nombre d'identifiants par page imprimée
+IDENTIFIANTS_PAR_PAGE = 6
+TAILLE_LOT = 500
+# Chiffrement des mots de passe temporaires : nonce et empreinte d'authentification (octets)
+TAILLE_NONCE = 16
+TAILLE_EMPREINTE = 16
+
+
+class LotExpire(Exception):
+    """Lot clôturé (ou expiré) : ses mots de passe temporaires ont été effacés"""
+
+
+class MotDePasseIllisible(Exception):
+    """Mot de passe temporaire altéré ou chiffré avec une autre SECRET_KEY"""
+
+
+def _cle(usage):
+    return salted_hmac('membres.identifiants', usage, algorithm='sha256').digest()
+
+
+def _flux(cle, nonce, longueur):
+    """Suite chiffrante HMAC-SHA256(nonce || compteur), tronquée à `longueur` octets"""
+    blocs = (
+        hmac.new(cle, nonce + compteur.to_bytes(4, 'big'), hashlib.sha256).digest()
+        for compteur in range(-(-longueur // 32))
+    )
+    return b''.join(blocs)[:longueur]
+
+
+def chiffrer(mot_de_passe):
+    """
+    Mot de passe temporaire chiffré pour la base : nonce aléatoire, texte
+    combiné (XOR) à une suite HMAC-SHA256, puis empreinte HMAC de l'ensemble.
+    Encodé en base64 (56 caractères pour 8 caractères en clair).
+    """
+    nonce = secrets.token_bytes(TAILLE_NONCE)
+    clair = mot_de_passe.encode('utf-8')
+    chiffre = bytes(a ^ b for a, b in zip(clair, _flux(_cle('chiffrement'), nonce, len(clair))))
+    empreinte = hmac.new(_cle('authentification'), nonce + chiffre, hashlib.sha256).digest()[:TAILLE_EMPREINTE]
+    return base64.urlsafe_b64encode(nonce + chiffre + empreinte).decode('ascii')
+
+
+def dechiffrer(valeur):
+    """Inverse de chiffrer ; '' pour un mot de passe effacé, MotDePasseIllisible s'il a été altéré"""
+    if not valeur:
+        return ''
+    try:
+        brut = base64.urlsafe_b64decode(valeur.encode('ascii'))
+    except ValueError:
+        raise MotDePasseIllisible("Mot de passe temporaire illisible.")
+    nonce, chiffre, empreinte = brut[:TAILLE_NONCE], brut[TAILLE_NONCE:-TAILLE_EMPREINTE], brut[-TAILLE_EMPREINTE:]
+    attendue = hmac.new(_cle('authentification'), nonce + chiffre, hashlib.sha256).digest()[:TAILLE_EMPREINTE]
+    if len(brut) <= TAILLE_NONCE + TAILLE_EMPREINTE or not hmac.compare_digest(empreinte, attendue):
+        raise MotDePasseIllisible("Mot de passe temporaire illisible (SECRET_KEY changée ?).")
+    return bytes(a ^ b for a, b in zip(chiffre, _flux(_cle('chiffrement'), nonce, len(chiffre)))).decode('utf-8')
+
+
+def creer_lot(membres_ids, cree_par=None):
+    """Crée un lot et tire un mot de passe temporaire pour chaque membre ayant un compte"""
+    lot = LotIdentifiants.objects.create(cree_par=cree_par)
+    membres = (
+        Membre.objects.filter(id__in=list(membres_ids), user__isnull=False)
+        .select_related('user').only('id', 'user__id', 'user__username').order_by('id')
+    )
+    identifiants = [
+        IdentifiantEmis(
+            lot=lot,
+            membre_id=membre.id,
+            user_id=membre.user.id,
+            username=membre.user.username,
+            mot_de_passe=chiffrer(generer_mot_de_passe()),
+        )
+        for membre in membres
+    ]
+    IdentifiantEmis.objects.bulk_create(identifiants, batch_size=TAILLE_LOT)
+    return lot
+
+
+def appliquer_lot(lot):
+    """
+    Hache et applique les mots de passe du lot qui ne l'ont pas encore été.
+
+    Peut être rappelé sur un lot en échec pour le reprendre, tant qu'il n'a
+    pas expiré : un lot clôturé avec des comptes restant à mettre à jour
+    est marqué en échec et lève LotExpire.
+    """
+    expirer_lots()
+    lot.refresh_from_db(fields=['date_cloture'])
+    a_appliquer = list(
+        lot.identifiants.filter(est_applique=False).only('id', 'user_id', 'mot_de_passe').order_by('id')
+    )
+    if lot.date_cloture and a_appliquer:
+        erreur = (
+            f"Lot clôturé le {timezone.localtime(lot.date_cloture):%d/%m/%Y %H:%M} avant d'être appliqué : "
+            f"{len(a_appliquer)} mot(s) de passe effacé(s). Émettre un nouveau lot."
+        )
+        LotIdentifiants.objects.filter(id=lot.id).update(statut=LotIdentifiants.STATUT_ECHEC, erreur=erreur)
+        raise LotExpire(erreur)
+    try:
+        hashes = hacher_mots_de_passe([dechiffrer(identifiant.mot_de_passe) for identifiant in a_appliquer])
+        users = [User(id=identifiant.user_id, password=hash_) for identifiant, hash_ in zip(a_appliquer, hashes)]
+        with transaction.atomic():
+            User.objects.bulk_update(users, ['password'], batch_size=TAILLE_LOT)
+            lot.identifiants.filter(id__in=[identifiant.id for identifiant in a_appliquer]).update(est_applique=True)
+            lot.statut = LotIdentifiants.STATUT_TERMINE
+            lot.erreur = ''
+            lot.date_fin = timezone.now()
+            lot.save(update_fields=['statut', 'erreur', 'date_fin'])
+    except Exception as e:
+        LotIdentifiants.objects.filter(id=lot.id).update(statut=LotIdentifiants.STATUT_ECHEC, erreur=str(e))
+        raise
+    return len(a_appliquer)
+
+
+def emettre_identifiants(membres_ids, cree_par=None):
+    """Crée puis applique un lot d'identifiants pour les membres donnés"""
+    lot = creer_lot(membres_ids, cree_par=cree_par)
+    appliquer_lot(lot)
+    return lot
+
+
+def cloturer_lot(lot):
+    """Efface les mots de passe temporaires d'un lot une fois les feuilles distribuées"""
+    lot.identifiants.update(mot_de_passe='')
+    lot.date_cloture = timezone.now()
+    lot.save(update_fields=['date_cloture'])
+
+
+def expirer_lots():
+    """Clôture les lots créés depuis plus de IDENTIFIANTS_DUREE_CONSERVATION ; retourne leur nombre"""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'IDENTIFIANTS_DUREE_CONSERVATION', 24 * 3600))
+    lots_ids = list(
+        LotIdentifiants.objects.filter(date_cloture__isnull=True, date_creation__lt=limite).values_list('id', flat=True)
+    )
+    if lots_ids:
+        with transaction.atomic():
+            IdentifiantEmis.objects.filter(lot_id__in=lots_ids).update(mot_de_passe='')
+            LotIdentifiants.objects.filter(id__in=lots_ids).update(date_cloture=timezone.now())
+    return len(lots_ids)
+
+
+def _pages(lot):
+    """
+    Découpe les identifiants appliqués du lot en pages, sans tout charger en
+    mémoire. Lève LotExpire si le lot est clôturé (mots de passe effacés).
+    """
+    expirer_lots()
+    lot.refresh_from_db(fields=['date_cloture'])
+    if lot.date_cloture:
+        raise LotExpire(f"Le lot n°{lot.id} est clôturé : ses mots de passe temporaires ont été effacés.")
+    identifiants = (
+        lot.identifiants.filter(est_applique=True)
+        .select_related('membre__association')
+        .order_by('membre__association__nom', 'membre__nom', 'membre__prenom')
+    )
+    page = []
+    for identifiant in identifiants.iterator(chunk_size=TAILLE_LOT):
+        page.append({
+            'membre': identifiant.membre,
+            'username': identifiant.username,
+            'password': dechiffrer(identifiant.mot_de_passe),
+        })
+        if len(page) == IDENTIFIANTS_PAR_PAGE:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+def flux_html(lot):
+    """Générateur de la feuille d'identifiants HTML, rendue page par page"""
+    instrumentation.incrementer('impressions.demandees')
+    yield render_to_string('admin/print_credentials_debut.html', {'lot': lot})
+    precedente = None
+    for page in _pages(lot):
+        if precedente is not None:
+            yield render_to_string('admin/print_credentials_page.html', {'page_credentials': precedente})
+        precedente = page
+    if precedente is not None:
+        yield render_to_string('admin/print_credentials_page.html', {
+            'page_credentials': precedente,
+            'derniere_page': True,
+        })
+    yield render_to_string('admin/print_credentials_fin.html', {'lot': lot})
+    instrumentation.incrementer('impressions.terminees')
+
+
+def generer_pdf(lot, fichier):
+    """Écrit la feuille d'identifiants du lot en PDF (une carte par bloc, pagination automatique)"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.pdfgen import canvas
+
+    largeur, hauteur = A4
+    marge = 2 * cm
+    hauteur_bloc = 3.5 * cm
+    instrumentation.incrementer('impressions.demandees')
+    pdf = canvas.Canvas(fichier, pagesize=A4)
+    pdf.setTitle("Identifiants FIZATO")
+
+    def entete():
+        pdf.setFont('Helvetica-Bold', 16)
+        pdf.drawCentredString(largeur / 2, hauteur - marge, "IDENTIFIANTS FIZATO")
+        pdf.setFont('Helvetica', 9)
+        pdf.drawCentredString(largeur / 2, hauteur - marge - 14,
+                              f"Lot n°{lot.id} - Document confidentiel - À détruire après première connexion")
+        return hauteur - marge - 40
+
+    y = entete()
+    for page in _pages(lot):
+        for data in page:
+            if y - hauteur_bloc < marge:
+                pdf.showPage()
+                y = entete()
+            membre = data['membre']
+            pdf.roundRect(marge, y - hauteur_bloc + 0.3 * cm, largeur - 2 * marge, hauteur_bloc - 0.5 * cm, 6)
+            pdf.setFont('Helvetica-Bold', 12)
+            pdf.drawString(marge + 0.5 * cm, y - 0.8 * cm, f"{membre.prenom} {membre.nom}")
+            pdf.setFont('Helvetica', 10)
+            pdf.drawString(marge + 0.5 * cm, y - 1.35 * cm, membre.association.nom)
+            pdf.drawString(marge + 0.5 * cm, y - 2.0 * cm, f"Nom d'utilisateur : {data['username']}")
+            pdf.drawString(marge + 0.5 * cm, y - 2.5 * cm, f"Mot de passe : {data['password']}")
+            pdf.drawString(marge + 9 * cm, y - 2.0 * cm, f"N° Carte : {membre.numero_carte}")
+            y -= hauteur_bloc
+    pdf.showPage()
+    pdf.save()
+    instrumentation.incrementer('impressions.terminees')
@@ -0,0 +1,41 @@
+"""
+Compteurs d'instrumentation de l'application membres.
+
+Les compteurs sont conservés en mémoire dans le processus courant et
+protégés par un verrou : ils servent aux statistiques de cache, aux
+octets économisés par la compression, etc. Chaque incrément est aussi
+reporté dans les métriques partagées entre processus (metriques.py).
+"""
+import threading
+from collections import defaultdict
+
+from . import metriques
+
+_verrou = threading.Lock()
+_compteurs = defaultdict(int)
+
+
+def incrementer(nom, valeur=1):
+    """Ajoute `valeur` au compteur `nom`"""
+    with _verrou:
+        _compteurs[nom] += valeur
+    metriques.incrementer(f'instrumentation:{nom}', valeur)
+
+
+def lire(nom):
+    """Retourne la valeur actuelle du compteur `nom`"""
+    with _verrou:
+        return _compteurs.get(nom, 0)
+
+
+def instantane(prefixe=''):
+    """Copie de tous les compteurs (éventuellement filtrés par préfixe)"""
+    with _verrou:
+        return {nom: valeur for nom, valeur in _compteurs.items() if nom.startswith(prefixe)}
+
+
+def reinitialiser(prefixe=''):
+    """Remet à zéro les compteurs commençant par `prefixe`"""
+    with _verrou:
+        for nom in [nom for nom in _compteurs if nom.startswith(prefixe)]:
+            del _compteurs[nom]
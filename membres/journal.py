@@ -0,0 +1,203 @@
+"""
+Journal des modifications et flux de synchronisation incrémentale.
+
+Chaque création, modification ou suppression d'une association, d'un
+membre, d'une carte ou d'un élément du bureau (fonctions, membres du
+bureau, mandats, comité des doyens) ajoute une ligne à Changement, dans
+la même transaction que la modification elle-même :
+
+- les enregistrements individuels passent par les signaux (signals.py) ;
+- les traitements en masse (.update(), bulk_update, suppressions SQL de
+  suppression.py et purge.py) journalisent explicitement les lignes
+  touchées, sans charger les objets.
+
+L'identifiant de Changement est croissant et sert de curseur :
+lire_changements(curseur) retourne la page suivante, avec l'état actuel des
+objets modifiés. Un consommateur qui relance la lecture avec le dernier
+curseur reçu ne transfère que ce qui a changé depuis.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import (
+    Association, Membre, CarteMembre, FonctionBureau, MembreBureau, Mandat, ComiteDoyen, Changement,
+)
+
+TAILLE_LOT = 1000
+LIMITE_DEFAUT = 200
+LIMITE_MAXIMALE = 1000
+
+CREATION = Changement.ACTION_CREATION
+MODIFICATION = Changement.ACTION_MODIFICATION
+SUPPRESSION = Changement.ACTION_SUPPRESSION
+
+# Type d'objet publié dans le flux et champs transmis pour chaque modèle suivi
+MODELES_SUIVIS = {
+    Association: ('association', ['nom', 'devise', 'date_creation', 'logo_association', 'logo_universite', 'est_supprimee']),
+    Membre: ('membre', [
+        'association_id', 'nom', 'prenom', 'numero_carte', 'filiere', 'parcours', 'etablissement',
+        'date_naissance', 'email', 'telephone', 'adresse', 'photo',
+    ]),
+    CarteMembre: ('carte', ['membre_id', 'numero_unique', 'date_generation', 'est_imprimee', 'date_impression']),
+    FonctionBureau: ('fonction_bureau', ['nom', 'niveau_hierarchique', 'description']),
+    MembreBureau: ('membre_bureau', ['membre_id', 'fonction_id', 'mandat_id', 'date_debut', 'date_fin', 'est_actuel']),
+    Mandat: ('mandat', ['nom', 'date_debut', 'date_fin', 'est_actuel']),
+    ComiteDoyen: ('comite_doyen', ['membre_id', 'mandat_id', 'titre', 'date_nomination', 'date_fin', 'est_actif', 'ordre_affichage']),
+}
+_MODELES_PAR_TYPE = {type_objet: modele for modele, (type_objet, _) in MODELES_SUIVIS.items()}
+
+
+def est_suivi(modele):
+    return modele in MODELES_SUIVIS
+
+
+def journaliser(modele, ids, action):
+    """Ajoute une entrée `action` pour chaque identifiant de `ids` (modèle suivi)"""
+    type_objet = MODELES_SUIVIS[modele][0]
+    lot = []
+    for objet_id in ids:
+        lot.append(Changement(type_objet=type_objet, objet_id=objet_id, action=action))
+        if len(lot) >= TAILLE_LOT:
+            _inserer(lot)
+            lot = []
+    if lot:
+        _inserer(lot)
+
+
+def _inserer(lot):
+    # Date relevée au plus près de l'insertion : lire_changements s'y fie pour borner les pages
+    maintenant = timezone.now()
+    for changement in lot:
+        changement.date = maintenant
+    Changement.objects.bulk_create(lot)
+
+
+def journaliser_queryset(queryset, action):
+    """
+    Journalise les lignes de `queryset`, lues par identifiant seulement.
+    À appeler avant un .update() ou une suppression SQL, dans la même transaction.
+    """
+    if est_suivi(queryset.model):
+        journaliser(
+            queryset.model,
+            queryset.order_by().values_list('pk', flat=True).iterator(chunk_size=TAILLE_LOT),
+            action,
+        )
+
+
+def _etats(modele, ids):
+    """État actuel (champs publiés) des objets `ids`, en une requête"""
+    champs = MODELES_SUIVIS[modele][1]
+    fichiers = {
+        champ.name: champ.storage for champ in modele._meta.concrete_fields
+        if champ.name in champs and hasattr(champ, 'storage')
+    }
+    etats = {}
+    for ligne in modele._base_manager.filter(pk__in=ids).values('pk', *champs):
+        objet_id = ligne.pop('pk')
+        for nom, stockage in fichiers.items():
+            ligne[nom] = stockage.url(ligne[nom]) if ligne[nom] else ''
+        etats[objet_id] = ligne
+    return etats
+
+
+def _debut_ecritures_en_cours():
+    """
+    Début de la plus ancienne transaction d'écriture encore ouverte sur la
+    base (PostgreSQL), None s'il n'y en a pas ou pour les autres moteurs
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as curseur:
+        curseur.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE backend_xid IS NOT NULL AND datname = current_database() AND pid <> pg_backend_pid()"
+        )
+        return curseur.fetchone()[0]
+
+
+def limite_visibilite():
+    """
+    Date au-delà de laquelle les entrées du journal ne sont pas encore servies.
+
+    Une transaction encore ouverte peut valider plus tard des entrées
+    d'identifiant inférieur à celles déjà visibles ; un consommateur dont le
+    curseur les a dépassées les manquerait pour toujours. Les entrées sont
+    donc servies jusqu'à CHANGEMENTS_DELAI_VISIBILITE avant :
+
+    - l'instant présent sous SQLite, où les écritures sont sérialisées : le
+      délai ne couvre que l'écart entre la date d'une entrée et son insertion ;
+    - le début de la plus ancienne transaction d'écriture encore ouverte
+      sous PostgreSQL : ses entrées, datées après ce début, ne peuvent pas
+      précéder une entrée servie.
+
+    Les autres moteurs n'ont que le délai : une transaction plus longue que
+    lui peut y valider des entrées derrière un curseur déjà servi.
+    """
+    limite = timezone.now()
+    debut = _debut_ecritures_en_cours()
+    if debut is not None:
+        limite = min(limite, debut)
+    return limite - timedelta(seconds=getattr(settings, 'CHANGEMENTS_DELAI_VISIBILITE', 2))
+
+
+def lire_changements(curseur=0, limite=LIMITE_DEFAUT):
+    """
+    Page de changements postérieurs à `curseur` :
+    {'changements': [...], 'curseur': dernier curseur lu, 'suite': bool}.
+
+    Un objet modifié plusieurs fois dans la page n'apparaît qu'une fois, à
+    la position de son dernier changement, avec son état actuel (None s'il
+    a été supprimé depuis). La page s'arrête à la première entrée plus
+    récente que limite_visibilite() : elle et les suivantes attendent la
+    page suivante.
+    """
+    limite = max(1, min(limite, LIMITE_MAXIMALE))
+    visibles = limite_visibilite()
+    entrees = list(
+        Changement.objects.filter(id__gt=curseur)
+        .order_by('id').values_list('id', 'type_objet', 'objet_id', 'action', 'date')[:limite + 1]
+    )
+    # Une entrée plus ancienne qu'une précédente (insérée plus tard) ne fait pas avancer le curseur au-delà
+    recente = next((i for i, entree in enumerate(entrees) if entree[4] > visibles), None)
+    if recente is not None:
+        entrees = entrees[:recente]
+    suite = recente is None and len(entrees) > limite
+    entrees = entrees[:limite]
+
+    derniers = {}
+    for entree in entrees:
+        cle = (entree[1], entree[2])
+        precedente = derniers.pop(cle, None)
+        if precedente and precedente[3] == CREATION and entree[3] != SUPPRESSION:
+            # Créé puis modifié dans la même page : reste une création
+            entree = (*entree[:3], CREATION, entree[4])
+        derniers[cle] = entree
+
+    ids_par_type = {}
+    for type_objet, objet_id in derniers:
+        ids_par_type.setdefault(type_objet, []).append(objet_id)
+    etats = {
+        type_objet: _etats(_MODELES_PAR_TYPE[type_objet], ids)
+        for type_objet, ids in ids_par_type.items() if type_objet in _MODELES_PAR_TYPE
+    }
+
+    changements = [
+        {
+            'curseur': entree_id,
+            'type': type_objet,
+            'id': objet_id,
+            'action': action,
+            'date': date.isoformat(),
+            'donnees': etats.get(type_objet, {}).get(objet_id),
+        }
+        for entree_id, type_objet, objet_id, action, date in derniers.values()
+    ]
+    return {
+        'changements': changements,
+        'curseur': entrees[-1][0] if entrees else curseur,
+        'suite': suite,
+    }
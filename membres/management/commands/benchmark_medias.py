@@ -0,0 +1,65 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.views.static import serve
+
+from membres.medias import dossiers_upload, parcourir
+from membres.views import servir_media
+
+
+class Command(BaseCommand):
+    help = 'Comparer le débit de servir_media avec django.views.static.serve (ancien chemin DEBUG)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requetes', type=int, default=500, help='Nombre de requêtes par scénario')
+        parser.add_argument('--fichier', type=str, help='Chemin relatif à MEDIA_ROOT (défaut : premier fichier trouvé)')
+
+    def _mesurer(self, vue, requete, nombre, **kwargs):
+        octets = 0
+        debut = time.perf_counter()
+        for _ in range(nombre):
+            response = vue(requete, **kwargs)
+            if response.streaming:
+                octets += sum(len(bloc) for bloc in response.streaming_content)
+            else:
+                octets += len(response.content)
+            response.close()
+        duree = time.perf_counter() - debut
+        return nombre / duree, octets / nombre, response.status_code
+
+    def handle(self, *args, **options):
+        chemin = options['fichier']
+        if not chemin:
+            for dossier in dossiers_upload():
+                chemin = next((relatif for relatif, _ in parcourir(str(settings.MEDIA_ROOT), dossier)), None)
+                if chemin:
+                    break
+        if not chemin:
+            raise CommandError('Aucun fichier média à servir.')
+
+        nombre = options['requetes']
+        factory = RequestFactory()
+        utilisateur = User(username='benchmark', is_staff=True)
+
+        def requete(**en_tetes):
+            r = factory.get(f'/{settings.MEDIA_URL}{chemin}', **en_tetes)
+            r.user = utilisateur
+            return r
+
+        premiere = servir_media(requete(), chemin=chemin)
+        etag = premiere['ETag']
+        premiere.close()
+
+        scenarios = [
+            ('static.serve (GET complet)', serve, requete(), {'path': chemin, 'document_root': settings.MEDIA_ROOT}),
+            ('servir_media (GET complet)', servir_media, requete(), {'chemin': chemin}),
+            ('servir_media (If-None-Match)', servir_media, requete(HTTP_IF_NONE_MATCH=etag), {'chemin': chemin}),
+            ('servir_media (Range 0-1023)', servir_media, requete(HTTP_RANGE='bytes=0-1023'), {'chemin': chemin}),
+        ]
+        self.stdout.write(f'Fichier : {chemin} ({nombre} requêtes par scénario)')
+        for libelle, vue, r, kwargs in scenarios:
+            debit, octets, statut = self._mesurer(vue, r, nombre, **kwargs)
+            self.stdout.write(f'  {libelle:<32} {debit:>9.0f} req/s  {octets:>9.0f} octets/réponse  (HTTP {statut})')
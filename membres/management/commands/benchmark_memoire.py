@@ -0,0 +1,106 @@
+import uuid
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from membres.hors_ligne import generer_paquet
+from membres.memoire import mesurer
+from membres.models import Association, Membre, CarteMembre, normaliser_recherche
+from membres.views import liste_membres, generer_cartes, print_cartes_multiples
+
+TAILLE_LOT = 1000
+
+
+class Annulation(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Mesurer le pic mémoire des impressions, listes et exports et le comparer à des plafonds (base laissée intacte)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--membres', type=int, default=2000, help='Nombre de membres créés pour la mesure')
+        parser.add_argument('--plafond-liste', type=float, default=32, help='Pic maximal de liste_membres (Mo)')
+        parser.add_argument('--plafond-generer', type=float, default=24, help='Pic maximal de generer_cartes (Mo)')
+        parser.add_argument('--plafond-impression', type=float, default=8, help='Pic maximal de print_cartes_multiples, 20 cartes (Mo)')
+        parser.add_argument('--plafond-paquet', type=float, default=4, help='Pic maximal du paquet de vérification hors ligne (Mo)')
+        parser.add_argument('--sites', action='store_true', help='Afficher les principaux sites d\'allocation')
+
+    def _creer_donnees(self, nombre):
+        association = Association.objects.create(nom='Banc d\'essai mémoire')
+        code = association.get_unique_code()
+        marque = uuid.uuid4().hex[:8]
+        for debut in range(0, nombre, TAILLE_LOT):
+            membres = []
+            for i in range(debut, min(debut + TAILLE_LOT, nombre)):
+                nom, prenom = f'Banc{i}', f'Memoire{i}'
+                membres.append(Membre(
+                    association=association, nom=nom, prenom=prenom,
+                    numero_cin=f'B{marque}{i}', numero_carte=f'{i:05d}{code}{marque}',
+                    filiere='Informatique', parcours='Licence', etablissement='Université',
+                    cle_nom=normaliser_recherche(f'{nom} {prenom}'),
+                    cle_prenom=normaliser_recherche(f'{prenom} {nom}'),
+                ))
+            membres = Membre.objects.bulk_create(membres)
+            CarteMembre.objects.bulk_create([CarteMembre(membre=membre) for membre in membres])
+        return list(Membre.objects.filter(association=association).values_list('id', flat=True)[:20])
+
+    def _scenarios(self, ids):
+        factory = RequestFactory()
+        utilisateur = User.objects.create(username=f'banc-memoire-{uuid.uuid4().hex[:8]}', is_staff=True)
+        sessions = import_module(settings.SESSION_ENGINE)
+
+        def requete(chemin):
+            r = factory.get(chemin)
+            r.user = utilisateur
+            r.session = sessions.SessionStore()
+            return r
+
+        membres_ids = ','.join(str(i) for i in ids)
+        return [
+            ('liste_membres', 'plafond_liste', lambda: liste_membres(requete('/membres/'))),
+            ('generer_cartes', 'plafond_generer', lambda: generer_cartes(requete('/cartes/generer/'))),
+            ('print_cartes_multiples', 'plafond_impression',
+             lambda: print_cartes_multiples(requete(f'/cartes/imprimer-multiples/{membres_ids}/'), membres_ids)),
+            ('paquet_verification', 'plafond_paquet', lambda: sum(len(morceau) for morceau in generer_paquet())),
+        ]
+
+    def handle(self, *args, **options):
+        if options['membres'] < 1:
+            raise CommandError('--membres doit être positif.')
+
+        mesures = []
+        try:
+            # Tout est annulé à la fin : le banc d'essai ne laisse aucune donnée
+            with transaction.atomic():
+                ids = self._creer_donnees(options['membres'])
+                for nom, plafond, scenario in self._scenarios(ids):
+                    with mesurer(nom, forcer=True) as mesure:
+                        scenario()
+                    if mesure is None:
+                        raise CommandError('Une autre mesure mémoire est en cours dans ce processus.')
+                    mesures.append((mesure, options[plafond]))
+                raise Annulation
+        except Annulation:
+            pass
+
+        self.stdout.write(f'{options["membres"]} membres')
+        depassements = []
+        for mesure, plafond in mesures:
+            pic = mesure.pic / 1024 / 1024
+            ligne = f'  {mesure.nom:<24} pic {pic:8.2f} Mo  (plafond {plafond:g} Mo)'
+            if pic > plafond:
+                depassements.append(mesure.nom)
+                self.stdout.write(self.style.ERROR(ligne))
+            else:
+                self.stdout.write(ligne)
+            if options['sites']:
+                for emplacement, taille, nombre in mesure.sites:
+                    self.stdout.write(f'      {taille / 1024:>10.1f} Ko  {nombre:>8} blocs  {emplacement}')
+        if depassements:
+            raise CommandError(f'Plafond mémoire dépassé : {", ".join(depassements)}')
+        self.stdout.write(self.style.SUCCESS('Tous les pics sont sous leur plafond.'))
@@ -0,0 +1,74 @@
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from membres.models import CarteMembre, Evenement
+from membres.pointages import TAILLE_LOT_MAX, enregistrer_pointages
+from membres.verification import jeton_carte
+
+
+class Annulation(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mesurer le débit d'enregistrement des pointages (base laissée intacte)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scans', type=int, default=10000, help='Nombre de scans envoyés')
+        parser.add_argument('--lot', type=int, default=TAILLE_LOT_MAX, help=f'Scans par lot (max {TAILLE_LOT_MAX})')
+        parser.add_argument('--doublons', type=float, default=0.1, help='Part des scans renvoyés une seconde fois (0 à 1)')
+
+    def _envoyer(self, evenement_id, scans, taille_lot):
+        debut = time.perf_counter()
+        totaux = {'acceptes': 0, 'doublons': 0, 'refuses': 0}
+        for position in range(0, len(scans), taille_lot):
+            resultat = enregistrer_pointages(evenement_id, scans[position:position + taille_lot])
+            totaux['acceptes'] += resultat['acceptes']
+            totaux['doublons'] += len(resultat['doublons'])
+            totaux['refuses'] += len(resultat['refuses'])
+        return time.perf_counter() - debut, totaux
+
+    def handle(self, *args, **options):
+        taille_lot = options['lot']
+        if not 0 < taille_lot <= TAILLE_LOT_MAX:
+            raise CommandError(f'--lot doit être compris entre 1 et {TAILLE_LOT_MAX}.')
+        jetons = [jeton_carte(numero) for numero in CarteMembre.objects.values_list('numero_unique', flat=True)[:5000]]
+        if not jetons:
+            raise CommandError('Aucune carte à scanner.')
+
+        maintenant = timezone.now().isoformat()
+        scans = [
+            {'id': str(uuid.uuid4()), 'jeton': random.choice(jetons), 'date': maintenant, 'appareil': f'banc-{i % 8}'}
+            for i in range(options['scans'])
+        ]
+        renvois = random.sample(scans, int(len(scans) * options['doublons']))
+
+        try:
+            # Tout est annulé à la fin : le banc d'essai ne laisse aucune donnée
+            with transaction.atomic():
+                evenement = Evenement.objects.create(nom='Banc d\'essai pointages', date=timezone.localdate())
+                duree, totaux = self._envoyer(evenement.id, scans, taille_lot)
+                duree_renvois, totaux_renvois = self._envoyer(evenement.id, renvois, taille_lot)
+                evenement.refresh_from_db()
+                raise Annulation
+        except Annulation:
+            pass
+
+        self.stdout.write(f'Cartes distinctes : {len(jetons)}, lots de {taille_lot} scans')
+        self.stdout.write(
+            f'  Premier envoi : {len(scans)} scans en {duree:.2f} s ({len(scans) / duree:.0f} scans/s), '
+            f'{totaux["acceptes"]} acceptés, {totaux["refuses"]} refusés'
+        )
+        if renvois:
+            self.stdout.write(
+                f'  Renvoi : {len(renvois)} scans en {duree_renvois:.2f} s ({len(renvois) / duree_renvois:.0f} scans/s), '
+                f'{totaux_renvois["doublons"]} doublons ignorés'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Compteurs de l\'événement : {evenement.nombre_scans} scans, {evenement.nombre_presents} présents'
+        ))
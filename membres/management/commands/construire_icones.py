@@ -0,0 +1,32 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.utils import get_app_template_dirs
+
+from membres.icones import classes_utilisees, construire
+from membres.memoire import CommandeMesuree
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = "Générer css/icones.css et une police d'icônes réduite aux glyphes utilisés par les templates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--static', help='Dossier static de destination (défaut : premier STATICFILES_DIRS)')
+
+    def handle(self, *args, **options):
+        try:
+            import fontTools  # noqa: F401
+        except ImportError:
+            raise CommandError('fontTools est requis : pip install fonttools brotli')
+
+        racine = options['static'] or str(settings.STATICFILES_DIRS[0])
+        dossiers = [str(d) for moteur in settings.TEMPLATES for d in moteur.get('DIRS', [])]
+        dossiers += [str(d) for d in get_app_template_dirs('templates')]
+        classes = classes_utilisees(dossiers)
+        self.stdout.write(f'{len(classes)} classe(s) fa-* trouvée(s) dans les templates')
+
+        ecrits, glyphes = construire(racine, classes)
+        for chemin in ecrits:
+            self.stdout.write(f'  {os.path.relpath(chemin, racine)} ({os.path.getsize(chemin) / 1024:.1f} Ko)')
+        self.stdout.write(self.style.SUCCESS(f'{glyphes} glyphe(s) conservé(s).'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from membres.hors_ligne import generer_paquet, version_courante
+from membres.memoire import CommandeMesuree
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = 'Exporter le paquet signé de vérification hors ligne des cartes (lecteurs sans connexion)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sortie', help='Fichier à écrire')
+        parser.add_argument('--depuis', type=int, default=0, help='Version déjà connue des appareils : paquet différentiel (défaut : paquet complet)')
+
+    def handle(self, *args, **options):
+        depuis = options['depuis']
+        if depuis < 0:
+            raise CommandError('--depuis doit être positif.')
+        version = version_courante()
+        octets = 0
+        with open(options['sortie'], 'wb') as fichier:
+            for morceau in generer_paquet(depuis, version):
+                fichier.write(morceau)
+                octets += len(morceau)
+        genre = 'différentiel' if depuis else 'complet'
+        self.stdout.write(self.style.SUCCESS(
+            f'Paquet {genre} version {version} écrit dans {options["sortie"]} ({octets / 1024:.1f} Ko).'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from membres.memoire import CommandeMesuree
+from membres.suppression import finaliser_suppressions
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = 'Terminer la suppression des associations masquées (suppression interrompue)'
+
+    def handle(self, *args, **options):
+        def progression(nb_membres):
+            self.stdout.write(f'  {nb_membres} membre(s) supprimé(s)')
+
+        total = finaliser_suppressions(progression)
+        self.stdout.write(self.style.SUCCESS(f'{total} association(s) supprimée(s) définitivement.'))
@@ -0,0 +1,39 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from membres.medias import dossiers_nettoyables, fichiers_orphelins
+from membres.memoire import CommandeMesuree
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = 'Supprimer les fichiers média (photos, logos) qui ne sont plus référencés en base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Lister les fichiers orphelins sans les supprimer')
+        parser.add_argument('--delai-grace', type=float, default=24, help='Ignorer les fichiers modifiés depuis moins de N heures (défaut : 24)')
+        parser.add_argument('--dossier', action='append', dest='dossiers', help='Dossier de MEDIA_ROOT à examiner (répétable, défaut : dossiers d\'upload des modèles et dérivés)')
+
+    def handle(self, *args, **options):
+        dossiers = options['dossiers'] or dossiers_nettoyables()
+        dry_run = options['dry_run']
+        self.stdout.write(f'Dossiers examinés : {", ".join(dossiers)}')
+
+        nombre = 0
+        octets = 0
+        for relatif, taille in fichiers_orphelins(dossiers, delai_grace=options['delai_grace'] * 3600):
+            nombre += 1
+            octets += taille
+            if dry_run:
+                self.stdout.write(f'  {relatif} ({taille} octets)')
+                continue
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, relatif))
+            except OSError as e:
+                self.stdout.write(self.style.ERROR(f'  Échec pour {relatif} : {e}'))
+                nombre -= 1
+                octets -= taille
+
+        action = 'à supprimer' if dry_run else 'supprimé(s)'
+        self.stdout.write(self.style.SUCCESS(f'{nombre} fichier(s) orphelin(s) {action}, {octets / 1024:.1f} Ko.'))
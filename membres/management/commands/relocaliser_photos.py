@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from membres.medias import relocaliser
+from membres.memoire import CommandeMesuree
+from membres.models import Membre
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = 'Déplacer les photos des membres dans des sous-dossiers hachés et mettre à jour la base'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=500, help='Nombre de membres traités par lot')
+
+    def handle(self, *args, **options):
+        def progression(deplaces, introuvables):
+            self.stdout.write(f'  {deplaces} photo(s) déplacée(s), {introuvables} introuvable(s)')
+
+        deplaces, introuvables = relocaliser(Membre, 'photo', options['taille_lot'], progression)
+        self.stdout.write(self.style.SUCCESS(f'{deplaces} photo(s) déplacée(s).'))
+        if introuvables:
+            self.stdout.write(self.style.WARNING(f'{introuvables} photo(s) référencée(s) mais absente(s) du disque.'))
@@ -0,0 +1,100 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from membres.taches import identifiant_travailleur, liberer_travailleur, travailler
+
+
+class Arret:
+    """
+    Demande d'arrêt partagée entre les processus : un simple octet en mémoire
+    partagée, sans verrou (un multiprocessing.Event reste bloqué quand un
+    processus est tué pendant qu'il l'attend).
+    """
+
+    def __init__(self):
+        self._drapeau = multiprocessing.RawValue('b', 0)
+
+    def set(self):
+        self._drapeau.value = 1
+
+    def is_set(self):
+        return bool(self._drapeau.value)
+
+    def wait(self, delai):
+        fin = time.monotonic() + delai
+        while not self.is_set() and time.monotonic() < fin:
+            time.sleep(min(0.2, delai))
+        return self.is_set()
+
+
+def _processus_travailleur(arret, intervalle, jusqu_a_vide):
+    """Point d'entrée d'un processus travailleur"""
+    import django
+    django.setup()
+    # L'arrêt passe par le superviseur : la tâche en cours va toujours à son terme
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    travailler(identifiant_travailleur(), arret, intervalle, jusqu_a_vide)
+
+
+class Command(BaseCommand):
+    help = 'Exécuter les tâches en file (membres.taches) avec un groupe de processus travailleurs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Nombre de processus travailleurs')
+        parser.add_argument('--intervalle', type=float, default=1.0, help='Attente entre deux consultations d\'une file vide (secondes)')
+        parser.add_argument('--jusqu-a-vide', action='store_true', help='S\'arrêter quand la file est vide (cron, déploiement)')
+
+    def handle(self, *args, **options):
+        concurrence = options['concurrency']
+        if concurrence < 1:
+            raise CommandError('--concurrency doit être au moins 1.')
+
+        arret = Arret()
+
+        def demander_arret(signum, frame):
+            if arret.is_set():
+                # Deuxième demande : arrêt immédiat, les tâches interrompues repartiront en file
+                for processus in list(groupe.values()):
+                    processus.kill()
+            else:
+                self.stdout.write('Arrêt demandé : fin des tâches en cours...')
+                arret.set()
+
+        signal.signal(signal.SIGINT, demander_arret)
+        signal.signal(signal.SIGTERM, demander_arret)
+
+        groupe = {}
+
+        def demarrer():
+            processus = multiprocessing.Process(
+                target=_processus_travailleur,
+                args=(arret, options['intervalle'], options['jusqu_a_vide']),
+            )
+            processus.start()
+            groupe[processus.pid] = processus
+
+        # Chaque processus ouvre ses propres connexions à la base
+        connections.close_all()
+        for _ in range(concurrence):
+            demarrer()
+        self.stdout.write(f'{concurrence} travailleur(s) démarré(s).')
+
+        while groupe:
+            time.sleep(1.0)
+            for pid, processus in list(groupe.items()):
+                if processus.is_alive():
+                    continue
+                processus.join()
+                del groupe[pid]
+                if processus.exitcode != 0:
+                    # Arrêt brutal : sa tâche en cours repart en file (tentative comptée)
+                    liberer_travailleur(identifiant_travailleur(pid))
+                    self.stderr.write(f'Travailleur {pid} arrêté (code {processus.exitcode}).')
+                    if not arret.is_set() and not options['jusqu_a_vide']:
+                        demarrer()
+        self.stdout.write(self.style.SUCCESS('Travailleurs arrêtés.'))
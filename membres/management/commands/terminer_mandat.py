@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from membres.mandats import cloturer_mandat, MandatDejaTermine
+from membres.memoire import CommandeMesuree
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = 'Terminer le mandat actuel, archiver le bureau et créer le mandat suivant'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-fin', type=date.fromisoformat, help='Date de fin du mandat (AAAA-MM-JJ, défaut : aujourd\'hui)')
+        parser.add_argument('--nom', type=str, help='Nom du nouveau mandat (défaut : <année+1>-<année+2>)')
+        parser.add_argument('--sans-nouveau-mandat', action='store_true', help='Ne pas créer de nouveau mandat')
+        parser.add_argument('--garder-doyens', action='store_true', help='Ne pas archiver le comité des doyens')
+
+    def handle(self, *args, **options):
+        try:
+            resultat = cloturer_mandat(
+                date_fin=options['date_fin'],
+                archiver_doyens=not options['garder_doyens'],
+                creer_suivant=not options['sans_nouveau_mandat'],
+                nom_suivant=options['nom'],
+            )
+        except MandatDejaTermine as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Mandat "{resultat.mandat.nom}" terminé le {resultat.mandat.date_fin:%d/%m/%Y}.\n'
+            f'{resultat.nb_bureau} membre(s) du bureau et {resultat.nb_doyens} membre(s) du comité des doyens archivés.'
+        ))
+        if resultat.nouveau_mandat:
+            self.stdout.write(self.style.SUCCESS(f'Nouveau mandat "{resultat.nouveau_mandat.nom}" créé et activé.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from membres.memoire import CommandeMesuree
+from membres.purge import TAILLE_LOT, purger_historique, purger_mandat
+
+
+class Command(CommandeMesuree, BaseCommand):
+    help = 'Supprimer les mandats terminés et leurs archives, par lots (peut être relancée sans risque)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mandat', type=int, help='Ne supprimer que ce mandat archivé')
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT, help='Nombre de lignes supprimées par transaction')
+
+    def handle(self, *args, **options):
+        def progression(etape, nb_supprimes):
+            self.stdout.write(f'  {etape} : {nb_supprimes} ligne(s) supprimée(s)')
+
+        if options['mandat']:
+            rapport = purger_mandat(options['mandat'], options['taille_lot'], progression)
+        else:
+            rapport = purger_historique(options['taille_lot'], progression)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{rapport.mandats} mandat(s), {rapport.bureau} membre(s) du bureau et '
+            f'{rapport.comite} membre(s) du comité des doyens supprimés.'
+        ))
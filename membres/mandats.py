@@ -0,0 +1,83 @@
+"""
+Clôture des mandats du bureau FIZATO.
+
+La clôture se fait dans une seule transaction : le mandat actuel est
+verrouillé puis marqué terminé par un UPDATE conditionnel (un second
+administrateur qui clôture en même temps obtient MandatDejaTermine), les
+membres du bureau et du comité des doyens sont archivés par des UPDATE
+ensemblistes et le mandat suivant est créé si demandé.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .journal import MODIFICATION, journaliser, journaliser_queryset
+from .models import Mandat, MembreBureau, ComiteDoyen
+
+ResultatCloture = namedtuple('ResultatCloture', ['mandat', 'nb_bureau', 'nb_doyens', 'nouveau_mandat'])
+
+
+class MandatDejaTermine(Exception):
+    """Aucun mandat actuel à clôturer (déjà terminé ou inexistant)"""
+
+
+def nom_mandat_suivant(date_fin):
+    """Nom par défaut du mandat créé après une clôture : <année+1>-<année+2>"""
+    return f"{date_fin.year + 1}-{date_fin.year + 2}"
+
+
+def cloturer_mandat(mandat=None, date_fin=None, archiver_doyens=True, creer_suivant=True, nom_suivant=None):
+    """
+    Termine le mandat actuel (ou `mandat`) et archive le bureau qui lui est rattaché.
+
+    Retourne un ResultatCloture ; lève MandatDejaTermine si le mandat n'est
+    plus actuel au moment du verrouillage.
+    """
+    date_fin = date_fin or timezone.now().date()
+    # Les UPDATE ensemblistes ne passent pas par auto_now (validateurs HTTP, voir conditionnel.py)
+    maintenant = timezone.now()
+
+    with transaction.atomic():
+        mandats = Mandat.objects.select_for_update().filter(est_actuel=True)
+        if mandat is not None:
+            mandats = mandats.filter(pk=mandat.pk)
+        mandat_actuel = mandats.first()
+        if mandat_actuel is None:
+            raise MandatDejaTermine("Aucun mandat actuel trouvé.")
+
+        # UPDATE conditionnel : sans effet si un autre administrateur vient de clôturer
+        if not Mandat.objects.filter(pk=mandat_actuel.pk, est_actuel=True).update(est_actuel=False, date_fin=date_fin, updated_at=maintenant):
+            raise MandatDejaTermine(f'Le mandat "{mandat_actuel.nom}" a déjà été terminé.')
+        journaliser(Mandat, [mandat_actuel.pk], MODIFICATION)
+        mandat_actuel.est_actuel = False
+        mandat_actuel.date_fin = date_fin
+
+        journaliser_queryset(MembreBureau.objects.filter(est_actuel=True), MODIFICATION)
+        nb_bureau = MembreBureau.objects.filter(est_actuel=True).update(
+            est_actuel=False,
+            date_fin=date_fin,
+            mandat=mandat_actuel,
+            updated_at=maintenant,
+        )
+
+        nb_doyens = 0
+        if archiver_doyens:
+            journaliser_queryset(ComiteDoyen.objects.filter(est_actif=True), MODIFICATION)
+            nb_doyens = ComiteDoyen.objects.filter(est_actif=True).update(
+                est_actif=False,
+                date_fin=date_fin,
+                mandat=mandat_actuel,
+                updated_at=maintenant,
+            )
+
+        nouveau_mandat = None
+        if creer_suivant:
+            nouveau_mandat = Mandat.objects.create(
+                nom=nom_suivant or nom_mandat_suivant(date_fin),
+                description=f"Mandat automatiquement créé après la fin du mandat {mandat_actuel.nom}",
+                date_debut=date_fin,
+                est_actuel=True,
+            )
+
+    return ResultatCloture(mandat_actuel, nb_bureau, nb_doyens, nouveau_mandat)
@@ -0,0 +1,396 @@
+"""
+Outils autour des fichiers média (photos des membres, logos).
+"""
+import hashlib
+import os
+import re
+import secrets
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils.deconstruct import deconstructible
+from django.utils.text import slugify
+
+TAILLE_PAQUET = 2000
+# Dérivés d'images (logos réduits, miniatures...) : derives/<nom de la source sans extension>_<largeur>_<empreinte>.png
+DOSSIER_DERIVES = 'derives'
+_DERIVE = re.compile(rf'^{DOSSIER_DERIVES}/(.+)_\d+_[0-9a-f]{{8}}\.png$')
+
+# Jeton ajouté par CheminHache (_1a2b3c4d.jpg) ; voir est_versionne
+_JETON = re.compile(r'_[0-9a-f]{8}\.[A-Za-z0-9]+$')
+DUREE_IMMUABLE = 365 * 24 * 3600
+DUREE_STANDARD = 3600
+
+
+def chemin_hache(dossier, nom, niveaux=2):
+    """
+    Range `nom` dans des sous-dossiers tirés de son empreinte :
+    photos/membres/Judi.jpg -> photos/membres/3f/a2/Judi.jpg
+    """
+    empreinte = hashlib.md5(nom.encode('utf-8')).hexdigest()
+    prefixes = [empreinte[2 * i:2 * i + 2] for i in range(niveaux)]
+    return '/'.join([dossier.strip('/'), *prefixes, nom])
+
+
+@deconstructible
+class CheminHache:
+    """
+    upload_to qui répartit les fichiers dans `niveaux` sous-dossiers de deux
+    caractères hexadécimaux (256 entrées par niveau au maximum).
+
+    Un jeton aléatoire est ajouté au nom : le fichier n'existe donc jamais
+    déjà et le stockage ne fait qu'une seule vérification d'existence.
+    """
+    def __init__(self, dossier, niveaux=2):
+        self.dossier = dossier.strip('/')
+        self.niveaux = niveaux
+
+    def __call__(self, instance, filename):
+        base, extension = os.path.splitext(os.path.basename(filename))
+        nom = f"{slugify(base)[:50] or 'fichier'}_{secrets.token_hex(4)}{extension.lower()}"
+        return chemin_hache(self.dossier, nom, self.niveaux)
+
+    def est_range(self, nom):
+        """Vrai si `nom` suit déjà la répartition en sous-dossiers"""
+        parties = nom.split('/')
+        prefixe = self.dossier.split('/')
+        return (
+            parties[:len(prefixe)] == prefixe
+            and len(parties) == len(prefixe) + self.niveaux + 1
+        )
+
+    def __eq__(self, autre):
+        return isinstance(autre, CheminHache) and (self.dossier, self.niveaux) == (autre.dossier, autre.niveaux)
+
+
+def champs_fichiers():
+    """Liste des (modèle, [noms des champs fichier]) de tous les modèles installés"""
+    resultat = []
+    for modele in apps.get_models():
+        champs = [champ.name for champ in modele._meta.concrete_fields if isinstance(champ, models.FileField)]
+        if champs:
+            resultat.append((modele, champs))
+    return resultat
+
+
+def dossiers_upload():
+    """Dossiers (relatifs à MEDIA_ROOT) dans lesquels les champs fichier enregistrent"""
+    dossiers = set()
+    for modele, champs in champs_fichiers():
+        for nom in champs:
+            upload_to = modele._meta.get_field(nom).upload_to
+            dossier = upload_to if isinstance(upload_to, str) else getattr(upload_to, 'dossier', '')
+            if dossier:
+                dossiers.add(dossier.strip('/').split('{')[0].rstrip('/'))
+    return sorted(dossiers)
+
+
+def dossiers_nettoyables():
+    """Dossiers examinés par défaut par nettoyer_medias : dossiers d'upload et dérivés"""
+    return dossiers_upload() + [DOSSIER_DERIVES]
+
+
+def _empreinte(nom):
+    # 8 octets suffisent à distinguer les chemins et coûtent bien moins qu'une chaîne
+    return int.from_bytes(hashlib.blake2b(nom.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def fichiers_references(bases=None):
+    """
+    Empreintes de tous les chemins référencés en base. Si `bases` est un
+    ensemble, il reçoit aussi les empreintes des chemins sans extension
+    (sources possibles des dérivés).
+
+    Chaque modèle est lu en une seule passe (tous ses champs fichier dans la
+    même requête), en flux, sans instancier les objets.
+    """
+    references = set()
+    for modele, champs in champs_fichiers():
+        lignes = modele._base_manager.values_list(*champs).iterator(chunk_size=TAILLE_PAQUET)
+        for ligne in lignes:
+            for nom in ligne:
+                if nom:
+                    references.add(_empreinte(nom))
+                    if bases is not None:
+                        bases.add(_empreinte(os.path.splitext(nom)[0]))
+    return references
+
+
+def parcourir(racine, dossier=''):
+    """Parcourt récursivement `racine/dossier` avec os.scandir ; produit (chemin relatif, stat)"""
+    a_visiter = [dossier]
+    while a_visiter:
+        courant = a_visiter.pop()
+        try:
+            entrees = os.scandir(os.path.join(racine, courant))
+        except FileNotFoundError:
+            continue
+        with entrees:
+            for entree in entrees:
+                relatif = f'{courant}/{entree.name}' if courant else entree.name
+                if entree.is_dir(follow_symlinks=False):
+                    a_visiter.append(relatif)
+                elif entree.is_file(follow_symlinks=False):
+                    yield relatif, entree.stat(follow_symlinks=False)
+
+
+def fichiers_orphelins(dossiers=None, delai_grace=24 * 3600, racine=None):
+    """
+    Produit (chemin relatif, taille) des fichiers de MEDIA_ROOT qui ne sont
+    référencés par aucun champ fichier, et des dérivés (DOSSIER_DERIVES)
+    dont la source ne l'est plus.
+
+    Les fichiers modifiés depuis moins de `delai_grace` secondes sont ignorés
+    (envoi en cours, enregistrement pas encore validé...).
+    """
+    racine = str(racine or settings.MEDIA_ROOT)
+    dossiers = dossiers if dossiers is not None else dossiers_nettoyables()
+    bases = set()
+    references = fichiers_references(bases)
+    # Fichiers utilisés directement par les templates, sans référence en base
+    for nom in getattr(settings, 'MEDIAS_PROTEGES', []):
+        references.add(_empreinte(nom))
+        bases.add(_empreinte(os.path.splitext(nom)[0]))
+    limite = time.time() - delai_grace
+    for dossier in dossiers:
+        for relatif, stat in parcourir(racine, dossier):
+            if stat.st_mtime > limite:
+                continue
+            derive = _DERIVE.match(relatif)
+            if derive:
+                if _empreinte(derive.group(1)) not in bases:
+                    yield relatif, stat.st_size
+            elif _empreinte(relatif) not in references:
+                yield relatif, stat.st_size
+
+
+def relocaliser(modele, champ, taille_lot=500, progression=None):
+    """
+    Déplace les fichiers de `modele.champ` vers la répartition en sous-dossiers
+    de leur upload_to (CheminHache) et met à jour les chemins en base par lots.
+
+    Les fichiers sont déplacés avant la mise à jour de leur lot : si le
+    traitement est interrompu, le relancer retrouve les fichiers déjà déplacés.
+    Deux sources de même nom ne s'écrasent jamais : la seconde reçoit un nom
+    tiré de son ancien chemin (voir _destination).
+    Retourne (nombre déplacés, nombre introuvables).
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .journal import MODIFICATION, est_suivi, journaliser
+
+    upload_to = modele._meta.get_field(champ).upload_to
+    stockage = modele._meta.get_field(champ).storage
+    # bulk_update ne renseigne pas les champs auto_now : on date nous-mêmes le changement
+    horodatage = [
+        f.name for f in modele._meta.concrete_fields
+        if isinstance(f, models.DateTimeField) and f.auto_now
+    ]
+    deplaces = introuvables = 0
+    dernier_id = 0
+    while True:
+        lot = list(
+            modele._base_manager.filter(pk__gt=dernier_id).exclude(**{champ: ''}).exclude(**{f'{champ}__isnull': True})
+            .order_by('pk').only('pk', champ, *horodatage)[:taille_lot]
+        )
+        if not lot:
+            break
+        dernier_id = lot[-1].pk
+
+        a_mettre_a_jour = []
+        for objet in lot:
+            ancien = getattr(objet, champ).name
+            if upload_to.est_range(ancien):
+                continue
+            nouveau = _destination(modele, champ, objet.pk, ancien, upload_to, stockage)
+            if nouveau is None:
+                introuvables += 1
+                continue
+            source, destination = stockage.path(ancien), stockage.path(nouveau)
+            if os.path.exists(source):
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(source, destination)
+            setattr(objet, champ, nouveau)
+            for nom in horodatage:
+                setattr(objet, nom, timezone.now())
+            a_mettre_a_jour.append(objet)
+
+        if a_mettre_a_jour:
+            with transaction.atomic():
+                modele._base_manager.bulk_update(a_mettre_a_jour, [champ, *horodatage])
+                if est_suivi(modele):
+                    journaliser(modele, [objet.pk for objet in a_mettre_a_jour], MODIFICATION)
+            deplaces += len(a_mettre_a_jour)
+        if progression:
+            progression(deplaces, introuvables)
+    if deplaces:
+        from .cache import CACHE_STATS, invalider
+        from .navigation import ESPACE as ESPACE_NAVIGATION
+        # Les URL des photos ont changé, y compris celles mémorisées dans les sessions
+        invalider(CACHE_STATS, ESPACE_NAVIGATION)
+    return deplaces, introuvables
+
+
+def _destination(modele, champ, pk, ancien, upload_to, stockage):
+    """
+    Nouveau chemin de `ancien` dans la répartition de `upload_to` :
+
+    - son nom d'origine s'il est libre ;
+    - sinon un nom suffixé d'une empreinte de l'ancien chemin (propre à cette
+      source), rendu unique par le stockage s'il est lui aussi pris.
+
+    Si la source n'existe plus (reprise d'un traitement interrompu), le
+    fichier déjà déplacé est recherché sous ces deux noms, le nom d'origine
+    n'étant retenu que si aucun autre objet ne le référence. None s'il est
+    introuvable.
+    """
+    base, extension = os.path.splitext(os.path.basename(ancien))
+    original = chemin_hache(upload_to.dossier, base + extension, upload_to.niveaux)
+    suffixe = hashlib.md5(ancien.encode('utf-8')).hexdigest()[:8]
+    distinct = chemin_hache(upload_to.dossier, f'{base}_{suffixe}{extension}', upload_to.niveaux)
+
+    if os.path.exists(stockage.path(ancien)):
+        if not stockage.exists(original):
+            return original
+        if not stockage.exists(distinct):
+            return distinct
+        return stockage.get_available_name(distinct)
+
+    if stockage.exists(distinct):
+        return distinct
+    if stockage.exists(original) and not modele._base_manager.filter(**{champ: original}).exclude(pk=pk).exists():
+        return original
+    return None
+
+
+def derive_image(nom, largeur, stockage=None):
+    """
+    Nom d'une copie de l'image `nom` réduite à `largeur` pixels (PNG), créée au besoin.
+
+    Le nom du dérivé contient une empreinte de la taille et de la date du
+    fichier source : il change quand la source change et peut donc être
+    servi avec un cache immuable. Retourne None si la source est introuvable.
+    """
+    from django.core.files.storage import default_storage
+    from PIL import Image
+
+    stockage = stockage or default_storage
+    try:
+        source = stockage.path(nom)
+        stat = os.stat(source)
+    except (OSError, NotImplementedError):
+        return None
+    empreinte = hashlib.md5(f'{stat.st_size}:{stat.st_mtime_ns}:{largeur}'.encode()).hexdigest()[:8]
+    base = os.path.splitext(nom)[0]
+    derive = f'{DOSSIER_DERIVES}/{base}_{largeur}_{empreinte}.png'
+    destination = stockage.path(derive)
+    if not os.path.exists(destination):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with Image.open(source) as image:
+            image.thumbnail((largeur, largeur))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            # Écriture atomique : un autre processus peut produire le même dérivé
+            temporaire = f'{destination}.{os.getpid()}.tmp'
+            image.save(temporaire, format='PNG', optimize=True)
+        os.replace(temporaire, destination)
+    return derive
+
+
+def derives_de(nom, stockage=None):
+    """Noms des dérivés existants de l'image `nom` (toutes largeurs, toutes versions)"""
+    from django.core.files.storage import default_storage
+
+    stockage = stockage or default_storage
+    base = os.path.splitext(nom)[0]
+    dossier = os.path.dirname(f'{DOSSIER_DERIVES}/{base}')
+    try:
+        _, fichiers = stockage.listdir(dossier)
+    except (OSError, NotImplementedError):
+        return []
+    derives = []
+    for fichier in fichiers:
+        correspondance = _DERIVE.match(f'{dossier}/{fichier}')
+        if correspondance and correspondance.group(1) == base:
+            derives.append(f'{dossier}/{fichier}')
+    return derives
+
+
+class PlageInvalide(Exception):
+    """En-tête Range impossible à satisfaire (réponse 416)"""
+
+
+def etag_fichier(stat):
+    """ETag faible coût tiré de la taille et de la date de modification"""
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def est_versionne(chemin):
+    """
+    Vrai si `chemin` a été nommé par ce module et ne désigne donc jamais
+    qu'un seul contenu : dérivé d'image, ou fichier rangé par un upload_to
+    CheminHache (jeton dans le nom et sous-dossiers tirés de ce nom).
+    Un fichier déposé autrement dont le nom finit par 8 caractères
+    hexadécimaux n'est pas concerné.
+    """
+    if _DERIVE.match(chemin):
+        return True
+    nom = chemin.rpartition('/')[2]
+    if not _JETON.search(nom):
+        return False
+    for modele, champs in champs_fichiers():
+        for champ in champs:
+            upload_to = modele._meta.get_field(champ).upload_to
+            if isinstance(upload_to, CheminHache) and chemin == chemin_hache(upload_to.dossier, nom, upload_to.niveaux):
+                return True
+    return False
+
+
+def cache_control(chemin, prive=False):
+    """Valeur de Cache-Control : immuable pour les noms versionnés, une heure sinon"""
+    portee = 'private' if prive else 'public'
+    if est_versionne(chemin):
+        return f'{portee}, max-age={DUREE_IMMUABLE}, immutable'
+    return f'{portee}, max-age={DUREE_STANDARD}'
+
+
+def analyser_plage(entete, taille):
+    """
+    Analyse un en-tête Range portant sur une seule plage d'octets.
+
+    Retourne (début, fin incluse), None si l'en-tête doit être ignoré (plages
+    multiples, unité inconnue...) ; lève PlageInvalide si la plage est hors du fichier.
+    """
+    if not entete or not entete.startswith('bytes=') or ',' in entete:
+        return None
+    debut, _, fin = entete[len('bytes='):].strip().partition('-')
+    try:
+        if debut == '':
+            # bytes=-500 : les 500 derniers octets
+            longueur = int(fin)
+            if longueur <= 0:
+                raise PlageInvalide(entete)
+            return max(0, taille - longueur), taille - 1
+        debut = int(debut)
+        fin = int(fin) if fin else taille - 1
+    except ValueError:
+        return None
+    if debut >= taille or fin < debut:
+        raise PlageInvalide(entete)
+    return debut, min(fin, taille - 1)
+
+
+def lire_plage(chemin, debut, fin, taille_bloc=64 * 1024):
+    """Générateur des octets [debut, fin] d'un fichier, par blocs"""
+    with open(chemin, 'rb') as fichier:
+        fichier.seek(debut)
+        restant = fin - debut + 1
+        while restant > 0:
+            bloc = fichier.read(min(taille_bloc, restant))
+            if not bloc:
+                break
+            restant -= len(bloc)
+            yield bloc
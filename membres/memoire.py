@@ -0,0 +1,128 @@
+"""
+Mesure de la mémoire des traitements lourds (tracemalloc).
+
+Quand settings.MEMOIRE_ACTIVE est vrai, chaque appel d'un point d'entrée
+mesuré (vues d'impression et de listes, actions d'administration,
+commandes) est suivi par tracemalloc et journalise, sur le logger
+membres.memoire :
+
+- le pic d'allocation pendant l'appel, au-delà de la mémoire déjà allouée ;
+- la mémoire encore allouée à la fin de l'appel ;
+- les MEMOIRE_NOMBRE_SITES lignes de code ayant le plus alloué (allocations
+  encore vivantes en fin d'appel, rendu de la réponse compris).
+
+tracemalloc compte les allocations de tout le processus : une seule mesure
+a lieu à la fois, les appels concurrents ou imbriqués s'exécutent sans
+mesure. Les réponses en flux sont mesurées pendant leur envoi.
+"""
+import functools
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_verrou = threading.Lock()
+# Traces internes à exclure des sites d'allocation
+_FILTRES = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+def actif():
+    return getattr(settings, 'MEMOIRE_ACTIVE', False)
+
+
+class Mesure:
+    """Résultat d'une mesure : pic et mémoire finale (octets), sites d'allocation"""
+
+    def __init__(self, nom):
+        self.nom = nom
+        self.pic = 0
+        self.finale = 0
+        self.sites = []
+
+    def rapport(self):
+        lignes = [f'{self.nom} : pic {self.pic / 1024:.0f} Ko, fin {self.finale / 1024:.0f} Ko']
+        for emplacement, taille, nombre in self.sites:
+            lignes.append(f'  {taille / 1024:>10.1f} Ko  {nombre:>8} blocs  {emplacement}')
+        return '\n'.join(lignes)
+
+
+@contextmanager
+def mesurer(nom, forcer=False):
+    """
+    Mesure la mémoire allouée dans le bloc et la journalise. Produit la
+    Mesure (remplie à la sortie du bloc), ou None si aucune mesure n'a lieu
+    (mode inactif sans `forcer`, ou mesure déjà en cours).
+    """
+    if not (forcer or actif()) or not _verrou.acquire(blocking=False):
+        yield None
+        return
+    try:
+        demarre = not tracemalloc.is_tracing()
+        if demarre:
+            tracemalloc.start(getattr(settings, 'MEMOIRE_CADRES', 1))
+        mesure = Mesure(nom)
+        try:
+            avant = tracemalloc.take_snapshot().filter_traces(_FILTRES)
+            depart = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            yield mesure
+        finally:
+            actuelle, pic = tracemalloc.get_traced_memory()
+            apres = tracemalloc.take_snapshot().filter_traces(_FILTRES)
+            if demarre:
+                tracemalloc.stop()
+            mesure.pic = max(0, pic - depart)
+            mesure.finale = actuelle - depart
+            nombre = getattr(settings, 'MEMOIRE_NOMBRE_SITES', 10)
+            mesure.sites = [
+                (str(difference.traceback[0]), difference.size_diff, difference.count_diff)
+                for difference in apres.compare_to(avant, 'lineno')[:nombre]
+                if difference.size_diff > 0
+            ]
+            logger.info(mesure.rapport())
+    finally:
+        _verrou.release()
+
+
+def _flux_mesure(nom, contenu):
+    with mesurer(nom):
+        yield from contenu
+
+
+def mesure_memoire(nom=None):
+    """
+    Décorateur : mesure chaque appel de la fonction (vue, action
+    d'administration...) quand MEMOIRE_ACTIVE est vrai. Le contenu d'une
+    réponse en flux est mesuré à part, pendant son envoi.
+    """
+    def decorateur(fonction):
+        etiquette = nom or fonction.__qualname__
+
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if not actif():
+                return fonction(*args, **kwargs)
+            with mesurer(etiquette):
+                response = fonction(*args, **kwargs)
+            if getattr(response, 'streaming', False):
+                response.streaming_content = _flux_mesure(f'{etiquette} (flux)', response.streaming_content)
+            return response
+        return enveloppe
+    return decorateur
+
+
+class CommandeMesuree:
+    """Mixin à placer avant BaseCommand : mesure l'exécution de la commande"""
+
+    def execute(self, *args, **options):
+        with mesurer(f'commande.{self.__module__.rsplit(".", 1)[-1]}'):
+            return super().execute(*args, **options)
@@ -0,0 +1,344 @@
+"""
+Métriques au format Prometheus, agrégées entre les processus.
+
+Chaque processus écrit ses valeurs dans son propre fichier, projeté en
+mémoire (mmap) dans METRIQUES_DOSSIER : un incrément est une écriture de
+8 octets sous un verrou propre au processus, sans verrou entre processus.
+La vue /metrics relit tous les fichiers du dossier et additionne les
+valeurs de même clé.
+
+Format d'un fichier :
+
+    en-tête   8 octets    taille utilisée (u32) et remplissage
+    entrées   suite de    longueur de la clé (u32), clé JSON (UTF-8,
+                          complétée à un multiple de 8), valeur (double)
+
+Une entrée est écrite entièrement avant que la taille utilisée ne
+l'inclue : un lecteur ne voit jamais d'entrée partielle. Les valeurs des
+processus terminés restent comptées (ce sont des compteurs cumulés) : à
+chaque lecture, les fichiers dont le processus n'existe plus sont
+additionnés dans FICHIER_AGREGE puis supprimés (regrouper_processus_termines),
+ce qui borne le nombre de fichiers relus. Le dossier doit donc être propre
+à la machine : le numéro de processus n'y est vérifié que localement.
+
+Les compteurs de membres.instrumentation (cache, compression, médias,
+pointages...) sont reportés ici et publiés sous le nom fizato_<compteur>_total.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de regroupement des fichiers des processus terminés
+    fcntl = None
+
+PREFIXE = 'fizato'
+TAILLE_INITIALE = 64 * 1024
+ENTETE = struct.Struct('<I4x')
+LONGUEUR = struct.Struct('<I')
+VALEUR = struct.Struct('<d')
+# Valeurs cumulées des processus terminés
+FICHIER_AGREGE = 'agrege.db'
+
+# Limites supérieures des classes de l'histogramme des durées (secondes)
+CLASSES_DUREE = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Nom (sans préfixe) -> (type, description)
+METRIQUES = {
+    'requetes_total': ('counter', 'Requêtes HTTP traitées, par vue, méthode et statut'),
+    'requete_duree_secondes': ('histogram', 'Durée des requêtes HTTP par vue'),
+    'sql_requetes_total': ('counter', 'Requêtes SQL exécutées, par vue'),
+    'sql_duree_secondes_total': ('counter', 'Temps passé dans les requêtes SQL, par vue'),
+    'cache_hits_total': ('counter', 'Lectures de cache réussies'),
+    'cache_misses_total': ('counter', 'Lectures de cache manquées'),
+    'cache_invalidations_total': ('counter', 'Invalidations d\'espaces de cache'),
+    'cache_entrees': ('gauge', 'Entrées présentes dans les caches sur fichiers (partagés entre processus)'),
+    'impressions_demandees_total': ('counter', 'Impressions demandées (cartes, feuilles d\'identifiants)'),
+    'impressions_terminees_total': ('counter', 'Impressions rendues entièrement'),
+    'impressions_cartes_total': ('counter', 'Cartes imprimées'),
+    'taches_lancees_total': ('counter', 'Tâches mises en file'),
+    'taches_terminees_total': ('counter', 'Tâches terminées'),
+    'taches_reprises_total': ('counter', 'Tâches en échec replanifiées'),
+    'taches_echouees_total': ('counter', 'Tâches en échec définitif'),
+    'medias_octets_servis_total': ('counter', 'Octets de fichiers média servis'),
+}
+
+_verrou = threading.Lock()
+_stockage = None
+
+
+def actives():
+    return getattr(settings, 'METRIQUES_ACTIVES', True)
+
+
+def dossier():
+    return str(getattr(settings, 'METRIQUES_DOSSIER', os.path.join(settings.BASE_DIR, 'metriques')))
+
+
+def _cle(nom, etiquettes):
+    return json.dumps([nom, sorted(etiquettes.items())], separators=(',', ':'))
+
+
+def _remplissage(longueur):
+    return (8 - (LONGUEUR.size + longueur) % 8) % 8
+
+
+def _entrees(donnees):
+    """(clé, valeur, position de la valeur) des entrées d'un fichier"""
+    utilise = ENTETE.unpack_from(donnees, 0)[0] if len(donnees) >= ENTETE.size else 0
+    position = ENTETE.size
+    while position < utilise:
+        longueur = LONGUEUR.unpack_from(donnees, position)[0]
+        debut_cle = position + LONGUEUR.size
+        cle = bytes(donnees[debut_cle:debut_cle + longueur]).decode('utf-8')
+        position_valeur = debut_cle + longueur + _remplissage(longueur)
+        yield cle, VALEUR.unpack_from(donnees, position_valeur)[0], position_valeur
+        position = position_valeur + VALEUR.size
+
+
+class Stockage:
+    """Fichier de métriques d'un processus, projeté en mémoire"""
+
+    def __init__(self, chemin):
+        self.pid = os.getpid()
+        self._fichier = open(chemin, 'a+b')
+        taille = max(os.fstat(self._fichier.fileno()).st_size, TAILLE_INITIALE)
+        self._projeter(taille)
+        self._positions = {cle: position for cle, _, position in _entrees(self._mmap)}
+        self._utilise = max(ENTETE.unpack_from(self._mmap, 0)[0], ENTETE.size)
+
+    def _projeter(self, taille):
+        self._fichier.truncate(taille)
+        self._taille = taille
+        self._mmap = mmap.mmap(self._fichier.fileno(), taille)
+
+    def _nouvelle_entree(self, cle):
+        encodee = cle.encode('utf-8')
+        taille_entree = LONGUEUR.size + len(encodee) + _remplissage(len(encodee)) + VALEUR.size
+        if self._utilise + taille_entree > self._taille:
+            self._mmap.close()
+            self._projeter(max(self._taille * 2, self._utilise + taille_entree))
+        LONGUEUR.pack_into(self._mmap, self._utilise, len(encodee))
+        self._mmap[self._utilise + LONGUEUR.size:self._utilise + LONGUEUR.size + len(encodee)] = encodee
+        position = self._utilise + taille_entree - VALEUR.size
+        VALEUR.pack_into(self._mmap, position, 0.0)
+        self._utilise += taille_entree
+        # La taille utilisée n'inclut l'entrée qu'une fois celle-ci complète
+        ENTETE.pack_into(self._mmap, 0, self._utilise)
+        self._positions[cle] = position
+        return position
+
+    def ajouter(self, cle, valeur):
+        position = self._positions.get(cle)
+        if position is None:
+            position = self._nouvelle_entree(cle)
+        VALEUR.pack_into(self._mmap, position, VALEUR.unpack_from(self._mmap, position)[0] + valeur)
+
+    def fermer(self):
+        self._mmap.close()
+        self._fichier.close()
+
+
+def _ajouter(cle, valeur):
+    global _stockage
+    with _verrou:
+        # Après un fork, le processus enfant ouvre son propre fichier
+        if _stockage is None or _stockage.pid != os.getpid():
+            os.makedirs(dossier(), exist_ok=True)
+            _stockage = Stockage(os.path.join(dossier(), f'{os.getpid()}.db'))
+        _stockage.ajouter(cle, valeur)
+
+
+def incrementer(nom, valeur=1, **etiquettes):
+    """Ajoute `valeur` au compteur `nom` (sans le préfixe fizato_) pour ces étiquettes"""
+    if actives():
+        _ajouter(_cle(nom, etiquettes), valeur)
+
+
+def observer(nom, valeur, **etiquettes):
+    """Ajoute une observation `valeur` à l'histogramme `nom`"""
+    if not actives():
+        return
+    limite = next((str(classe) for classe in CLASSES_DUREE if valeur <= classe), '+Inf')
+    _ajouter(_cle(f'{nom}_bucket', {**etiquettes, 'le': limite}), 1)
+    _ajouter(_cle(f'{nom}_sum', etiquettes), valeur)
+    _ajouter(_cle(f'{nom}_count', etiquettes), 1)
+
+
+def _processus_existe(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processus d'un autre utilisateur : il existe
+        return True
+    return True
+
+
+def _lire_fichier(chemin):
+    with open(chemin, 'rb') as fichier:
+        return fichier.read()
+
+
+def regrouper_processus_termines():
+    """
+    Additionne dans FICHIER_AGREGE les fichiers des processus qui n'existent
+    plus, puis les supprime (comme mark_process_dead de prometheus_client).
+    Le nouvel agrégat remplace l'ancien d'un bloc (os.replace) avant la
+    suppression des fichiers regroupés. Retourne le nombre de fichiers regroupés.
+    """
+    if fcntl is None:
+        return 0
+    try:
+        noms = os.listdir(dossier())
+    except FileNotFoundError:
+        return 0
+    morts = [
+        nom for nom in noms
+        if nom.endswith('.db') and nom[:-3].isdigit()
+        and int(nom[:-3]) != os.getpid() and not _processus_existe(int(nom[:-3]))
+    ]
+    if not morts:
+        return 0
+    # Un seul regroupement à la fois (plusieurs processus servent /metrics)
+    with open(os.path.join(dossier(), 'regroupement.lock'), 'a') as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        try:
+            morts = [nom for nom in morts if os.path.exists(os.path.join(dossier(), nom))]
+            if not morts:
+                return 0
+            temporaire = os.path.join(dossier(), f'{FICHIER_AGREGE}.{os.getpid()}.tmp')
+            # Reste d'un regroupement interrompu : ses valeurs sont encore dans les fichiers d'origine
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            nouveau = Stockage(temporaire)
+            try:
+                for nom in [FICHIER_AGREGE] + morts:
+                    try:
+                        donnees = _lire_fichier(os.path.join(dossier(), nom))
+                    except FileNotFoundError:
+                        continue
+                    for cle, valeur, _ in _entrees(donnees):
+                        nouveau.ajouter(cle, valeur)
+            finally:
+                nouveau.fermer()
+            os.replace(temporaire, os.path.join(dossier(), FICHIER_AGREGE))
+            for nom in morts:
+                os.remove(os.path.join(dossier(), nom))
+        finally:
+            fcntl.flock(verrou, fcntl.LOCK_UN)
+    return len(morts)
+
+
+def lire():
+    """Valeurs agrégées de tous les processus : {(nom, étiquettes triées): valeur}"""
+    valeurs = {}
+    regrouper_processus_termines()
+    try:
+        noms = os.listdir(dossier())
+    except FileNotFoundError:
+        return valeurs
+    for nom_fichier in noms:
+        if not nom_fichier.endswith('.db'):
+            continue
+        try:
+            donnees = _lire_fichier(os.path.join(dossier(), nom_fichier))
+        except OSError:
+            continue
+        for cle, valeur, _ in _entrees(donnees):
+            nom, etiquettes = json.loads(cle)
+            cle = (nom, tuple(tuple(paire) for paire in etiquettes))
+            valeurs[cle] = valeurs.get(cle, 0.0) + valeur
+    return valeurs
+
+
+def _taille_cache(nom):
+    """
+    Nombre d'entrées d'un cache sur fichiers, None pour les autres moteurs :
+    un cache locmem est propre à chaque processus, sa taille vue depuis le
+    processus qui sert /metrics ne dit rien des autres.
+    """
+    from .cache import get_cache
+
+    cache = get_cache(nom)
+    if hasattr(cache, '_list_cache_files'):
+        return len(cache._list_cache_files())
+    return None
+
+
+def _nom_compteur(nom):
+    """Nom et étiquettes publiés d'un compteur de membres.instrumentation"""
+    parties = nom.split('.')
+    if parties[0] == 'cache' and len(parties) == 3:
+        return f'cache_{parties[2]}_total', {'cache': parties[1]}
+    return '_'.join(parties) + '_total', {}
+
+
+def _echapper(valeur):
+    return str(valeur).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _ligne(nom, etiquettes, valeur):
+    if etiquettes:
+        texte = ','.join(f'{cle}="{_echapper(v)}"' for cle, v in etiquettes)
+        nom = f'{nom}{{{texte}}}'
+    return f'{PREFIXE}_{nom} {int(valeur) if valeur == int(valeur) else repr(valeur)}'
+
+
+def exposition():
+    """Texte au format d'exposition Prometheus (version 0.0.4)"""
+    series = {}
+    for (nom, etiquettes), valeur in lire().items():
+        if nom.startswith('instrumentation:'):
+            nom, supplement = _nom_compteur(nom.split(':', 1)[1])
+            etiquettes = tuple(sorted(dict(etiquettes, **supplement).items()))
+        famille = nom
+        for suffixe in ('_bucket', '_sum', '_count'):
+            if nom.endswith(suffixe) and METRIQUES.get(nom[:-len(suffixe)], ('',))[0] == 'histogram':
+                famille = nom[:-len(suffixe)]
+        serie = series.setdefault(famille, {})
+        serie[(nom, etiquettes)] = serie.get((nom, etiquettes), 0.0) + valeur
+
+    for nom in getattr(settings, 'CACHES', {}):
+        taille = _taille_cache(nom)
+        if taille is not None:
+            series.setdefault('cache_entrees', {})[('cache_entrees', (('cache', nom),))] = taille
+
+    lignes = []
+    for famille in sorted(series):
+        type_metrique, aide = METRIQUES.get(famille, ('counter', 'Compteur de membres.instrumentation'))
+        lignes.append(f'# HELP {PREFIXE}_{famille} {aide}')
+        lignes.append(f'# TYPE {PREFIXE}_{famille} {type_metrique}')
+        if type_metrique == 'histogram':
+            lignes.extend(_histogramme(famille, series[famille]))
+        else:
+            for (nom, etiquettes), valeur in sorted(series[famille].items()):
+                lignes.append(_ligne(nom, etiquettes, valeur))
+    return '\n'.join(lignes) + '\n'
+
+
+def _histogramme(famille, valeurs):
+    """Lignes d'un histogramme : classes cumulées, somme et nombre par jeu d'étiquettes"""
+    groupes = {}
+    for (nom, etiquettes), valeur in valeurs.items():
+        autres = tuple(paire for paire in etiquettes if paire[0] != 'le')
+        groupe = groupes.setdefault(autres, {'classes': {}, 'sum': 0.0, 'count': 0.0})
+        if nom.endswith('_bucket'):
+            groupe['classes'][dict(etiquettes)['le']] = valeur
+        else:
+            groupe[nom.rsplit('_', 1)[1]] += valeur
+    lignes = []
+    for etiquettes, groupe in sorted(groupes.items()):
+        cumul = 0.0
+        for limite in [str(classe) for classe in CLASSES_DUREE] + ['+Inf']:
+            cumul += groupe['classes'].get(limite, 0.0)
+            lignes.append(_ligne(f'{famille}_bucket', etiquettes + (('le', limite),), cumul))
+        lignes.append(_ligne(f'{famille}_sum', etiquettes, groupe['sum']))
+        lignes.append(_ligne(f'{famille}_count', etiquettes, groupe['count']))
+    return lignes
@@ -0,0 +1,154 @@
+"""
+Middlewares de l'application membres.
+"""
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import SimpleLazyObject
+
+from . import instrumentation, metriques, profilage
+from .compression import choisir_encodage, compresser, minifier_html, type_compressible
+from .navigation import contexte_navigation
+
+TAILLE_MINIMALE = 200
+METHODES = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class CompressionMiddleware:
+    """
+    Minifie le HTML rendu (settings.MINIFIER_HTML) puis le compresse en
+    brotli ou gzip selon Accept-Encoding.
+
+    Les réponses en flux (fichiers, feuilles d'identifiants...), partielles,
+    déjà encodées ou de type déjà compressé (images, PDF) sont laissées
+    telles quelles. Les octets économisés alimentent les compteurs
+    minification.* et compression.* de membres.instrumentation.
+
+    Les pages portant un jeton CSRF sont compressées comme les autres :
+    Django masque ce jeton différemment à chaque réponse, ce qui le protège
+    de BREACH (deviner un secret d'après la taille compressée).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.status_code != 200
+            or response.has_header('Content-Encoding')
+            or not type_compressible(response.get('Content-Type'))
+        ):
+            return response
+
+        if getattr(settings, 'MINIFIER_HTML', True) and response['Content-Type'].startswith('text/html'):
+            self.minifier(response)
+
+        if len(response.content) < TAILLE_MINIMALE:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodage = choisir_encodage(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encodage is None:
+            return response
+
+        avant = len(response.content)
+        compresse = compresser(response.content, encodage)
+        if len(compresse) >= avant:
+            return response
+        response.content = compresse
+        response.headers['Content-Length'] = str(len(compresse))
+        response.headers['Content-Encoding'] = encodage
+        # Un ETag fort ne peut pas désigner à la fois la version compressée et l'autre
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        instrumentation.incrementer(f'compression.{encodage}')
+        instrumentation.incrementer('compression.octets_avant', avant)
+        instrumentation.incrementer('compression.octets_economises', avant - len(compresse))
+        return response
+
+    def minifier(self, response):
+        charset = response.charset
+        try:
+            html = response.content.decode(charset)
+        except UnicodeDecodeError:
+            return
+        contenu = minifier_html(html).encode(charset)
+        economie = len(response.content) - len(contenu)
+        if economie > 0:
+            response.content = contenu
+            if response.has_header('Content-Length'):
+                response.headers['Content-Length'] = str(len(contenu))
+            instrumentation.incrementer('minification.octets_economises', economie)
+
+
+class NavigationMiddleware:
+    """
+    Pose request.navigation (voir navigation.py), évalué seulement si une vue
+    ou un template s'en sert. À placer après AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.navigation = SimpleLazyObject(lambda: contexte_navigation(request))
+        return self.get_response(request)
+
+
+class ProfilageMiddleware:
+    """
+    Exécute la vue sous cProfile quand un membre du personnel le demande
+    (?_profil=1 ou X-Profil: 1) et que settings.PROFILAGE_ACTIF est vrai.
+    Voir profilage.py. À placer après AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not profilage.demande(request):
+            return None
+        return profilage.profiler(request, view_func, view_args, view_kwargs)
+
+
+class MetriquesMiddleware:
+    """
+    Durée, statut et requêtes SQL de chaque requête, par nom de vue, dans
+    les métriques partagées (metriques.py). Placé en tête de MIDDLEWARE
+    pour mesurer toute la chaîne ; l'envoi d'une réponse en flux n'est pas
+    compté dans la durée.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metriques.actives():
+            return self.get_response(request)
+
+        sql = profilage.ChronometreSQL()
+        debut = time.perf_counter()
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(sql))
+            response = self.get_response(request)
+        duree = time.perf_counter() - debut
+
+        correspondance = getattr(request, 'resolver_match', None)
+        vue = correspondance.view_name if correspondance else 'inconnue'
+        methode = request.method if request.method in METHODES else 'autre'
+        metriques.incrementer('requetes_total', vue=vue, methode=methode, statut=str(response.status_code))
+        metriques.observer('requete_duree_secondes', duree, vue=vue)
+        if sql.nombre:
+            metriques.incrementer('sql_requetes_total', sql.nombre, vue=vue)
+            metriques.incrementer('sql_duree_secondes_total', sql.duree, vue=vue)
+        return response
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('membres', '0013_alter_mandat_date_fin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotIdentifiants',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_cours', max_length=20, verbose_name='Statut')),
+                ('erreur', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin')),
+                ('date_cloture', models.DateTimeField(blank=True, help_text='Les mots de passe temporaires sont effacés à la clôture', null=True, verbose_name='Date de clôture')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lots_identifiants', to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': "Lot d'identifiants",
+                'verbose_name_plural': "Lots d'identifiants",
+                'ordering': ['-date_creation'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IdentifiantEmis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150)),
+                ('mot_de_passe', models.CharField(blank=True, max_length=128, verbose_name='Mot de passe temporaire')),
+                ('est_applique', models.BooleanField(default=False, verbose_name='Mot de passe appliqué')),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiants', to='membres.lotidentifiants')),
+                ('membre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiants_emis', to='membres.membre')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identifiants_emis', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Identifiant émis',
+                'verbose_name_plural': 'Identifiants émis',
+                'ordering': ['membre__association__nom', 'membre__nom', 'membre__prenom'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='identifiantemis',
+            constraint=models.UniqueConstraint(fields=('lot', 'membre'), name='unique_identifiant_lot_membre'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0014_lotidentifiants_identifiantemis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='association',
+            name='est_supprimee',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Suppression en cours'),
+        ),
+    ]
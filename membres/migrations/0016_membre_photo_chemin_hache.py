@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 01:40
+
+from django.db import migrations, models
+import membres.medias
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0015_association_est_supprimee'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='membre',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to=membres.medias.CheminHache('photos/membres'), verbose_name='Photo du membre'),
+        ),
+    ]
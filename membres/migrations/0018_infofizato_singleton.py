@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+def garder_une_seule_ligne(apps, schema_editor):
+    """Garde la ligne modifiée le plus récemment, sous l'identifiant 1"""
+    InfoFizato = apps.get_model('membres', 'InfoFizato')
+    lignes = list(InfoFizato.objects.order_by('-updated_at', '-id'))
+    if not lignes:
+        return
+    gardee = lignes[0]
+    InfoFizato.objects.exclude(pk=gardee.pk).delete()
+    if gardee.pk != 1:
+        InfoFizato.objects.filter(pk=gardee.pk).update(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0017_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(garder_une_seule_ligne, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='infofizato',
+            constraint=models.CheckConstraint(check=models.Q(('id', 1)), name='infofizato_singleton'),
+        ),
+    ]
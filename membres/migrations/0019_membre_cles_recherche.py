@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-19 03:05
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Copie figée de membres.models.normaliser_recherche à la date de la migration
+def normaliser_recherche(texte):
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.lower().split())
+
+
+def remplir_cles(apps, schema_editor):
+    Membre = apps.get_model('membres', 'Membre')
+    lot = []
+    for membre in Membre.objects.only('id', 'nom', 'prenom').iterator(chunk_size=1000):
+        membre.cle_nom = normaliser_recherche(f"{membre.nom} {membre.prenom}")
+        membre.cle_prenom = normaliser_recherche(f"{membre.prenom} {membre.nom}")
+        lot.append(membre)
+        if len(lot) == 1000:
+            Membre.objects.bulk_update(lot, ['cle_nom', 'cle_prenom'])
+            lot = []
+    if lot:
+        Membre.objects.bulk_update(lot, ['cle_nom', 'cle_prenom'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0018_infofizato_singleton'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membre',
+            name='cle_nom',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.AddField(
+            model_name='membre',
+            name='cle_prenom',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.RunPython(remplir_cles, migrations.RunPython.noop),
+    ]
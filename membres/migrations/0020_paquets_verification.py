@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0019_membre_cles_recherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevocationCarte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_unique', models.UUIDField(unique=True)),
+                ('numero_carte', models.CharField(blank=True, max_length=20)),
+                ('date_revocation', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Carte révoquée',
+                'verbose_name_plural': 'Cartes révoquées',
+                'ordering': ['-date_revocation'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='cartemembre',
+            name='date_generation',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
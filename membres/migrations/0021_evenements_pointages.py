@@ -0,0 +1,72 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0020_paquets_verification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Evenement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=200, verbose_name="Nom de l'événement")),
+                ('date', models.DateField(verbose_name='Date')),
+                ('lieu', models.CharField(blank=True, max_length=200, verbose_name='Lieu')),
+                ('nombre_scans', models.PositiveIntegerField(default=0, editable=False, verbose_name='Scans reçus')),
+                ('nombre_refuses', models.PositiveIntegerField(default=0, editable=False, verbose_name='Scans refusés')),
+                ('nombre_presents', models.PositiveIntegerField(default=0, editable=False, verbose_name='Membres présents')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Événement',
+                'verbose_name_plural': 'Événements',
+                'ordering': ['-date', 'nom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Presence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('premier_scan', models.DateTimeField(verbose_name='Premier scan')),
+                ('association', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='presences', to='membres.association')),
+                ('evenement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='presences', to='membres.evenement')),
+                ('membre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='presences', to='membres.membre')),
+            ],
+            options={
+                'verbose_name': 'Présence',
+                'verbose_name_plural': 'Présences',
+                'ordering': ['premier_scan'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Pointage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifiant', models.UUIDField(unique=True, verbose_name='Identifiant client')),
+                ('numero_unique', models.UUIDField(blank=True, null=True, verbose_name='Carte scannée')),
+                ('est_valide', models.BooleanField(default=False, verbose_name='Carte valide')),
+                ('appareil', models.CharField(blank=True, max_length=100, verbose_name='Appareil')),
+                ('date_scan', models.DateTimeField(verbose_name='Date du scan')),
+                ('date_reception', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de réception')),
+                ('carte', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pointages', to='membres.cartemembre')),
+                ('evenement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pointages', to='membres.evenement')),
+            ],
+            options={
+                'verbose_name': 'Pointage',
+                'verbose_name_plural': 'Pointages',
+                'ordering': ['-date_scan'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='presence',
+            constraint=models.UniqueConstraint(fields=('evenement', 'membre'), name='unique_presence_evenement_membre'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:04
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0021_evenements_pointages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Changement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('type_objet', models.CharField(max_length=30, verbose_name="Type d'objet")),
+                ('objet_id', models.PositiveBigIntegerField(verbose_name="Identifiant de l'objet")),
+                ('action', models.CharField(choices=[('creation', 'Création'), ('modification', 'Modification'), ('suppression', 'Suppression')], max_length=12, verbose_name='Action')),
+                ('date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date')),
+            ],
+            options={
+                'verbose_name': 'Changement',
+                'verbose_name_plural': 'Changements',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0022_journal_changements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequeteLente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=40, unique=True, verbose_name='Empreinte')),
+                ('sql', models.TextField(verbose_name='SQL normalisé')),
+                ('exemple', models.TextField(verbose_name='Exemple de requête')),
+                ('parametres', models.TextField(blank=True, default='', verbose_name='Paramètres (masqués)')),
+                ('emplacement', models.CharField(blank=True, default='', max_length=255, verbose_name='Appelée depuis')),
+                ('plan', models.TextField(blank=True, default='', verbose_name="Plan d'exécution")),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name='Occurrences')),
+                ('duree_totale', models.FloatField(default=0, verbose_name='Durée totale (ms)')),
+                ('duree_max', models.FloatField(default=0, verbose_name='Durée maximale (ms)')),
+                ('premiere_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Première occurrence')),
+                ('derniere_date', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Dernière occurrence')),
+            ],
+            options={
+                'verbose_name': 'Requête lente',
+                'verbose_name_plural': 'Requêtes lentes',
+                'ordering': ['-duree_totale'],
+            },
+        ),
+    ]
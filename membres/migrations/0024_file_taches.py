@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('membres', '0023_requetes_lentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, verbose_name='Tâche')),
+                ('arguments', models.JSONField(blank=True, default=dict, verbose_name='Arguments')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echouee', 'Échouée'), ('annulee', 'Annulée')], default='en_attente', max_length=12, verbose_name='Statut')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('tentatives_max', models.PositiveSmallIntegerField(default=3, verbose_name='Tentatives maximum')),
+                ('executer_apres', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Exécuter après')),
+                ('travailleur', models.CharField(blank=True, default='', max_length=100, verbose_name='Travailleur')),
+                ('avancement', models.PositiveIntegerField(default=0, verbose_name='Avancement')),
+                ('avancement_total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total')),
+                ('message', models.CharField(blank=True, default='', max_length=255, verbose_name='Message')),
+                ('resultat', models.JSONField(blank=True, null=True, verbose_name='Résultat')),
+                ('erreur', models.TextField(blank=True, default='', verbose_name='Erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Début')),
+                ('date_signal', models.DateTimeField(blank=True, null=True, verbose_name='Dernier signal')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='taches', to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+            ],
+            options={
+                'verbose_name': 'Tâche',
+                'verbose_name_plural': 'Tâches',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['statut', 'executer_apres'], name='tache_statut_executer_apres')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Chiffrement des mots de passe temporaires déjà enregistrés en clair
+
+import base64
+import hashlib
+import hmac
+import secrets
+
+from django.db import migrations
+from django.utils.crypto import salted_hmac
+
+
+# Copie figée de membres.identifiants.chiffrer à la date de la migration
+def _cle(usage):
+    return salted_hmac('membres.identifiants', usage, algorithm='sha256').digest()
+
+
+def _chiffrer(mot_de_passe):
+    nonce = secrets.token_bytes(16)
+    clair = mot_de_passe.encode('utf-8')
+    flux = b''.join(
+        hmac.new(_cle('chiffrement'), nonce + compteur.to_bytes(4, 'big'), hashlib.sha256).digest()
+        for compteur in range(-(-len(clair) // 32))
+    )
+    chiffre = bytes(a ^ b for a, b in zip(clair, flux))
+    empreinte = hmac.new(_cle('authentification'), nonce + chiffre, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(nonce + chiffre + empreinte).decode('ascii')
+
+
+def chiffrer_existants(apps, schema_editor):
+    IdentifiantEmis = apps.get_model('membres', 'IdentifiantEmis')
+    a_chiffrer = IdentifiantEmis.objects.exclude(mot_de_passe='').only('id', 'mot_de_passe')
+    identifiants = []
+    for identifiant in a_chiffrer.iterator(chunk_size=500):
+        identifiant.mot_de_passe = _chiffrer(identifiant.mot_de_passe)
+        identifiants.append(identifiant)
+    IdentifiantEmis.objects.bulk_update(identifiants, ['mot_de_passe'], batch_size=500)
+
+
+def effacer_existants(apps, schema_editor):
+    # Retour arrière : les mots de passe chiffrés ne sont pas remis en clair
+    IdentifiantEmis = apps.get_model('membres', 'IdentifiantEmis')
+    IdentifiantEmis.objects.update(mot_de_passe='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0024_file_taches'),
+    ]
+
+    operations = [
+        migrations.RunPython(chiffrer_existants, effacer_existants),
+    ]
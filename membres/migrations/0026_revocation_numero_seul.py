@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('membres', '0025_chiffrer_mots_de_passe_temporaires'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='revocationcarte',
+            name='numero_unique',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+    ]
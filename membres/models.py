@@ -2,8 +2,31 @@ from django.db import models
 from django.core.validators import RegexValidator
 from django.utils import timezone
 from django.contrib.auth.models import User
+import unicodedata
 import uuid
 
+from .medias import CheminHache
+
+
+def normaliser_recherche(texte):
+    """Forme de recherche d'un texte : minuscules, sans accents, espaces simples"""
+    decompose = unicodedata.normalize('NFKD', texte or '')
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.lower().split())
+
+
+class AssociationManager(models.Manager):
+    """Associations visibles (celles en cours de suppression sont masquées)"""
+    def get_queryset(self):
+        return super().get_queryset().filter(est_supprimee=False)
+
+
+class MembreManager(models.Manager):
+    """Membres des associations visibles (pour les pages, la recherche et l'API)"""
+    def get_queryset(self):
+        return super().get_queryset().filter(association__est_supprimee=False)
+
+
 class Association(models.Model):
     nom = models.CharField(max_length=200, verbose_name="Nom de l'Association")
     logo_association = models.ImageField(upload_to='logos/associations/', blank=True, null=True, verbose_name="Logo Association")
@@ -15,6 +38,12 @@ class Association(models.Model):
     description = models.TextField(verbose_name="Description", blank=True, null=True)
     date_creation = models.DateField(verbose_name="Date de création", default=timezone.now)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Masque l'association dès la demande de suppression, avant la suppression effective en arrière-plan
+    est_supprimee = models.BooleanField(default=False, db_index=True, verbose_name="Suppression en cours")
+    
+    objects = AssociationManager()
+    tous = models.Manager()
     
     def __str__(self):
         return self.nom
@@ -84,7 +113,7 @@ class Membre(models.Model):
     filiere = models.CharField(max_length=100, verbose_name="Filière")
     parcours = models.CharField(max_length=100, verbose_name="Parcours")
     numero_carte = models.CharField(max_length=20, verbose_name="N°C", unique=True, blank=True)
-    photo = models.ImageField(upload_to='photos/membres/', blank=True, null=True, verbose_name="Photo du membre")
+    photo = models.ImageField(upload_to=CheminHache('photos/membres'), blank=True, null=True, verbose_name="Photo du membre")
     # Champs ajoutés pour la carte membre
     date_naissance = models.DateField(blank=True, null=True, verbose_name="Date de naissance")
     etablissement = models.CharField(max_length=150, blank=True, null=True, verbose_name="Établissement")
@@ -94,6 +123,20 @@ class Membre(models.Model):
     nom_facebook = models.CharField(max_length=100, blank=True, null=True, verbose_name="Nom Facebook")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Clés de l'autocomplétion ("nom prenom" et "prenom nom" normalisés) : recherche
+    # par préfixe en intervalle sur un index, quel que soit le moteur de base de données
+    cle_nom = models.CharField(max_length=201, blank=True, default='', editable=False, db_index=True)
+    cle_prenom = models.CharField(max_length=201, blank=True, default='', editable=False, db_index=True)
+    
+    objects = models.Manager()
+    actifs = MembreManager()
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        membre = super().from_db(db, field_names, values)
+        # Numéro lu en base : s'il change, l'ancien est révoqué pour les lecteurs hors ligne (signals.py)
+        membre._numero_carte_charge = membre.__dict__.get('numero_carte')
+        return membre
     
     def save(self, *args, **kwargs):
         # Générer automatiquement le numéro de carte si pas défini
@@ -107,6 +150,11 @@ class Membre(models.Model):
             # Générer le numéro de carte : 0001 + code association (ex: 0001AE pour AERAF)
             self.numero_carte = f"{count:04d}{association_code}"
         
+        self.cle_nom = normaliser_recherche(f"{self.nom} {self.prenom}")
+        self.cle_prenom = normaliser_recherche(f"{self.prenom} {self.nom}")
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'nom', 'prenom'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'cle_nom', 'cle_prenom'}
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -120,7 +168,7 @@ class Membre(models.Model):
 class CarteMembre(models.Model):
     membre = models.OneToOneField(Membre, on_delete=models.CASCADE, related_name='carte')
     numero_unique = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
-    date_generation = models.DateTimeField(auto_now_add=True)
+    date_generation = models.DateTimeField(auto_now_add=True, db_index=True)
     est_imprimee = models.BooleanField(default=False, verbose_name="Carte imprimée")
     date_impression = models.DateTimeField(blank=True, null=True, verbose_name="Date d'impression")
     
@@ -133,8 +181,29 @@ class CarteMembre(models.Model):
         ordering = ['-date_generation']
 
 
+class RevocationCarte(models.Model):
+    """
+    Carte qui n'est plus valide (supprimée, ou association masquée), conservée
+    pour les paquets de vérification hors ligne (voir hors_ligne.py).
+    Sans numero_unique : seul l'ancien numéro d'une carte valide est révoqué.
+    """
+    numero_unique = models.UUIDField(unique=True, blank=True, null=True)
+    numero_carte = models.CharField(max_length=20, blank=True)
+    date_revocation = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"Révocation {self.numero_carte or self.numero_unique}"
+    
+    class Meta:
+        verbose_name = "Carte révoquée"
+        verbose_name_plural = "Cartes révoquées"
+        ordering = ['-date_revocation']
+
+
 class InfoFizato(models.Model):
-    """Informations sur l'organisation FIZATO"""
+    """Informations sur l'organisation FIZATO (une seule ligne, d'identifiant 1)"""
+    SINGLETON_ID = 1
+
     nom = models.CharField(max_length=200, default="FI.ZA.TO", verbose_name="Nom de l'organisation")
     nom_complet = models.CharField(max_length=500, blank=True, null=True, verbose_name="Nom complet")
     date_creation = models.DateField(verbose_name="Date de création")
@@ -148,9 +217,29 @@ class InfoFizato(models.Model):
     def __str__(self):
         return self.nom
     
+    def save(self, *args, **kwargs):
+        # Toute création remplace l'unique ligne existante au lieu d'en ajouter une
+        creation_existante = None
+        if self.pk is None:
+            creation_existante = type(self).objects.filter(pk=self.SINGLETON_ID).values_list('created_at', flat=True).first()
+        self.pk = self.SINGLETON_ID
+        super().save(*args, **kwargs)
+        # auto_now_add a daté la ligne remplacée de maintenant : lui rendre sa date de création
+        if creation_existante is not None:
+            type(self).objects.filter(pk=self.SINGLETON_ID).update(created_at=creation_existante)
+            self.created_at = creation_existante
+    
+    @classmethod
+    def obtenir(cls):
+        """Lit l'instance en base (None si elle n'existe pas encore) ; voir fizato.info_fizato() pour la version en cache"""
+        return cls.objects.filter(pk=cls.SINGLETON_ID).first()
+    
     class Meta:
         verbose_name = "Information FIZATO"
         verbose_name_plural = "Informations FIZATO"
+        constraints = [
+            models.CheckConstraint(check=models.Q(id=1), name='infofizato_singleton'),
+        ]
 
 
 class FonctionBureau(models.Model):
@@ -159,6 +248,7 @@ class FonctionBureau(models.Model):
     niveau_hierarchique = models.PositiveIntegerField(default=1, verbose_name="Niveau hiérarchique", 
                                                      help_text="1 = Président, 2 = Vice-président, etc.")
     description = models.TextField(blank=True, null=True, verbose_name="Description de la fonction")
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.nom
@@ -177,6 +267,7 @@ class MembreBureau(models.Model):
     date_fin = models.DateField(blank=True, null=True, verbose_name="Date de fin de mandat")
     est_actuel = models.BooleanField(default=True, verbose_name="Mandat actuel")
     mandat = models.ForeignKey('Mandat', on_delete=models.CASCADE, null=True, blank=True, related_name='membres_bureau')
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.membre} - {self.fonction}"
@@ -204,6 +295,7 @@ class Mandat(models.Model):
     est_actuel = models.BooleanField(default=False)
     description = models.TextField(blank=True)
     date_creation = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-date_debut']
@@ -221,15 +313,10 @@ class Mandat(models.Model):
     def terminer_mandat(self):
         """Termine le mandat actuel et archive tous les membres du bureau"""
         if self.est_actuel:
-            # Archiver tous les membres du bureau actuel
-            MembreBureau.objects.filter(est_actuel=True).update(
-                est_actuel=False,
-                date_fin=timezone.now().date()
-            )
-            
-            # Marquer le mandat comme terminé
+            from .mandats import cloturer_mandat
+            resultat = cloturer_mandat(mandat=self, archiver_doyens=False, creer_suivant=False)
             self.est_actuel = False
-            self.save()
+            self.date_fin = resultat.mandat.date_fin
 
 
 class ComiteDoyen(models.Model):
@@ -241,9 +328,228 @@ class ComiteDoyen(models.Model):
     est_actif = models.BooleanField(default=True)
     ordre_affichage = models.IntegerField(default=1)
     mandat = models.ForeignKey(Mandat, on_delete=models.CASCADE, null=True, blank=True, related_name='comite_doyen')
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['ordre_affichage', 'date_nomination']
     
     def __str__(self):
         return f"{self.membre.prenom} {self.membre.nom} - {self.titre}"
+
+
+class LotIdentifiants(models.Model):
+    """Lot d'identifiants (mots de passe temporaires) émis depuis l'administration"""
+    STATUT_EN_COURS = 'en_cours'
+    STATUT_TERMINE = 'termine'
+    STATUT_ECHEC = 'echec'
+    STATUT_CHOICES = [
+        (STATUT_EN_COURS, 'En cours'),
+        (STATUT_TERMINE, 'Terminé'),
+        (STATUT_ECHEC, 'Échec'),
+    ]
+
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='lots_identifiants', verbose_name="Créé par")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=STATUT_EN_COURS, verbose_name="Statut")
+    erreur = models.TextField(blank=True, verbose_name="Dernière erreur")
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_fin = models.DateTimeField(blank=True, null=True, verbose_name="Date de fin")
+    date_cloture = models.DateTimeField(blank=True, null=True, verbose_name="Date de clôture",
+                                        help_text="Les mots de passe temporaires sont effacés à la clôture")
+
+    def __str__(self):
+        return f"Lot d'identifiants n°{self.id} ({self.get_statut_display()})"
+
+    class Meta:
+        verbose_name = "Lot d'identifiants"
+        verbose_name_plural = "Lots d'identifiants"
+        ordering = ['-date_creation']
+
+
+class IdentifiantEmis(models.Model):
+    """Identifiant émis pour un membre dans un lot"""
+    lot = models.ForeignKey(LotIdentifiants, on_delete=models.CASCADE, related_name='identifiants')
+    membre = models.ForeignKey(Membre, on_delete=models.CASCADE, related_name='identifiants_emis')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='identifiants_emis')
+    username = models.CharField(max_length=150)
+    # Chiffré (identifiants.chiffrer), effacé à la clôture du lot
+    mot_de_passe = models.CharField(max_length=128, blank=True, verbose_name="Mot de passe temporaire")
+    est_applique = models.BooleanField(default=False, verbose_name="Mot de passe appliqué")
+
+    def __str__(self):
+        return f"{self.username} (lot {self.lot_id})"
+
+    class Meta:
+        verbose_name = "Identifiant émis"
+        verbose_name_plural = "Identifiants émis"
+        ordering = ['membre__association__nom', 'membre__nom', 'membre__prenom']
+        constraints = [
+            models.UniqueConstraint(fields=['lot', 'membre'], name='unique_identifiant_lot_membre')
+        ]
+
+
+class Evenement(models.Model):
+    """Événement de la fédération où les cartes des membres sont scannées à l'entrée"""
+    nom = models.CharField(max_length=200, verbose_name="Nom de l'événement")
+    date = models.DateField(verbose_name="Date")
+    lieu = models.CharField(max_length=200, blank=True, verbose_name="Lieu")
+    # Compteurs tenus à jour à chaque lot de scans (voir pointages.py) : aucune relecture des scans
+    nombre_scans = models.PositiveIntegerField(default=0, editable=False, verbose_name="Scans reçus")
+    nombre_refuses = models.PositiveIntegerField(default=0, editable=False, verbose_name="Scans refusés")
+    nombre_presents = models.PositiveIntegerField(default=0, editable=False, verbose_name="Membres présents")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nom} ({self.date:%d/%m/%Y})"
+
+    class Meta:
+        verbose_name = "Événement"
+        verbose_name_plural = "Événements"
+        ordering = ['-date', 'nom']
+
+
+class Pointage(models.Model):
+    """Scan d'une carte à l'entrée d'un événement, identifié par l'appareil qui l'a produit"""
+    identifiant = models.UUIDField(unique=True, verbose_name="Identifiant client")
+    evenement = models.ForeignKey(Evenement, on_delete=models.CASCADE, related_name='pointages')
+    carte = models.ForeignKey(CarteMembre, on_delete=models.SET_NULL, null=True, blank=True, related_name='pointages')
+    numero_unique = models.UUIDField(null=True, blank=True, verbose_name="Carte scannée")
+    est_valide = models.BooleanField(default=False, verbose_name="Carte valide")
+    appareil = models.CharField(max_length=100, blank=True, verbose_name="Appareil")
+    date_scan = models.DateTimeField(verbose_name="Date du scan")
+    date_reception = models.DateTimeField(default=timezone.now, verbose_name="Date de réception")
+
+    def __str__(self):
+        return f"Pointage {self.identifiant} ({self.evenement_id})"
+
+    class Meta:
+        verbose_name = "Pointage"
+        verbose_name_plural = "Pointages"
+        ordering = ['-date_scan']
+
+
+class Presence(models.Model):
+    """Présence d'un membre à un événement (première carte valide scannée)"""
+    evenement = models.ForeignKey(Evenement, on_delete=models.CASCADE, related_name='presences')
+    # SET_NULL : la présence reste comptée si le membre est supprimé ensuite
+    membre = models.ForeignKey(Membre, on_delete=models.SET_NULL, null=True, blank=True, related_name='presences')
+    association = models.ForeignKey(Association, on_delete=models.SET_NULL, null=True, blank=True, related_name='presences')
+    premier_scan = models.DateTimeField(verbose_name="Premier scan")
+
+    def __str__(self):
+        return f"{self.membre} - {self.evenement}"
+
+    class Meta:
+        verbose_name = "Présence"
+        verbose_name_plural = "Présences"
+        ordering = ['premier_scan']
+        constraints = [
+            models.UniqueConstraint(fields=['evenement', 'membre'], name='unique_presence_evenement_membre')
+        ]
+
+
+class Changement(models.Model):
+    """Entrée du journal des modifications, lue par le flux de synchronisation (voir journal.py)"""
+    ACTION_CREATION = 'creation'
+    ACTION_MODIFICATION = 'modification'
+    ACTION_SUPPRESSION = 'suppression'
+    ACTION_CHOICES = [
+        (ACTION_CREATION, 'Création'),
+        (ACTION_MODIFICATION, 'Modification'),
+        (ACTION_SUPPRESSION, 'Suppression'),
+    ]
+
+    # Identifiant croissant : c'est le curseur du flux
+    id = models.BigAutoField(primary_key=True)
+    type_objet = models.CharField(max_length=30, verbose_name="Type d'objet")
+    objet_id = models.PositiveBigIntegerField(verbose_name="Identifiant de l'objet")
+    action = models.CharField(max_length=12, choices=ACTION_CHOICES, verbose_name="Action")
+    date = models.DateTimeField(default=timezone.now, verbose_name="Date")
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.type_objet} n°{self.objet_id}"
+
+    class Meta:
+        verbose_name = "Changement"
+        verbose_name_plural = "Changements"
+        ordering = ['id']
+
+
+class RequeteLente(models.Model):
+    """Forme de requête SQL lente, dédoublonnée par empreinte (voir requetes_lentes.py)"""
+    empreinte = models.CharField(max_length=40, unique=True, verbose_name="Empreinte")
+    sql = models.TextField(verbose_name="SQL normalisé")
+    exemple = models.TextField(verbose_name="Exemple de requête")
+    parametres = models.TextField(blank=True, default='', verbose_name="Paramètres (masqués)")
+    emplacement = models.CharField(max_length=255, blank=True, default='', verbose_name="Appelée depuis")
+    plan = models.TextField(blank=True, default='', verbose_name="Plan d'exécution")
+    nombre = models.PositiveIntegerField(default=0, verbose_name="Occurrences")
+    duree_totale = models.FloatField(default=0, verbose_name="Durée totale (ms)")
+    duree_max = models.FloatField(default=0, verbose_name="Durée maximale (ms)")
+    premiere_date = models.DateTimeField(default=timezone.now, verbose_name="Première occurrence")
+    derniere_date = models.DateTimeField(default=timezone.now, verbose_name="Dernière occurrence")
+
+    def __str__(self):
+        return f"{self.sql[:80]} ({self.nombre} fois)"
+
+    class Meta:
+        verbose_name = "Requête lente"
+        verbose_name_plural = "Requêtes lentes"
+        ordering = ['-duree_totale']
+
+
+class Tache(models.Model):
+    """Traitement long exécuté par les travailleurs de run_workers (voir taches.py)"""
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'
+    STATUT_TERMINEE = 'terminee'
+    STATUT_ECHOUEE = 'echouee'
+    STATUT_ANNULEE = 'annulee'
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, 'En attente'),
+        (STATUT_EN_COURS, 'En cours'),
+        (STATUT_TERMINEE, 'Terminée'),
+        (STATUT_ECHOUEE, 'Échouée'),
+        (STATUT_ANNULEE, 'Annulée'),
+    ]
+
+    nom = models.CharField(max_length=100, verbose_name="Tâche")
+    arguments = models.JSONField(default=dict, blank=True, verbose_name="Arguments")
+    statut = models.CharField(max_length=12, choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE, verbose_name="Statut")
+    tentatives = models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives")
+    tentatives_max = models.PositiveSmallIntegerField(default=3, verbose_name="Tentatives maximum")
+    # Date à partir de laquelle la tâche peut être prise (reculée après un échec)
+    executer_apres = models.DateTimeField(default=timezone.now, verbose_name="Exécuter après")
+    travailleur = models.CharField(max_length=100, blank=True, default='', verbose_name="Travailleur")
+    avancement = models.PositiveIntegerField(default=0, verbose_name="Avancement")
+    avancement_total = models.PositiveIntegerField(blank=True, null=True, verbose_name="Total")
+    message = models.CharField(max_length=255, blank=True, default='', verbose_name="Message")
+    resultat = models.JSONField(blank=True, null=True, verbose_name="Résultat")
+    erreur = models.TextField(blank=True, default='', verbose_name="Erreur")
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='taches', verbose_name="Créée par")
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    date_debut = models.DateTimeField(blank=True, null=True, verbose_name="Début")
+    # Dernier signe de vie du travailleur (début, battement pendant l'exécution, avancement)
+    date_signal = models.DateTimeField(blank=True, null=True, verbose_name="Dernier signal")
+    date_fin = models.DateTimeField(blank=True, null=True, verbose_name="Fin")
+
+    def __str__(self):
+        return f"Tâche n°{self.id} {self.nom}"
+
+    def progression(self):
+        """Avancement lisible : fait/total (pourcentage) et message"""
+        if self.avancement_total:
+            texte = f"{self.avancement}/{self.avancement_total} ({self.avancement * 100 // self.avancement_total} %)"
+        elif self.avancement:
+            texte = str(self.avancement)
+        else:
+            texte = ''
+        return f"{texte} {self.message}".strip()
+
+    class Meta:
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['statut', 'executer_apres'], name='tache_statut_executer_apres'),
+        ]
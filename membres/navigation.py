@@ -0,0 +1,61 @@
+"""
+Contexte de navigation de l'utilisateur connecté (en-tête de base.html).
+
+Le membre lié au compte (identifiant, nom affiché, photo) est résolu une
+seule fois puis conservé dans la session. L'entrée porte deux versions du
+cache de statistiques : celle de l'espace 'navigation', changée par les
+traitements en masse (toutes les sessions), et celle de l'espace propre
+au compte (espace_utilisateur), changée quand ce compte ou son membre est
+modifié (signals.py). La session reconstruit son contexte à la page
+suivante (avec un cache partagé entre processus). L'entrée expire en outre
+après DUREE_NAVIGATION secondes, ce qui borne le retard quand
+l'invalidation n'atteint pas la session (cache locmem, version évincée,
+membre détaché de ce compte).
+"""
+import time
+
+from .cache import CACHE_STATS, version
+from .models import Membre
+
+CLE_SESSION = '_navigation'
+ESPACE = 'navigation'
+# Durée de vie maximale du contexte conservé en session (secondes)
+DUREE_NAVIGATION = 120
+
+
+def espace_utilisateur(user_id):
+    """Espace de noms du contexte de navigation d'un seul compte"""
+    return f'{ESPACE}:{user_id}'
+
+
+def _construire(user):
+    membre = Membre.actifs.filter(user_id=user.pk).values('id', 'photo').first()
+    photo_url = ''
+    if membre and membre['photo']:
+        photo_url = Membre._meta.get_field('photo').storage.url(membre['photo'])
+    return {
+        'membre_id': membre['id'] if membre else None,
+        'nom_affiche': user.get_full_name() or user.get_username(),
+        'email': user.email,
+        'photo_url': photo_url,
+        'est_admin': user.is_staff or user.is_superuser,
+    }
+
+
+def contexte_navigation(request):
+    """Contexte de navigation de `request.user`, lu dans la session quand il est à jour"""
+    user = request.user
+    if not user.is_authenticated:
+        return {}
+    courante = [version(CACHE_STATS, ESPACE), version(CACHE_STATS, espace_utilisateur(user.pk))]
+    maintenant = time.time()
+    entree = request.session.get(CLE_SESSION)
+    if (entree and entree.get('version') == courante and entree.get('user_id') == user.pk
+            and maintenant < entree.get('expire', 0)):
+        return entree['contexte']
+    contexte = _construire(user)
+    request.session[CLE_SESSION] = {
+        'version': courante, 'user_id': user.pk, 'expire': maintenant + DUREE_NAVIGATION, 'contexte': contexte,
+    }
+    return contexte
+
@@ -0,0 +1,156 @@
+"""
+Enregistrement des scans de cartes (pointages) aux événements.
+
+Les appareils de contrôle envoient leurs scans par lots ; chaque scan
+porte un identifiant (UUID) généré par l'appareil, ce qui rend l'envoi
+idempotent : un lot renvoyé après une coupure réseau n'est compté qu'une
+fois. Pour un lot :
+
+- une requête retrouve les identifiants déjà reçus ;
+- une requête résout les cartes scannées ;
+- les pointages puis les nouvelles présences sont écrits avec bulk_create ;
+- les compteurs de l'événement avancent d'un seul UPDATE.
+
+Le tout tient dans une transaction ouverte par l'UPDATE de l'événement :
+les lots d'un même événement sont ainsi traités l'un après l'autre et les
+compteurs (nombre de scans, de refus, de présents) restent exacts sans
+jamais relire les pointages.
+"""
+import uuid
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import instrumentation
+from .models import Evenement, Pointage, Presence, CarteMembre
+from .verification import lire_jeton
+
+TAILLE_LOT_MAX = 500
+
+
+class LotInvalide(Exception):
+    """Lot de scans mal formé (réponse 400)"""
+
+
+def _lire_scan(scan):
+    """(identifiant, numero_unique ou None, date, appareil) d'un scan reçu"""
+    if not isinstance(scan, dict):
+        raise LotInvalide("Chaque scan doit être un objet.")
+    try:
+        identifiant = uuid.UUID(str(scan.get('id')))
+    except ValueError:
+        raise LotInvalide(f"Identifiant de scan invalide : {scan.get('id')!r}")
+
+    numero_unique = None
+    if scan.get('jeton'):
+        numero_unique = lire_jeton(str(scan['jeton']))
+    elif scan.get('numero_unique'):
+        try:
+            numero_unique = uuid.UUID(str(scan['numero_unique']))
+        except ValueError:
+            numero_unique = None
+
+    date = parse_datetime(str(scan['date'])) if scan.get('date') else None
+    if date is None:
+        date = timezone.now()
+    elif timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return identifiant, numero_unique, date, str(scan.get('appareil') or '')[:100]
+
+
+def enregistrer_pointages(evenement_id, scans):
+    """
+    Enregistre un lot de scans pour l'événement `evenement_id`.
+
+    Retourne {'acceptes': n, 'doublons': [ids], 'refuses': [ids]}, ou None
+    si l'événement n'existe pas. Lève LotInvalide si le lot est mal formé.
+    """
+    if not isinstance(scans, list):
+        raise LotInvalide("'scans' doit être une liste.")
+    if len(scans) > TAILLE_LOT_MAX:
+        raise LotInvalide(f"{TAILLE_LOT_MAX} scans au plus par lot.")
+
+    lus = {}
+    doublons = []
+    for scan in scans:
+        identifiant, numero_unique, date, appareil = _lire_scan(scan)
+        if identifiant in lus:
+            doublons.append(str(identifiant))
+        else:
+            lus[identifiant] = (numero_unique, date, appareil)
+
+    maintenant = timezone.now()
+    with transaction.atomic():
+        # Première écriture de la transaction : verrouille l'événement (ligne, ou base pour SQLite)
+        if not Evenement.objects.filter(pk=evenement_id).update(updated_at=maintenant):
+            return None
+
+        deja_recus = set(Pointage.objects.filter(identifiant__in=list(lus)).values_list('identifiant', flat=True))
+        doublons.extend(str(identifiant) for identifiant in deja_recus)
+        nouveaux = {identifiant: scan for identifiant, scan in lus.items() if identifiant not in deja_recus}
+
+        numeros = {numero_unique for numero_unique, _, _ in nouveaux.values() if numero_unique}
+        cartes = {
+            numero_unique: (carte_id, membre_id, association_id)
+            for numero_unique, carte_id, membre_id, association_id in CarteMembre.objects.filter(
+                numero_unique__in=numeros, membre__association__est_supprimee=False,
+            ).values_list('numero_unique', 'id', 'membre_id', 'membre__association_id')
+        }
+
+        pointages = []
+        refuses = []
+        premiers = {}
+        for identifiant, (numero_unique, date, appareil) in nouveaux.items():
+            carte = cartes.get(numero_unique)
+            if carte is None:
+                refuses.append(str(identifiant))
+            else:
+                carte_id, membre_id, association_id = carte
+                if membre_id not in premiers or date < premiers[membre_id][0]:
+                    premiers[membre_id] = (date, association_id)
+            pointages.append(Pointage(
+                identifiant=identifiant, evenement_id=evenement_id,
+                carte_id=carte[0] if carte else None, numero_unique=numero_unique,
+                est_valide=carte is not None, appareil=appareil,
+                date_scan=date, date_reception=maintenant,
+            ))
+        Pointage.objects.bulk_create(pointages)
+
+        deja_presents = set(Presence.objects.filter(
+            evenement_id=evenement_id, membre_id__in=list(premiers),
+        ).values_list('membre_id', flat=True))
+        presences = [
+            Presence(evenement_id=evenement_id, membre_id=membre_id, association_id=association_id, premier_scan=date)
+            for membre_id, (date, association_id) in premiers.items() if membre_id not in deja_presents
+        ]
+        Presence.objects.bulk_create(presences)
+
+        Evenement.objects.filter(pk=evenement_id).update(
+            nombre_scans=F('nombre_scans') + len(pointages),
+            nombre_refuses=F('nombre_refuses') + len(refuses),
+            nombre_presents=F('nombre_presents') + len(presences),
+        )
+
+    instrumentation.incrementer('pointages.acceptes', len(pointages))
+    instrumentation.incrementer('pointages.doublons', len(doublons))
+    return {'acceptes': len(pointages), 'doublons': doublons, 'refuses': refuses}
+
+
+def statistiques_evenement(evenement):
+    """Compteurs de l'événement et présents par association (depuis les présences, pas les scans)"""
+    par_association = Presence.objects.filter(evenement=evenement).values(
+        'association__nom',
+    ).annotate(presents=Count('id')).order_by('-presents', 'association__nom')
+    return {
+        'evenement': evenement.nom,
+        'date': evenement.date.isoformat(),
+        'scans': evenement.nombre_scans,
+        'refuses': evenement.nombre_refuses,
+        'presents': evenement.nombre_presents,
+        'associations': [
+            {'association': ligne['association__nom'], 'presents': ligne['presents']}
+            for ligne in par_association
+        ],
+    }
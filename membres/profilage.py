@@ -0,0 +1,151 @@
+"""
+Profilage à la demande d'une requête (cProfile), réservé au personnel.
+
+Activé par settings.PROFILAGE_ACTIF, le profilage d'une page est demandé
+avec le paramètre ?_profil=1 ou l'en-tête X-Profil: 1. La vue est alors
+exécutée sous cProfile (rendu des templates compris) et les requêtes SQL
+sont chronométrées ; le profil est écrit dans PROFILAGE_DOSSIER :
+
+    <horodatage>-<vue>.prof   statistiques cProfile (pstats, snakeviz...)
+    <horodatage>-<vue>.json   méta-données (URL, utilisateur, durées, SQL)
+
+Seules les PROFILAGE_MAX_FICHIERS captures les plus récentes sont gardées.
+La page d'administration /admin/profils/ les liste avec leurs fonctions
+les plus coûteuses en temps cumulé.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connections
+
+PARAMETRE = '_profil'
+ENTETE = 'HTTP_X_PROFIL'
+NOM_CAPTURE = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9]{6}-[A-Za-z0-9_.-]+$')
+
+
+def dossier():
+    return str(getattr(settings, 'PROFILAGE_DOSSIER', os.path.join(settings.BASE_DIR, 'profils')))
+
+
+def demande(request):
+    """Vrai si `request` demande un profil et que l'utilisateur y a droit"""
+    if not getattr(settings, 'PROFILAGE_ACTIF', False):
+        return False
+    if request.GET.get(PARAMETRE) != '1' and request.META.get(ENTETE) != '1':
+        return False
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_authenticated and user.is_staff)
+
+
+class ChronometreSQL:
+    """execute_wrapper : nombre et durée des requêtes SQL exécutées pendant le profil"""
+
+    def __init__(self):
+        self.nombre = 0
+        self.duree = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duree += time.perf_counter() - debut
+            self.nombre += 1
+
+
+def profiler(request, vue, args, kwargs):
+    """Exécute `vue` sous cProfile, enregistre la capture et retourne la réponse"""
+    profil = cProfile.Profile()
+    sql = ChronometreSQL()
+    debut = time.perf_counter()
+    with ExitStack() as pile:
+        for connexion in connections.all():
+            pile.enter_context(connexion.execute_wrapper(sql))
+        response = profil.runcall(vue, request, *args, **kwargs)
+        # Les TemplateResponse sont rendues ici pour que le rendu figure dans le profil
+        if hasattr(response, 'render') and callable(response.render):
+            profil.runcall(response.render)
+    duree = time.perf_counter() - debut
+
+    nom_vue = getattr(vue, '__name__', vue.__class__.__name__)
+    nom = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{nom_vue}'
+    os.makedirs(dossier(), exist_ok=True)
+    profil.dump_stats(os.path.join(dossier(), f'{nom}.prof'))
+    with open(os.path.join(dossier(), f'{nom}.json'), 'w', encoding='utf-8') as fichier:
+        json.dump({
+            'nom': nom,
+            'vue': nom_vue,
+            'methode': request.method,
+            'chemin': request.get_full_path(),
+            'utilisateur': request.user.get_username(),
+            'statut': response.status_code,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'duree_ms': round(duree * 1000, 1),
+            'sql_nombre': sql.nombre,
+            'sql_ms': round(sql.duree * 1000, 1),
+        }, fichier)
+    nettoyer()
+    response['X-Profil'] = nom
+    return response
+
+
+def nettoyer():
+    """Supprime les captures les plus anciennes au-delà de PROFILAGE_MAX_FICHIERS"""
+    maximum = getattr(settings, 'PROFILAGE_MAX_FICHIERS', 50)
+    for nom in [capture['nom'] for capture in captures()][maximum:]:
+        for extension in ('.prof', '.json'):
+            try:
+                os.remove(os.path.join(dossier(), nom + extension))
+            except FileNotFoundError:
+                pass
+
+
+def captures():
+    """Méta-données des captures, de la plus récente à la plus ancienne"""
+    try:
+        noms = os.listdir(dossier())
+    except FileNotFoundError:
+        return []
+    resultat = []
+    for nom in sorted((n for n in noms if n.endswith('.json')), reverse=True):
+        try:
+            with open(os.path.join(dossier(), nom), encoding='utf-8') as fichier:
+                resultat.append(json.load(fichier))
+        except (OSError, ValueError):
+            continue
+    return resultat
+
+
+def chemin_capture(nom):
+    """Chemin du fichier .prof de la capture `nom`, None si le nom est invalide ou inconnu"""
+    if not NOM_CAPTURE.match(nom):
+        return None
+    chemin = os.path.join(dossier(), f'{nom}.prof')
+    return chemin if os.path.exists(chemin) else None
+
+
+def fonctions_couteuses(nom, nombre=25):
+    """Les `nombre` fonctions de la capture au plus fort temps cumulé"""
+    chemin = chemin_capture(nom)
+    if chemin is None:
+        return None
+    stats = pstats.Stats(chemin, stream=io.StringIO())
+    lignes = []
+    for (fichier, ligne, fonction), (_, appels, propre, cumule, _) in stats.stats.items():
+        lignes.append({
+            'fonction': fonction,
+            'emplacement': f'{fichier}:{ligne}',
+            'appels': appels,
+            'propre_ms': round(propre * 1000, 2),
+            'cumule_ms': round(cumule * 1000, 2),
+        })
+    lignes.sort(key=lambda l: l['cumule_ms'], reverse=True)
+    return lignes[:nombre]
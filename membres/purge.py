@@ -0,0 +1,95 @@
+"""
+Purge de l'historique des mandats.
+
+Les suppressions se font par lots bornés, chaque lot dans sa propre
+transaction : une purge interrompue peut simplement être relancée, elle
+reprend là où elle s'était arrêtée. Quand aucun signal ni aucune cascade
+n'est concerné, les lignes sont supprimées directement en SQL sans être
+chargées en mémoire.
+"""
+from collections import namedtuple
+
+from django.db import router, transaction
+from django.db.models import Q
+from django.db.models.deletion import Collector
+
+from .models import Mandat, MembreBureau, ComiteDoyen
+from .suppression import _cascade_sql_possible, _supprimer_sql
+
+TAILLE_LOT = 500
+
+RapportPurge = namedtuple('RapportPurge', ['mandats', 'bureau', 'comite'])
+
+
+def supprimer_par_lots(queryset, taille_lot=TAILLE_LOT, progression=None, etape=''):
+    """
+    Supprime les lignes de `queryset` par lots de `taille_lot`.
+
+    `progression(etape, nb_supprimes)` est appelée après chaque lot.
+    Retourne le nombre de lignes supprimées.
+    """
+    modele = queryset.model
+    using = router.db_for_write(modele)
+    total = 0
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(queryset.order_by().values_list('pk', flat=True)[:taille_lot])
+            if not ids:
+                break
+            lot = modele._base_manager.using(using).filter(pk__in=ids)
+            if Collector(using=using).can_fast_delete(lot):
+                # Ni signal ni cascade : DELETE direct, sans charger les objets
+                nb = lot._raw_delete(using)
+            elif _cascade_sql_possible(modele):
+                # Signaux de cache et de journal seulement : DELETE en SQL, journalisé par lot
+                nb = _supprimer_sql(lot)
+            else:
+                nb = lot.delete()[1].get(modele._meta.label, 0)
+        total += nb
+        if progression:
+            progression(etape, total)
+    return total
+
+
+def _historique():
+    return (
+        MembreBureau.objects.filter(Q(mandat__est_actuel=False) | Q(est_actuel=False, mandat__isnull=True)),
+        ComiteDoyen.objects.filter(Q(mandat__est_actuel=False) | Q(est_actif=False, mandat__isnull=True)),
+        Mandat.objects.filter(est_actuel=False),
+    )
+
+
+def _mandat(mandat_id):
+    return (
+        MembreBureau.objects.filter(mandat_id=mandat_id, mandat__est_actuel=False),
+        ComiteDoyen.objects.filter(mandat_id=mandat_id, mandat__est_actuel=False),
+        Mandat.objects.filter(id=mandat_id, est_actuel=False),
+    )
+
+
+def taille_historique():
+    """Nombre de lignes que supprimerait purger_historique"""
+    return sum(queryset.count() for queryset in _historique())
+
+
+def taille_mandat(mandat_id):
+    """Nombre de lignes que supprimerait purger_mandat"""
+    return sum(queryset.count() for queryset in _mandat(mandat_id))
+
+
+def purger_historique(taille_lot=TAILLE_LOT, progression=None):
+    """Supprime tous les mandats terminés avec leur bureau et leur comité des doyens archivés"""
+    bureau, comite, mandats = _historique()
+    bureau = supprimer_par_lots(bureau, taille_lot, progression, 'bureau')
+    comite = supprimer_par_lots(comite, taille_lot, progression, 'comite')
+    mandats = supprimer_par_lots(mandats, taille_lot, progression, 'mandats')
+    return RapportPurge(mandats, bureau, comite)
+
+
+def purger_mandat(mandat_id, taille_lot=TAILLE_LOT, progression=None):
+    """Supprime un mandat terminé avec son bureau et son comité des doyens"""
+    bureau, comite, mandats = _mandat(mandat_id)
+    bureau = supprimer_par_lots(bureau, taille_lot, progression, 'bureau')
+    comite = supprimer_par_lots(comite, taille_lot, progression, 'comite')
+    mandats = supprimer_par_lots(mandats, taille_lot, progression, 'mandats')
+    return RapportPurge(mandats, bureau, comite)
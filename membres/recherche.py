@@ -0,0 +1,43 @@
+"""
+Recherche de membres par préfixe pour l'autocomplétion des formulaires.
+
+Le préfixe saisi est normalisé comme les clés cle_nom / cle_prenom du
+modèle puis cherché par intervalle (cle >= préfixe et < préfixe + U+10FFFF) :
+la requête parcourt l'index sans LIKE ni fonction sur la colonne.
+"""
+from django.db.models import Q
+
+from .models import Membre, normaliser_recherche
+
+LONGUEUR_MINIMALE = 2
+LIMITE_DEFAUT = 10
+LIMITE_MAXIMALE = 50
+# Plus grand point de code : borne supérieure de tous les textes commençant par le préfixe
+BORNE = '\U0010ffff'
+
+
+def _intervalle(champ, prefixe):
+    return Q(**{f'{champ}__gte': prefixe, f'{champ}__lt': prefixe + BORNE})
+
+
+def libelle_membre(membre):
+    """Texte affiché pour un membre (dictionnaire issu de rechercher_membres ou de valeurs_membre)"""
+    return f"{membre['prenom']} {membre['nom']} - {membre['association__nom']} ({membre['numero_carte']})"
+
+
+def valeurs_membre(queryset):
+    return queryset.values('id', 'prenom', 'nom', 'numero_carte', 'association__nom')
+
+
+def rechercher_membres(texte, limite=LIMITE_DEFAUT):
+    """Membres dont le nom, le prénom ou le numéro de carte commence par `texte`"""
+    prefixe = normaliser_recherche(texte)
+    if len(prefixe) < LONGUEUR_MINIMALE:
+        return []
+    limite = max(1, min(limite, LIMITE_MAXIMALE))
+    filtre = (
+        _intervalle('cle_nom', prefixe)
+        | _intervalle('cle_prenom', prefixe)
+        | _intervalle('numero_carte', texte.strip().upper())
+    )
+    return list(valeurs_membre(Membre.actifs.filter(filtre).order_by('cle_nom'))[:limite])
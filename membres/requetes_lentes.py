@@ -0,0 +1,205 @@
+"""
+Journal des requêtes SQL lentes.
+
+Un execute_wrapper posé sur chaque connexion (signal connection_created)
+chronomètre toutes les requêtes. Celles qui dépassent
+REQUETES_LENTES_SEUIL_MS sont retenues avec :
+
+- leur forme normalisée (littéraux et listes IN remplacés) et son empreinte ;
+- leurs paramètres masqués (types et longueurs seulement pour le texte) ;
+- la ligne du projet qui les a lancées (vue, action d'administration...) ;
+- leur plan d'exécution (EXPLAIN QUERY PLAN sous SQLite, EXPLAIN ailleurs),
+  relevé à la première occurrence de chaque empreinte dans le processus.
+
+Les entrées sont enregistrées dans RequeteLente, une ligne par empreinte
+(occurrences, durée totale et maximale), une fois sorti de toute
+transaction : à la fin de la requête HTTP ou à la prochaine requête SQL
+exécutée hors transaction. Un retour arrière n'efface donc pas le journal.
+"""
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+# Empreintes dont le plan a déjà été relevé par ce processus
+_plans_releves = set()
+_verrou = threading.Lock()
+
+INSTRUCTIONS_EXPLICABLES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+_CHAINES = re.compile(r"'(?:[^']|'')*'")
+_NOMBRES = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LISTES = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_ESPACES = re.compile(r'\s+')
+
+
+def seuil():
+    """Seuil en secondes (None : journal désactivé)"""
+    valeur = getattr(settings, 'REQUETES_LENTES_SEUIL_MS', 0)
+    return valeur / 1000 if valeur else None
+
+
+def normaliser(sql):
+    """Forme de la requête, indépendante des valeurs et de la taille des listes IN"""
+    sql = _CHAINES.sub('?', sql)
+    sql = _NOMBRES.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _LISTES.sub('(...)', sql)
+    return _ESPACES.sub(' ', sql).strip()
+
+
+def empreinte(sql_normalise):
+    return hashlib.sha1(sql_normalise.encode('utf-8')).hexdigest()
+
+
+def masquer(params):
+    """Paramètres sans leurs valeurs textuelles (nombres, booléens et NULL conservés)"""
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        params = params.values()
+    masques = []
+    for valeur in params:
+        if valeur is None or isinstance(valeur, (bool, int, float)):
+            masques.append(repr(valeur))
+        elif isinstance(valeur, (str, bytes, memoryview)):
+            masques.append(f'<{type(valeur).__name__} {len(valeur)}>')
+        else:
+            masques.append(f'<{type(valeur).__name__}>')
+    return ', '.join(masques)
+
+
+def emplacement(profondeur=3):
+    """
+    Lignes du projet (hors bibliothèques et hors ce module) les plus proches
+    de la requête dans la pile d'appel, de la plus proche à la plus lointaine :
+    "membres/journal.py:78 journaliser_queryset < membres/views.py:512 creer_mandat"
+    """
+    racine = str(settings.BASE_DIR) + os.sep
+    lignes = []
+    cadre = sys._getframe(1)
+    while cadre is not None and len(lignes) < profondeur:
+        fichier = cadre.f_code.co_filename
+        if fichier.startswith(racine) and fichier != __file__ and os.sep + 'site-packages' + os.sep not in fichier:
+            lignes.append(f'{os.path.relpath(fichier, racine)}:{cadre.f_lineno} {cadre.f_code.co_name}')
+        cadre = cadre.f_back
+    return ' < '.join(lignes)
+
+
+def _plan(connexion, sql, params):
+    """Plan d'exécution de `sql`, relevé sans exécuter la requête"""
+    prefixe = 'EXPLAIN QUERY PLAN ' if connexion.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        # Point de sauvegarde : un EXPLAIN en échec n'interrompt pas la transaction en cours
+        with transaction.atomic(using=connexion.alias, savepoint=connexion.in_atomic_block):
+            with connexion.cursor() as curseur:
+                curseur.execute(prefixe + sql, params)
+                lignes = curseur.fetchall()
+    except DatabaseError as e:
+        return f'(plan indisponible : {e})'
+    if connexion.vendor == 'sqlite':
+        # id, parent, inutilisé, détail : indentation selon la profondeur
+        profondeurs = {0: -1}
+        resultat = []
+        for identifiant, parent, _, detail in lignes:
+            profondeurs[identifiant] = profondeurs.get(parent, -1) + 1
+            resultat.append('  ' * profondeurs[identifiant] + detail)
+        return '\n'.join(resultat)
+    return '\n'.join(' | '.join(str(colonne) for colonne in ligne) for ligne in lignes)
+
+
+def _en_attente():
+    if not hasattr(_local, 'entrees'):
+        _local.entrees = []
+    return _local.entrees
+
+
+def surveiller(execute, sql, params, many, context):
+    """execute_wrapper : retient les requêtes plus longues que le seuil"""
+    limite = seuil()
+    if limite is None or getattr(_local, 'interne', False):
+        return execute(sql, params, many, context)
+
+    debut = time.perf_counter()
+    resultat = execute(sql, params, many, context)
+    duree = time.perf_counter() - debut
+
+    connexion = context['connection']
+    if duree >= limite:
+        _local.interne = True
+        try:
+            forme = normaliser(sql)
+            cle = empreinte(forme)
+            plan = ''
+            with _verrou:
+                nouveau = cle not in _plans_releves
+                _plans_releves.add(cle)
+            if nouveau and not many and sql.lstrip().upper().startswith(INSTRUCTIONS_EXPLICABLES):
+                plan = _plan(connexion, sql, params)
+            _en_attente().append({
+                'empreinte': cle, 'sql': forme, 'exemple': sql,
+                'parametres': '' if many else masquer(params), 'emplacement': emplacement(),
+                'plan': plan, 'duree': duree * 1000, 'date': timezone.now(),
+            })
+        finally:
+            _local.interne = False
+    if not connexion.in_atomic_block and _en_attente():
+        enregistrer()
+    return resultat
+
+
+def enregistrer(**kwargs):
+    """Enregistre les requêtes lentes en attente dans le thread courant (hors transaction)"""
+    entrees = _en_attente()
+    if not entrees or getattr(_local, 'interne', False):
+        return
+    if any(connexion.in_atomic_block for connexion in connections.all(initialized_only=True)):
+        return
+    from .models import RequeteLente
+
+    _local.entrees = []
+    _local.interne = True
+    try:
+        for entree in entrees:
+            mise_a_jour = {
+                'nombre': F('nombre') + 1,
+                'duree_totale': F('duree_totale') + entree['duree'],
+                'duree_max': Greatest(F('duree_max'), entree['duree']),
+                'derniere_date': entree['date'],
+                'emplacement': entree['emplacement'][:255],
+            }
+            if RequeteLente.objects.filter(empreinte=entree['empreinte']).update(**mise_a_jour):
+                continue
+            try:
+                RequeteLente.objects.create(
+                    empreinte=entree['empreinte'], sql=entree['sql'], exemple=entree['exemple'],
+                    parametres=entree['parametres'], emplacement=entree['emplacement'][:255],
+                    plan=entree['plan'], nombre=1, duree_totale=entree['duree'], duree_max=entree['duree'],
+                    premiere_date=entree['date'], derniere_date=entree['date'],
+                )
+            except IntegrityError:
+                # Créée entre-temps par un autre processus
+                RequeteLente.objects.filter(empreinte=entree['empreinte']).update(**mise_a_jour)
+    except DatabaseError:
+        # Table absente (migrations en cours), base verrouillée... : le journal ne bloque jamais l'application
+        logger.warning("Requêtes lentes non enregistrées", exc_info=True)
+    finally:
+        _local.interne = False
+
+
+def installer(sender, connection, **kwargs):
+    """Récepteur de connection_created : pose le chronométrage sur la connexion"""
+    if surveiller not in connection.execute_wrappers:
+        # En tête de liste : les execute_wrapper() temporaires retirent le dernier élément
+        connection.execute_wrappers.insert(0, surveiller)
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .cache import CACHE_STATS, invalider
+from .fizato import invalider_info_fizato
+from .hors_ligne import revoquer_cartes, revoquer_numero
+from .journal import CREATION, MODIFICATION, SUPPRESSION, MODELES_SUIVIS, journaliser
+from .models import Association, Membre, CarteMembre, InfoFizato
+from .navigation import espace_utilisateur
+from .verification import invalider_verifications
+
+
+@receiver(post_save, sender=Association)
+@receiver(post_delete, sender=Association)
+@receiver(post_save, sender=Membre)
+@receiver(post_delete, sender=Membre)
+@receiver(post_save, sender=CarteMembre)
+@receiver(post_delete, sender=CarteMembre)
+def invalider_statistiques(sender, instance, created=False, **kwargs):
+    """
+    Les compteurs globaux changent à la création ou à la suppression d'une
+    association, d'un membre ou d'une carte, et quand une carte est imprimée
+    """
+    supprime = kwargs['signal'] is post_delete
+    if created or supprime or sender is CarteMembre:
+        invalider(CACHE_STATS, 'globales')
+    # Résultats de vérification (QR code) : seulement les cartes concernées
+    if sender is CarteMembre:
+        invalider_verifications([instance.numero_unique])
+    elif sender is Membre:
+        if not created and not supprime:
+            invalider_verifications(CarteMembre.objects.filter(membre_id=instance.pk).values_list('numero_unique', flat=True))
+    elif not created:
+        # Nom de l'association affiché pour toutes ses cartes
+        invalider_verifications()
+
+
+@receiver(post_save, sender=Membre)
+@receiver(post_delete, sender=Membre)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalider_navigation(sender, instance, **kwargs):
+    """L'en-tête des pages (photo, nom, droits) est reconstruit dans les sessions du compte concerné"""
+    # La mise à jour de last_login à chaque connexion ne change rien à l'en-tête
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    if user_id is not None:
+        invalider(CACHE_STATS, espace_utilisateur(user_id))
+
+
+@receiver(post_save, sender=InfoFizato)
+@receiver(post_delete, sender=InfoFizato)
+def invalider_fizato(sender, **kwargs):
+    """Chaque processus relit les informations FIZATO (et prépare le nouveau logo)"""
+    invalider_info_fizato()
+
+
+@receiver(pre_delete, sender=CarteMembre)
+def revoquer_carte(sender, instance, **kwargs):
+    """Une carte supprimée doit être refusée par les lecteurs hors ligne (voir hors_ligne.py)"""
+    revoquer_cartes(CarteMembre.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Membre)
+def revoquer_ancien_numero(sender, instance, created, raw=False, **kwargs):
+    """Un numéro de carte remplacé ne doit plus être accepté par les lecteurs hors ligne"""
+    ancien = getattr(instance, '_numero_carte_charge', None)
+    if not created and not raw and ancien and ancien != instance.numero_carte:
+        revoquer_numero(instance.pk, ancien)
+    instance._numero_carte_charge = instance.numero_carte
+
+
+def journaliser_enregistrement(sender, instance, created, raw=False, **kwargs):
+    """Création ou modification d'un objet suivi par le flux de synchronisation (journal.py)"""
+    if not raw:
+        journaliser(sender, [instance.pk], CREATION if created else MODIFICATION)
+
+
+def journaliser_suppression(sender, instance, **kwargs):
+    journaliser(sender, [instance.pk], SUPPRESSION)
+
+
+for _modele in MODELES_SUIVIS:
+    post_save.connect(journaliser_enregistrement, sender=_modele, dispatch_uid=f'journal_save_{_modele._meta.label}')
+    post_delete.connect(journaliser_suppression, sender=_modele, dispatch_uid=f'journal_delete_{_modele._meta.label}')
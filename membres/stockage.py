@@ -0,0 +1,79 @@
+"""
+Stockage des fichiers statiques.
+
+collectstatic produit des noms empreintés (bootstrap.min.3c2f1a9d8e7b.css,
+servis avec un cache d'un an) puis, à côté de chacun, des variantes
+précompressées .gz et .br que le serveur web envoie telles quelles
+(gzip_static / brotli_static de nginx) : rien n'est compressé à la requête.
+
+Tant que collectstatic n'a pas produit le manifeste (tests, poste de
+développement, déploiement incomplet), les fichiers sont servis sous leur
+nom d'origine au lieu de faire échouer chaque {% static %}.
+"""
+import gzip
+import logging
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # Optionnel : sans brotli, seules les variantes .gz sont produites
+    brotli = None
+
+EXTENSIONS_COMPRESSIBLES = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.otf', '.eot', '.ico', '.html')
+TAILLE_MINIMALE = 1024
+# Une variante n'est gardée que si elle économise au moins 5 %
+GAIN_MINIMAL = 0.95
+
+logger = logging.getLogger(__name__)
+
+
+def compresser(contenu):
+    """Variantes compressées de `contenu` : {'.gz': ..., '.br': ...}"""
+    variantes = {'.gz': gzip.compress(contenu, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes['.br'] = brotli.compress(contenu, quality=11)
+    return variantes
+
+
+class StockagePrecompresse(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage qui précompresse les fichiers empreintés"""
+    # Un fichier absent du manifeste retombe sur son empreinte calculée au lieu de lever une erreur
+    manifest_strict = False
+
+    _manifeste_signale = False
+
+    def stored_name(self, name):
+        # Sans manifeste, pas d'empreinte : le nom d'origine (servi par STATICFILES_DIRS ou STATIC_ROOT)
+        if not self.manifest_hash:
+            if not settings.DEBUG and not self._manifeste_signale:
+                self._manifeste_signale = True
+                logger.warning(
+                    "Manifeste %s absent : lancer `manage.py collectstatic` (fichiers servis sans empreinte)",
+                    self.manifest_name,
+                )
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for nom in set(self.hashed_files.values()):
+            self.precompresser(nom)
+
+    def precompresser(self, nom):
+        if not nom.endswith(EXTENSIONS_COMPRESSIBLES):
+            return
+        # Le nom empreinté change avec le contenu : une variante existante est à jour
+        if self.exists(nom + '.gz'):
+            return
+        with self.open(nom) as fichier:
+            contenu = fichier.read()
+        if len(contenu) < TAILLE_MINIMALE:
+            return
+        for extension, compresse in compresser(contenu).items():
+            if len(compresse) < len(contenu) * GAIN_MINIMAL and not self.exists(nom + extension):
+                self._save(nom + extension, ContentFile(compresse))
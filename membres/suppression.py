@@ -0,0 +1,165 @@
+"""
+Suppression rapide des associations et des membres en masse.
+
+Une association est d'abord masquée (est_supprimee) puis supprimée en
+arrière-plan par lots de membres. Pour chaque lot, les cascades sont
+exécutées directement en SQL (DELETE ... WHERE fk IN (sous-requête)) sans
+charger les objets en mémoire, tant que seuls des modèles dont nous gérons
+nous-mêmes les signaux sont concernés ; sinon le lot repasse par le
+collecteur de Django. Les fichiers (photos, logos) sont effacés après la
+validation de chaque lot.
+"""
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import models, router, transaction
+from django.db.models.signals import pre_delete, post_delete
+from django.utils import timezone
+
+from .cache import CACHE_STATS, invalider
+from .hors_ligne import revoquer_cartes
+from .journal import MODIFICATION, SUPPRESSION, journaliser, journaliser_queryset
+from .medias import derives_de
+from .models import Association, Membre, CarteMembre
+from .navigation import ESPACE as ESPACE_NAVIGATION
+from .verification import invalider_verifications
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 200
+
+# Modèles dont les récepteurs de signaux de suppression (voir signals.py) ne font
+# qu'invalider des caches, révoquer des cartes ou journaliser : on les remplace par
+# une invalidation en fin de traitement, une révocation et une journalisation par lot.
+MODELES_SIGNAUX_GERES = {
+    'membres.Association', 'membres.Membre', 'membres.CarteMembre',
+    'membres.FonctionBureau', 'membres.MembreBureau', 'membres.Mandat', 'membres.ComiteDoyen',
+}
+
+_CASCADES_SQL = {models.CASCADE, models.SET_NULL, models.DO_NOTHING}
+
+
+def _cascade_sql_possible(modele, deja_vus=None):
+    """Vrai si la suppression de `modele` et de ses dépendances peut se faire en SQL pur"""
+    deja_vus = deja_vus if deja_vus is not None else set()
+    if modele in deja_vus:
+        return True
+    deja_vus.add(modele)
+
+    if modele._meta.many_to_many:
+        return False
+    if modele._meta.label not in MODELES_SIGNAUX_GERES and (
+        pre_delete.has_listeners(modele) or post_delete.has_listeners(modele)
+    ):
+        return False
+    for relation in modele._meta.related_objects:
+        if relation.many_to_many or relation.on_delete not in _CASCADES_SQL:
+            return False
+        if relation.on_delete is models.CASCADE and not _cascade_sql_possible(relation.related_model, deja_vus):
+            return False
+    return True
+
+
+def _supprimer_sql(queryset):
+    """Supprime `queryset` et ses dépendances avec des DELETE/UPDATE ensemblistes (journalisés)"""
+    using = queryset.db
+    for relation in queryset.model._meta.related_objects:
+        filtre = {f'{relation.field.name}__in': queryset.values('pk')}
+        enfants = relation.related_model._base_manager.using(using).filter(**filtre)
+        if relation.on_delete is models.CASCADE:
+            _supprimer_sql(enfants)
+        elif relation.on_delete is models.SET_NULL:
+            journaliser_queryset(enfants, MODIFICATION)
+            enfants.update(**{relation.field.name: None})
+    journaliser_queryset(queryset, SUPPRESSION)
+    return queryset._raw_delete(using)
+
+
+def supprimer_fichiers(noms):
+    """Efface les fichiers média qui ne sont plus référencés par aucun membre ou association"""
+    noms = {nom for nom in noms if nom}
+    if not noms:
+        return 0
+    encore_utilises = set(Membre.objects.filter(photo__in=noms).values_list('photo', flat=True))
+    for champ in ('logo_association', 'logo_universite', 'logo_fizato'):
+        encore_utilises.update(Association.tous.filter(**{f'{champ}__in': noms}).values_list(champ, flat=True))
+
+    supprimes = 0
+    for nom in noms - encore_utilises:
+        # Les miniatures publiques (derive_image) disparaissent avec leur source
+        for fichier in [nom, *derives_de(nom, default_storage)]:
+            try:
+                default_storage.delete(fichier)
+                supprimes += 1
+            except OSError:
+                logger.warning("Impossible de supprimer le fichier %s", fichier)
+    return supprimes
+
+
+def supprimer_membres(queryset, taille_lot=TAILLE_LOT, progression=None):
+    """
+    Supprime les membres de `queryset` par lots, avec leurs cartes, fonctions
+    au bureau, comités des doyens... et leurs photos.
+
+    Retourne le nombre de membres supprimés.
+    """
+    using = router.db_for_write(Membre)
+    sql_possible = _cascade_sql_possible(Membre)
+    total = 0
+    while True:
+        with transaction.atomic(using=using):
+            lot = list(queryset.order_by().values_list('id', 'photo')[:taille_lot])
+            if not lot:
+                break
+            ids = [membre_id for membre_id, _ in lot]
+            revoquer_cartes(CarteMembre.objects.using(using).filter(membre_id__in=ids))
+            membres = Membre.objects.using(using).filter(id__in=ids)
+            if sql_possible:
+                _supprimer_sql(membres)
+            else:
+                membres.delete()
+            photos = [photo for _, photo in lot]
+            transaction.on_commit(lambda photos=photos: supprimer_fichiers(photos), using=using)
+        total += len(ids)
+        if progression:
+            progression(total)
+
+    if total:
+        invalider(CACHE_STATS, 'globales')
+        invalider(CACHE_STATS, ESPACE_NAVIGATION)
+        invalider_verifications()
+    return total
+
+
+def masquer_association(association):
+    """Masque immédiatement une association (et ses membres) en attendant sa suppression"""
+    Association.tous.filter(pk=association.pk).update(est_supprimee=True, updated_at=timezone.now())
+    journaliser(Association, [association.pk], MODIFICATION)
+    association.est_supprimee = True
+    revoquer_cartes(CarteMembre.objects.filter(membre__association_id=association.pk))
+    invalider(CACHE_STATS, 'globales')
+    # Les cartes des membres masqués ne doivent plus être reconnues au scan
+    invalider_verifications()
+
+
+def supprimer_association(association_id, taille_lot=TAILLE_LOT, progression=None):
+    """Supprime définitivement une association masquée, ses membres et ses fichiers"""
+    association = Association.tous.filter(pk=association_id).first()
+    if association is None:
+        return 0
+
+    nb_membres = supprimer_membres(Membre.objects.filter(association_id=association_id), taille_lot, progression)
+    logos = [association.logo_association.name, association.logo_universite.name, association.logo_fizato.name]
+    Association.tous.filter(pk=association_id).delete()
+    supprimer_fichiers(logos)
+    invalider(CACHE_STATS, 'globales')
+    return nb_membres
+
+
+def finaliser_suppressions(progression=None):
+    """Termine la suppression des associations masquées (après un redémarrage par exemple)"""
+    total = 0
+    for association_id in Association.tous.filter(est_supprimee=True).values_list('id', flat=True):
+        supprimer_association(association_id, progression=progression)
+        total += 1
+    return total
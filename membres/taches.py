@@ -0,0 +1,315 @@
+"""
+File de tâches en base pour les traitements longs (suppressions, création
+de comptes, purges...), exécutés hors des requêtes HTTP par
+`manage.py run_workers`.
+
+- Une tâche est une fonction déclarée avec @tache('nom') ; mettre_en_file()
+  enregistre un appel (arguments sérialisables en JSON) dans Tache.
+  lancer() exécute tout de suite les petits traitements (TACHES_SEUIL_DIRECT)
+  et ne met en file que les gros : sans travailleur, un petit site reste
+  utilisable.
+- Un travailleur réserve une tâche par un UPDATE conditionnel
+  (statut en attente -> en cours) : quand plusieurs travailleurs visent la
+  même tâche, un seul UPDATE touche la ligne, les autres passent à la suivante.
+- Une tâche en échec est reprise plus tard (attente doublée à chaque
+  tentative, TACHES_DELAI_REPRISE au départ) jusqu'à tentatives_max.
+- La tâche signale son avancement avec avancement(fait, total, message).
+- Pendant l'exécution, un thread du travailleur renouvelle date_signal
+  (battement) : une tâche en cours sans signe de vie depuis
+  TACHES_DELAI_ABANDON a perdu son travailleur (machine arrêtée...) et est
+  comptée comme une tentative en échec, jamais exécutée deux fois à la fois.
+- Les travailleurs assurent aussi l'entretien périodique : expiration des
+  mots de passe temporaires des lots d'identifiants (identifiants.py).
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import comptes, identifiants, instrumentation, purge, suppression
+from .models import Membre, Tache
+
+logger = logging.getLogger(__name__)
+
+TACHES = {}
+# Intervalle minimal entre deux enregistrements de l'avancement (secondes)
+INTERVALLE_AVANCEMENT = 1.0
+CANDIDATS = 10
+# Tâche exécutable depuis ce délai sans avoir été prise : aucun travailleur ne traite la file (secondes)
+RETARD_ALERTE = 300
+
+_local = threading.local()
+
+
+def tache(nom, tentatives_max=3):
+    """Décorateur : déclare la fonction comme tâche exécutable par les travailleurs"""
+    def decorateur(fonction):
+        fonction.nom_tache = nom
+        fonction.tentatives_max = tentatives_max
+        TACHES[nom] = fonction
+        return fonction
+    return decorateur
+
+
+def mettre_en_file(nom, *args, cree_par=None, delai=0, **kwargs):
+    """Enregistre l'exécution de la tâche `nom` ; retourne la Tache créée"""
+    fonction = TACHES[nom]
+    # Refus immédiat des arguments non sérialisables (querysets, objets...)
+    arguments = json.loads(json.dumps({'args': list(args), 'kwargs': kwargs}))
+    nouvelle = Tache.objects.create(
+        nom=nom, arguments=arguments, tentatives_max=fonction.tentatives_max,
+        executer_apres=timezone.now() + timedelta(seconds=delai),
+        cree_par=cree_par if cree_par is not None and cree_par.is_authenticated else None,
+    )
+    instrumentation.incrementer('taches.lancees')
+    return nouvelle
+
+
+def lancer(nom, *args, taille, cree_par=None, **kwargs):
+    """
+    Exécute la tâche `nom` immédiatement si elle porte sur au plus
+    TACHES_SEUIL_DIRECT lignes (`taille`), sinon la met en file.
+    Retourne (Tache mise en file, None) ou (None, résultat de la tâche).
+    """
+    if taille <= getattr(settings, 'TACHES_SEUIL_DIRECT', 100):
+        return None, TACHES[nom](*args, **kwargs)
+    return mettre_en_file(nom, *args, cree_par=cree_par, **kwargs), None
+
+
+def identifiant_travailleur(pid=None):
+    """Identifiant d'un processus travailleur : machine et numéro de processus"""
+    return f'{socket.gethostname()}:{pid or os.getpid()}'[:100]
+
+
+def _delai_reprise(tentatives):
+    base = getattr(settings, 'TACHES_DELAI_REPRISE', 30)
+    delai = min(base * 2 ** (tentatives - 1), getattr(settings, 'TACHES_DELAI_REPRISE_MAX', 3600))
+    # Un peu d'aléa : les tâches en échec au même moment ne repartent pas ensemble
+    return delai * random.uniform(1, 1.1)
+
+
+def _echec(tache_id, tentatives, tentatives_max, erreur, travailleur=None):
+    """Replanifie la tâche, ou la marque échouée à la dernière tentative"""
+    maintenant = timezone.now()
+    taches = Tache.objects.filter(pk=tache_id, statut=Tache.STATUT_EN_COURS)
+    if travailleur is not None:
+        taches = taches.filter(travailleur=travailleur)
+    if tentatives < tentatives_max:
+        taches.update(
+            statut=Tache.STATUT_EN_ATTENTE, erreur=erreur, travailleur='',
+            executer_apres=maintenant + timedelta(seconds=_delai_reprise(tentatives)),
+        )
+        instrumentation.incrementer('taches.reprises')
+    else:
+        taches.update(statut=Tache.STATUT_ECHOUEE, erreur=erreur, date_fin=maintenant)
+        instrumentation.incrementer('taches.echouees')
+
+
+def liberer_abandonnees():
+    """Traite comme des échecs les tâches en cours dont le travailleur ne donne plus signe de vie"""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'TACHES_DELAI_ABANDON', 3600))
+    abandonnees = Tache.objects.filter(statut=Tache.STATUT_EN_COURS, date_signal__lt=limite)
+    for tache_id, tentatives, tentatives_max, travailleur in abandonnees.values_list(
+        'id', 'tentatives', 'tentatives_max', 'travailleur',
+    ):
+        _echec(tache_id, tentatives, tentatives_max, f'Travailleur {travailleur} sans signe de vie', travailleur)
+
+
+def liberer_travailleur(travailleur):
+    """Remet en file les tâches d'un travailleur arrêté (processus terminé par le superviseur)"""
+    for tache_id, tentatives, tentatives_max in Tache.objects.filter(
+        statut=Tache.STATUT_EN_COURS, travailleur=travailleur,
+    ).values_list('id', 'tentatives', 'tentatives_max'):
+        _echec(tache_id, tentatives, tentatives_max, f'Travailleur {travailleur} arrêté', travailleur)
+
+
+def reserver(travailleur):
+    """Réserve la prochaine tâche exécutable pour `travailleur` ; None si la file est vide"""
+    maintenant = timezone.now()
+    candidats = list(
+        Tache.objects.filter(statut=Tache.STATUT_EN_ATTENTE, executer_apres__lte=maintenant)
+        .order_by('executer_apres', 'id').values_list('id', flat=True)[:CANDIDATS]
+    )
+    for tache_id in candidats:
+        reservee = Tache.objects.filter(pk=tache_id, statut=Tache.STATUT_EN_ATTENTE).update(
+            statut=Tache.STATUT_EN_COURS, travailleur=travailleur, tentatives=F('tentatives') + 1,
+            date_debut=maintenant, date_signal=maintenant, avancement=0, avancement_total=None, message='',
+        )
+        if reservee:
+            return Tache.objects.get(pk=tache_id)
+    return None
+
+
+def avancement(fait, total=None, message=''):
+    """
+    Signale l'avancement de la tâche en cours d'exécution dans ce thread
+    (sans effet hors d'une tâche). Enregistré au plus une fois par seconde.
+    """
+    tache_id = getattr(_local, 'tache_id', None)
+    if tache_id is None:
+        return
+    maintenant = time.monotonic()
+    if maintenant - getattr(_local, 'dernier_avancement', 0) < INTERVALLE_AVANCEMENT:
+        return
+    _local.dernier_avancement = maintenant
+    Tache.objects.filter(pk=tache_id).update(
+        avancement=fait, avancement_total=total, message=message[:255], date_signal=timezone.now(),
+    )
+
+
+def _intervalle_battement():
+    # Plusieurs battements par délai d'abandon : un battement manqué (base occupée) ne suffit pas
+    return max(1.0, min(60.0, getattr(settings, 'TACHES_DELAI_ABANDON', 3600) / 4))
+
+
+def _battement(tache_id, travailleur, fin):
+    """Renouvelle le signe de vie de la tâche jusqu'à ce que `fin` soit posé (thread dédié)"""
+    try:
+        while not fin.wait(_intervalle_battement()):
+            try:
+                Tache.objects.filter(pk=tache_id, travailleur=travailleur, statut=Tache.STATUT_EN_COURS).update(
+                    date_signal=timezone.now(),
+                )
+            except DatabaseError:
+                logger.warning("Battement de la tâche n°%s non enregistré", tache_id, exc_info=True)
+    finally:
+        connections.close_all()
+
+
+def _resultat_json(resultat):
+    try:
+        return json.loads(json.dumps(resultat))
+    except (TypeError, ValueError):
+        return str(resultat)
+
+
+def executer(tache_reservee):
+    """Exécute une tâche réservée et enregistre son résultat ou son échec"""
+    fonction = TACHES.get(tache_reservee.nom)
+    if fonction is None:
+        _echec(tache_reservee.pk, tache_reservee.tentatives_max, tache_reservee.tentatives_max,
+               f'Tâche inconnue : {tache_reservee.nom}')
+        return
+    _local.tache_id = tache_reservee.pk
+    _local.dernier_avancement = 0
+    fin = threading.Event()
+    battement = threading.Thread(
+        target=_battement, args=(tache_reservee.pk, tache_reservee.travailleur, fin), daemon=True,
+    )
+    battement.start()
+    try:
+        arguments = tache_reservee.arguments or {}
+        resultat = fonction(*arguments.get('args', []), **arguments.get('kwargs', {}))
+    except Exception:
+        logger.exception("Échec de la tâche n°%s (%s)", tache_reservee.pk, tache_reservee.nom)
+        _echec(tache_reservee.pk, tache_reservee.tentatives, tache_reservee.tentatives_max,
+               traceback.format_exc(), tache_reservee.travailleur)
+    else:
+        Tache.objects.filter(pk=tache_reservee.pk, travailleur=tache_reservee.travailleur).update(
+            statut=Tache.STATUT_TERMINEE, resultat=_resultat_json(resultat), erreur='', date_fin=timezone.now(),
+        )
+        instrumentation.incrementer('taches.terminees')
+    finally:
+        fin.set()
+        battement.join()
+        _local.tache_id = None
+        close_old_connections()
+
+
+def file_active(limite=10):
+    """
+    Tâches en attente ou en cours (les plus anciennes d'abord), retard de
+    la file (vrai quand une tâche exécutable attend depuis RETARD_ALERTE :
+    run_workers n'est pas lancé ou ne suit pas) et nombre de tâches échouées
+    """
+    actives = Tache.objects.filter(statut__in=[Tache.STATUT_EN_ATTENTE, Tache.STATUT_EN_COURS])
+    limite_retard = timezone.now() - timedelta(seconds=RETARD_ALERTE)
+    return {
+        'taches_actives': list(actives.order_by('id')[:limite]),
+        'file_en_retard': actives.filter(statut=Tache.STATUT_EN_ATTENTE, executer_apres__lt=limite_retard).exists(),
+        'taches_echouees': Tache.objects.filter(statut=Tache.STATUT_ECHOUEE).count(),
+    }
+
+
+def message_mise_en_file(tache_en_file):
+    """Texte à afficher après une mise en file : le traitement n'est pas encore fait"""
+    return (
+        f"mis en file (tâche n°{tache_en_file.id}), en attente d'un travailleur : "
+        f"il sera effectué par manage.py run_workers."
+    )
+
+
+def travailler(travailleur, arret, intervalle=1.0, jusqu_a_vide=False):
+    """
+    Boucle d'un travailleur : exécute les tâches une à une jusqu'à ce que
+    l'événement `arret` soit posé (ou que la file soit vide si `jusqu_a_vide`).
+    """
+    derniere_liberation = 0
+    while not arret.is_set():
+        close_old_connections()
+        if time.monotonic() - derniere_liberation > 60:
+            liberer_abandonnees()
+            identifiants.expirer_lots()
+            derniere_liberation = time.monotonic()
+        suivante = reserver(travailleur)
+        if suivante is not None:
+            executer(suivante)
+        elif jusqu_a_vide:
+            return
+        else:
+            arret.wait(intervalle)
+
+
+# Tâches de l'application membres
+
+@tache('suppression.association')
+def supprimer_association(association_id):
+    """Suppression définitive d'une association masquée (membres, cartes, fichiers)"""
+    nb_membres = suppression.supprimer_association(
+        association_id, progression=lambda total: avancement(total, message='membres supprimés'),
+    )
+    return {'membres': nb_membres}
+
+
+@tache('suppression.membres')
+def supprimer_membres(membres_ids):
+    nb_membres = suppression.supprimer_membres(
+        Membre.objects.filter(id__in=membres_ids),
+        progression=lambda total: avancement(total, len(membres_ids), 'membres supprimés'),
+    )
+    return {'membres': nb_membres}
+
+
+@tache('suppression.finalisation')
+def finaliser_suppressions():
+    return {'associations': suppression.finaliser_suppressions()}
+
+
+@tache('comptes.creation')
+def creer_comptes_utilisateurs(membres_ids):
+    crees = comptes.creer_comptes_utilisateurs(
+        membres_ids, progression=lambda fait, total: avancement(fait, total, 'comptes créés'),
+    )
+    return {'comptes': len(crees)}
+
+
+@tache('purge.historique')
+def purger_historique():
+    rapport = purge.purger_historique(progression=lambda etape, total: avancement(total, message=f'{etape} : lignes supprimées'))
+    return rapport._asdict()
+
+
+@tache('purge.mandat')
+def purger_mandat(mandat_id):
+    rapport = purge.purger_mandat(mandat_id, progression=lambda etape, total: avancement(total, message=f'{etape} : lignes supprimées'))
+    return rapport._asdict()
@@ -24,12 +24,27 @@ urlpatterns = [
     path('membres/ajouter/<int:association_id>/', views.ajouter_membre, name='ajouter_membre_association'),
     path('membres/<int:membre_id>/modifier/', views.modifier_membre, name='modifier_membre'),
     path('membres/<int:membre_id>/supprimer/', views.supprimer_membre, name='supprimer_membre'),
+    path('membres/autocompletion/', views.autocompletion_membres, name='autocompletion_membres'),
     
     # Cartes
     path('cartes/', views.liste_cartes_membres, name='liste_cartes_membres'),
     path('cartes/generer/', views.generer_cartes, name='generer_cartes'),
     path('cartes/imprimer/<int:membre_id>/', views.print_carte_membre, name='print_carte_membre'),
     path('cartes/imprimer-multiples/<str:membres_ids>/', views.print_cartes_multiples, name='print_cartes_multiples'),
+    # Vérification publique des cartes (URL courte : elle est encodée dans le QR code des cartes)
+    path('v/<str:jeton>/', views.verifier_carte, name='verifier_carte'),
+    path('cartes/verification/paquet/', views.paquet_verification, name='paquet_verification'),
+    
+    # Événements (pointage des cartes à l'entrée)
+    path('evenements/<int:evenement_id>/pointages/', views.pointages_evenement, name='pointages_evenement'),
+    path('evenements/<int:evenement_id>/presences/', views.presences_evenement, name='presences_evenement'),
+    
+    # Synchronisation incrémentale (journal des modifications)
+    path('changements/', views.flux_changements, name='flux_changements'),
+    
+    # API JSON en lecture (voir api.py)
+    path('api/v1/<str:ressource>/', views.api_liste, name='api_liste'),
+    path('api/v1/<str:ressource>/<int:pk>/', views.api_detail, name='api_detail'),
     
     # FIZATO Management
     path('fizato/', views.detail_fizato, name='detail_fizato'),
@@ -0,0 +1,157 @@
+"""
+Vérification des cartes par QR code.
+
+Chaque carte imprimée porte un QR code contenant l'URL de vérification
+publique de la carte. L'URL contient un jeton signé construit à partir de
+CarteMembre.numero_unique : l'UUID (16 octets) et une empreinte HMAC
+tronquée, le tout en base64 URL. Le jeton reste court (37 caractères),
+ce qui garde un QR code lisible une fois réduit à la taille d'une carte.
+
+Un jeton falsifié est rejeté sans requête. Le résultat d'une vérification
+est gardé VERIFICATION_DUREE secondes dans le cache de statistiques, dans
+l'espace 'verification' (invalidé par les suppressions en masse et la
+modification d'une association) ; sa clé porte aussi la version propre à
+la carte, changée quand la carte ou son membre est modifié (signals.py).
+"""
+import base64
+import binascii
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from .cache import CACHE_FRAGMENTS, CACHE_STATS, invalider, obtenir_ou_calculer, version
+from .medias import derive_image
+from .models import CarteMembre, Membre
+
+ESPACE = 'verification'
+ESPACE_QR = 'qr'
+SEL = 'membres.verification.carte'
+# Octets d'empreinte HMAC conservés dans le jeton (80 bits)
+OCTETS_SIGNATURE = 10
+LARGEUR_MINIATURE = 96
+DUREE_QR = 24 * 3600
+
+
+def _b64(octets):
+    return base64.urlsafe_b64encode(octets).rstrip(b'=').decode('ascii')
+
+
+def _depuis_b64(texte):
+    return base64.urlsafe_b64decode(texte + '=' * (-len(texte) % 4))
+
+
+def _signature(octets):
+    return salted_hmac(SEL, octets, algorithm='sha256').digest()[:OCTETS_SIGNATURE]
+
+
+def jeton_carte(numero_unique):
+    """Jeton signé d'une carte, à partir de son numero_unique (UUID)"""
+    octets = uuid.UUID(str(numero_unique)).bytes
+    return f'{_b64(octets)}.{_b64(_signature(octets))}'
+
+
+def lire_jeton(jeton):
+    """numero_unique (UUID) porté par `jeton`, ou None si le jeton est mal formé ou falsifié"""
+    valeur, _, signature = (jeton or '').partition('.')
+    try:
+        octets = _depuis_b64(valeur)
+        attendue = _depuis_b64(signature)
+    except (binascii.Error, ValueError):
+        return None
+    if len(octets) != 16 or not constant_time_compare(attendue, _signature(octets)):
+        return None
+    return uuid.UUID(bytes=octets)
+
+
+def _miniature(photo):
+    if not photo:
+        return ''
+    stockage = Membre._meta.get_field('photo').storage
+    try:
+        derive = derive_image(photo, LARGEUR_MINIATURE, stockage)
+    except OSError:
+        return ''
+    return stockage.url(derive) if derive else ''
+
+
+def _verifier(numero_unique):
+    carte = CarteMembre.objects.filter(numero_unique=numero_unique).values(
+        'membre__prenom', 'membre__nom', 'membre__numero_carte', 'membre__photo',
+        'membre__association__nom', 'membre__association__est_supprimee',
+    ).first()
+    if carte is None:
+        return {'valide': False, 'motif': 'carte_inconnue'}
+    if carte['membre__association__est_supprimee']:
+        return {'valide': False, 'motif': 'association_supprimee'}
+    return {
+        'valide': True,
+        'prenom': carte['membre__prenom'],
+        'nom': carte['membre__nom'],
+        'numero_carte': carte['membre__numero_carte'],
+        'association': carte['membre__association__nom'],
+        'photo': _miniature(carte['membre__photo']),
+    }
+
+
+def verifier_jeton(jeton):
+    """
+    Résultat de la vérification d'un jeton scanné :
+    {'valide': True, 'prenom', 'nom', 'numero_carte', 'association', 'photo'}
+    ou {'valide': False, 'motif': ...}.
+    """
+    numero_unique = lire_jeton(jeton)
+    if numero_unique is None:
+        return {'valide': False, 'motif': 'jeton_invalide'}
+    version_carte = version(CACHE_STATS, _espace_carte(numero_unique))
+    return obtenir_ou_calculer(
+        CACHE_STATS, ESPACE, [numero_unique.hex, version_carte], lambda: _verifier(numero_unique),
+        duree=getattr(settings, 'VERIFICATION_DUREE', 60),
+    )
+
+
+def _svg_qr(donnees):
+    from reportlab.graphics.barcode.qrencoder import QRCode, QRErrorCorrectLevel
+
+    code = QRCode(None, QRErrorCorrectLevel.M)
+    code.addData(donnees)
+    code.make()
+    taille = code.getModuleCount()
+    marge = 2
+    # Un seul chemin : un segment horizontal par suite de modules sombres
+    segments = []
+    for ligne in range(taille):
+        colonne = 0
+        while colonne < taille:
+            if code.isDark(ligne, colonne):
+                debut = colonne
+                while colonne < taille and code.isDark(ligne, colonne):
+                    colonne += 1
+                segments.append(f'M{debut + marge} {ligne + marge}h{colonne - debut}v1h-{colonne - debut}z')
+            else:
+                colonne += 1
+    cote = taille + 2 * marge
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {cote} {cote}" shape-rendering="crispEdges">'
+        f'<rect width="{cote}" height="{cote}" fill="#fff"/><path fill="#000" d="{"".join(segments)}"/></svg>'
+    )
+
+
+def qr_code_svg(donnees):
+    """QR code SVG (balise <svg> autonome) encodant `donnees`, mis en cache"""
+    empreinte = hashlib.md5(donnees.encode('utf-8')).hexdigest()
+    return obtenir_ou_calculer(CACHE_FRAGMENTS, ESPACE_QR, [empreinte], lambda: _svg_qr(donnees), duree=DUREE_QR)
+
+
+def _espace_carte(numero_unique):
+    return f'{ESPACE}:{uuid.UUID(str(numero_unique)).hex}'
+
+
+def invalider_verifications(numeros_uniques=None):
+    """Invalide les vérifications des cartes données, ou de toutes les cartes"""
+    if numeros_uniques is None:
+        invalider(CACHE_STATS, ESPACE)
+        return
+    for numero_unique in numeros_uniques:
+        invalider(CACHE_STATS, _espace_carte(numero_unique))
@@ -1,31 +1,72 @@
+import hmac
+import json
+import mimetypes
+import os
+from stat import S_ISREG
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, FileResponse, StreamingHttpResponse, Http404, HttpResponseForbidden
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.urls import reverse
+from django.utils.http import http_date
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models import Q
-from .models import Association, Membre, CarteMembre, InfoFizato, FonctionBureau, MembreBureau, Mandat, ComiteDoyen
+from django.views.decorators.http import condition, require_POST
+from .models import Association, Membre, CarteMembre, InfoFizato, FonctionBureau, MembreBureau, Mandat, ComiteDoyen, Evenement
 from .forms import AssociationForm, MembreForm, GenerationCarteForm, MembreAutoEditForm, InfoFizatoForm, FonctionBureauForm, MembreBureauForm, MandatForm, CreerMandatForm, ComiteDoyenForm
 from .decorators import admin_required, can_modify_members, can_view_member_data
+from .cache import CACHE_STATS, obtenir_ou_calculer
+from .fizato import info_fizato as info_fizato_en_cache
+from .conditionnel import (
+    page_conditionnelle, etat_detail_association, etat_carte_membre, etat_detail_fizato, etat_historique_fizato,
+)
+from .mandats import cloturer_mandat, MandatDejaTermine
+from .suppression import masquer_association
+from .purge import taille_historique, taille_mandat
+from .taches import file_active, lancer, message_mise_en_file
+from .recherche import LIMITE_DEFAUT, libelle_membre, rechercher_membres
+from .verification import jeton_carte, qr_code_svg, verifier_jeton
+from .hors_ligne import generer_paquet, version_courante
+from .pointages import LotInvalide, enregistrer_pointages, statistiques_evenement
+from .journal import LIMITE_DEFAUT as LIMITE_CHANGEMENTS, MODIFICATION, journaliser_queryset, lire_changements
+from .api import RESSOURCES, AccesRefuse, RequeteInvalide, etag_requete, lire_objet, lire_page
+from . import metriques, profilage
+from .memoire import mesure_memoire
+from .medias import PlageInvalide, analyser_plage, cache_control, etag_fichier, lire_plage
+from . import instrumentation
+
+
+def _statistiques_globales():
+    """Compteurs globaux, mis en cache et invalidés par les signaux (voir signals.py)"""
+    def calcul():
+        return {
+            'total_associations': Association.objects.count(),
+            'total_membres': Membre.actifs.count(),
+            'total_cartes': CarteMembre.objects.count(),
+            'cartes_imprimees': CarteMembre.objects.filter(est_imprimee=True).count(),
+        }
+    return obtenir_ou_calculer(CACHE_STATS, 'globales', ['compteurs'], calcul)
 
 @login_required
 def dashboard(request):
     """Vue principale avec statistiques"""
-    context = {
-        'total_associations': Association.objects.count(),
-        'total_membres': Membre.objects.count(),
-        'total_cartes': CarteMembre.objects.count(),
-        'cartes_imprimees': CarteMembre.objects.filter(est_imprimee=True).count(),
-    }
+    context = dict(_statistiques_globales())
+    if request.user.is_staff:
+        context.update(file_active())
     return render(request, 'membres/dashboard.html', context)
 
 @login_required
 def liste_associations(request):
     """Liste des associations avec statistiques"""
     associations = Association.objects.prefetch_related('membres').all()
-    total_membres = Membre.objects.count()
+    total_membres = _statistiques_globales()['total_membres']
     
     context = {
         'associations': associations,
@@ -34,6 +75,7 @@ def liste_associations(request):
     }
     return render(request, 'membres/liste_associations.html', context)
 
+@page_conditionnelle(etat_detail_association)
 def detail_association(request, association_id):
     """Détail d'une association avec ses membres"""
     association = get_object_or_404(Association, id=association_id)
@@ -90,18 +132,27 @@ def supprimer_association(request, association_id):
     
     if request.method == 'POST':
         nom_association = association.nom
-        association.delete()
-        messages.success(request, f'Association "{nom_association}" supprimée avec succès!')
+        # Masquer tout de suite, supprimer membres, cartes et fichiers (en arrière-plan si l'association est grosse)
+        masquer_association(association)
+        tache, resultat = lancer(
+            'suppression.association', association.id,
+            taille=Membre.objects.filter(association_id=association.id).count(), cree_par=request.user,
+        )
+        if tache is None:
+            messages.success(request, f'Association "{nom_association}" supprimée avec ses {resultat["membres"]} membre(s).')
+        else:
+            messages.info(request, f'Association "{nom_association}" masquée ; la suppression de ses membres est {message_mise_en_file(tache)}')
         return redirect('liste_associations')
     
     return render(request, 'membres/confirmer_suppression_association.html', {
         'association': association
     })
 
+@mesure_memoire()
 def liste_membres(request):
     """Liste des membres - tous les utilisateurs connectés peuvent voir tous les membres"""
     # Tous les utilisateurs connectés peuvent voir la liste complète des membres
-    membres = Membre.objects.select_related('association').prefetch_related('carte')
+    membres = Membre.actifs.select_related('association').prefetch_related('carte')
     
     return render(request, 'membres/liste_membres.html', {
         'membres': membres,
@@ -139,7 +190,7 @@ def ajouter_membre(request, association_id=None):
 @can_modify_members
 def modifier_membre(request, membre_id):
     """Modifier un membre existant (réservé aux administrateurs)"""
-    membre = get_object_or_404(Membre, id=membre_id)
+    membre = get_object_or_404(Membre.actifs, id=membre_id)
     
     if request.method == 'POST':
         form = MembreForm(request.POST, request.FILES, instance=membre)
@@ -169,7 +220,7 @@ def modifier_membre(request, membre_id):
 @can_modify_members
 def supprimer_membre(request, membre_id):
     """Supprimer un membre"""
-    membre = get_object_or_404(Membre, id=membre_id)
+    membre = get_object_or_404(Membre.actifs, id=membre_id)
     
     if request.method == 'POST':
         nom_membre = f"{membre.prenom} {membre.nom}"
@@ -182,6 +233,7 @@ def supprimer_membre(request, membre_id):
     })
 
 @can_modify_members
+@mesure_memoire()
 def generer_cartes(request):
     """Sélectionner les membres pour générer leurs cartes"""
     if request.method == 'POST':
@@ -200,7 +252,7 @@ def generer_cartes(request):
             messages.error(request, 'Veuillez sélectionner au moins un membre.')
     
     # Récupérer tous les membres de toutes les associations FIZATO
-    membres = Membre.objects.select_related('association').all().order_by('association__nom', 'nom', 'prenom')
+    membres = Membre.actifs.select_related('association').all().order_by('association__nom', 'nom', 'prenom')
     associations = Association.objects.all().order_by('nom')
     
     context = {
@@ -219,9 +271,11 @@ def liste_cartes_membres(request):
         'is_admin': request.user.is_staff or request.user.is_superuser
     })
 
+@page_conditionnelle(etat_carte_membre)
 def print_carte_membre(request, membre_id):
     """Imprimer la carte d'un membre spécifique"""
-    membre = get_object_or_404(Membre, id=membre_id)
+    membre = get_object_or_404(Membre.actifs, id=membre_id)
+    instrumentation.incrementer('impressions.demandees')
     
     # Créer une carte si elle n'existe pas
     carte, created = CarteMembre.objects.get_or_create(
@@ -238,10 +292,15 @@ def print_carte_membre(request, membre_id):
     context = {
         'membre': membre,
         'carte': carte,
+        'qr_code': qr_code_carte(request, carte),
     }
     
-    return render(request, 'membres/print_carte_membre.html', context)
+    response = render(request, 'membres/print_carte_membre.html', context)
+    instrumentation.incrementer('impressions.terminees')
+    instrumentation.incrementer('impressions.cartes')
+    return response
 
+@mesure_memoire()
 def print_cartes_multiples(request, membres_ids):
     """Imprimer plusieurs cartes sur une page (format 4x5 = 20 cartes max)"""
     # Convertir la chaîne d'IDs en liste
@@ -257,14 +316,16 @@ def print_cartes_multiples(request, membres_ids):
         return redirect('generer_cartes')
     
     # Récupérer les membres
-    membres = Membre.objects.filter(id__in=ids_list).select_related('association')
+    membres = Membre.actifs.filter(id__in=ids_list).select_related('association')
     
     if not membres.exists():
         messages.error(request, 'Aucun membre trouvé avec ces identifiants.')
         return redirect('generer_cartes')
     
+    instrumentation.incrementer('impressions.demandees')
     # Créer les cartes si elles n'existent pas et les marquer comme imprimées
     cartes_crees = 0
+    membres = list(membres)
     for membre in membres:
         carte, created = CarteMembre.objects.get_or_create(
             membre=membre,
@@ -276,14 +337,166 @@ def print_cartes_multiples(request, membres_ids):
             carte.est_imprimee = True
             carte.date_impression = timezone.now()
             carte.save()
+        membre.qr_code = qr_code_carte(request, carte)
     
     context = {
         'membres': membres,
-        'total_cartes': membres.count(),
+        'total_cartes': len(membres),
         'cartes_crees': cartes_crees,
     }
     
-    return render(request, 'membres/print_cartes_multiples.html', context)
+    response = render(request, 'membres/print_cartes_multiples.html', context)
+    instrumentation.incrementer('impressions.terminees')
+    instrumentation.incrementer('impressions.cartes', len(membres))
+    return response
+
+
+def qr_code_carte(request, carte):
+    """
+    QR code SVG de la carte, encodant l'URL de sa page de vérification sur
+    URL_PUBLIQUE : le QR code est imprimé pour toujours, il ne doit pas
+    dépendre de l'hôte (proxy interne...) de la requête d'impression.
+    Sans URL_PUBLIQUE, l'hôte de la requête est utilisé (avertissement
+    membres.W001 au démarrage hors DEBUG).
+    """
+    chemin = reverse('verifier_carte', args=[jeton_carte(carte.numero_unique)])
+    base = getattr(settings, 'URL_PUBLIQUE', '')
+    if base:
+        return qr_code_svg(base + chemin)
+    return qr_code_svg(request.build_absolute_uri(chemin))
+
+
+def verifier_carte(request, jeton):
+    """
+    Vérification publique d'une carte scannée : page lisible par le personnel
+    à l'entrée, ou JSON avec ?format=json (lecteurs automatiques).
+    """
+    resultat = verifier_jeton(jeton)
+    if request.GET.get('format') == 'json':
+        response = JsonResponse(resultat)
+    else:
+        response = render(request, 'membres/verifier_carte.html', {'resultat': resultat})
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'VERIFICATION_DUREE', 60))
+    return response
+
+
+@admin_required
+def paquet_verification(request):
+    """
+    Paquet signé de vérification hors ligne (voir hors_ligne.py), complet ou
+    différentiel depuis la version ?depuis= déjà connue de l'appareil
+    """
+    try:
+        depuis = max(0, int(request.GET.get('depuis', 0)))
+    except ValueError:
+        depuis = 0
+    version = version_courante()
+    response = StreamingHttpResponse(generer_paquet(depuis, version), content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="verification-{depuis}-{version}.fzv"'
+    # Version à renvoyer dans ?depuis= pour le prochain paquet différentiel
+    response['X-Version-Paquet'] = str(version)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@admin_required
+@require_POST
+def pointages_evenement(request, evenement_id):
+    """
+    Réception d'un lot de scans (JSON) : {"scans": [{"id": uuid, "jeton": ..., "date": ..., "appareil": ...}]}.
+    Renvoyer un lot déjà reçu est sans effet (voir pointages.py).
+    """
+    try:
+        donnees = json.loads(request.body)
+        resultat = enregistrer_pointages(evenement_id, donnees.get('scans') if isinstance(donnees, dict) else None)
+    except (ValueError, LotInvalide) as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    if resultat is None:
+        raise Http404
+    return JsonResponse(resultat)
+
+
+@admin_required
+def presences_evenement(request, evenement_id):
+    """Compteurs de présence d'un événement (JSON)"""
+    evenement = get_object_or_404(Evenement, id=evenement_id)
+    return JsonResponse(statistiques_evenement(evenement))
+
+
+@admin_required
+def flux_changements(request):
+    """
+    Changements (membres, cartes, associations, bureau) postérieurs au curseur
+    ?depuis=, par pages de ?limite= : relancer avec le curseur renvoyé tant que
+    'suite' est vrai (voir journal.py)
+    """
+    try:
+        curseur = max(0, int(request.GET.get('depuis', 0)))
+        limite = int(request.GET.get('limite', LIMITE_CHANGEMENTS))
+    except ValueError:
+        return JsonResponse({'erreur': 'Paramètres depuis / limite invalides.'}, status=400)
+    response = JsonResponse(lire_changements(curseur, limite))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _reponse_api(request, donnees):
+    response = JsonResponse(donnees)
+    # Revalidation à chaque lecture : l'ETag (voir api.py) évite de renvoyer une page inchangée
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@condition(etag_func=etag_requete)
+def api_liste(request, ressource):
+    """API v1 : page d'une ressource (?fields=, ?apres=, ?limite=, filtres)"""
+    if ressource not in RESSOURCES:
+        raise Http404
+    try:
+        page = lire_page(ressource, request.GET, can_view_member_data(request.user))
+    except RequeteInvalide as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    except AccesRefuse as e:
+        return JsonResponse({'erreur': str(e)}, status=403)
+    if page['suivant'] is not None:
+        parametres = request.GET.copy()
+        parametres['apres'] = page['suivant']
+        page['suivant'] = request.build_absolute_uri(f'{request.path}?{parametres.urlencode()}')
+    return _reponse_api(request, page)
+
+
+@login_required
+@condition(etag_func=etag_requete)
+def api_detail(request, ressource, pk):
+    """API v1 : un objet d'une ressource (?fields=)"""
+    if ressource not in RESSOURCES:
+        raise Http404
+    try:
+        objet = lire_objet(ressource, pk, request.GET, can_view_member_data(request.user))
+    except RequeteInvalide as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    except AccesRefuse as e:
+        return JsonResponse({'erreur': str(e)}, status=403)
+    if objet is None:
+        raise Http404
+    return _reponse_api(request, objet)
+
+
+@admin_required
+def autocompletion_membres(request):
+    """Membres correspondant au début du nom, du prénom ou du N° de carte saisi (JSON)"""
+    try:
+        limite = int(request.GET.get('limite', LIMITE_DEFAUT))
+    except ValueError:
+        limite = LIMITE_DEFAUT
+    resultats = [
+        {'id': membre['id'], 'texte': libelle_membre(membre)}
+        for membre in rechercher_membres(request.GET.get('q', ''), limite)
+    ]
+    response = JsonResponse({'resultats': resultats})
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
 
 
 # ===============================
@@ -321,10 +534,8 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     """Vue du profil utilisateur"""
-    try:
-        membre = request.user.membre
-    except:
-        membre = None
+    membre_id = request.navigation['membre_id']
+    membre = Membre.actifs.select_related('association').filter(id=membre_id).first() if membre_id else None
     
     context = {
         'membre': membre,
@@ -357,10 +568,10 @@ def change_password_view(request):
 @login_required
 def modifier_mes_informations(request):
     """Permettre à un utilisateur de modifier ses propres informations de membre"""
-    try:
-        # Vérifier si l'utilisateur a un profil membre associé
-        membre = request.user.membre
-    except:
+    # Vérifier si l'utilisateur a un profil membre associé (connu de la navigation, sans requête)
+    membre_id = request.navigation['membre_id']
+    membre = Membre.actifs.filter(id=membre_id).first() if membre_id else None
+    if membre is None:
         messages.error(request, 'Aucun profil membre associé à votre compte.')
         return redirect('profile')
     
@@ -398,12 +609,10 @@ def modifier_mes_informations(request):
 # ================================
 
 @login_required
+@page_conditionnelle(etat_detail_fizato)
 def detail_fizato(request):
     """Page de détails de l'organisation FIZATO"""
-    try:
-        info_fizato = InfoFizato.objects.first()
-    except InfoFizato.DoesNotExist:
-        info_fizato = None
+    info_fizato = info_fizato_en_cache()
     
     # Récupérer les membres du bureau actuels
     membres_bureau = MembreBureau.objects.filter(est_actuel=True).order_by('fonction__niveau_hierarchique', 'membre__nom')
@@ -418,9 +627,10 @@ def detail_fizato(request):
     mandat_actuel = Mandat.objects.filter(est_actuel=True).first()
     
     # Compter les statistiques
-    total_associations = Association.objects.count()
-    total_membres = Membre.objects.count()
-    total_cartes = CarteMembre.objects.count()
+    statistiques = _statistiques_globales()
+    total_associations = statistiques['total_associations']
+    total_membres = statistiques['total_membres']
+    total_cartes = statistiques['total_cartes']
     
     context = {
         'info_fizato': info_fizato,
@@ -484,19 +694,11 @@ def terminer_mandat(request):
     mandat_actuel = Mandat.objects.filter(est_actuel=True).first()
     
     if request.method == 'POST':
-        if mandat_actuel:
-            # Archiver tous les membres du bureau actuel
-            MembreBureau.objects.filter(est_actuel=True).update(
-                est_actuel=False,
-                date_fin=timezone.now().date()
-            )
-            
-            # Marquer le mandat comme terminé
-            mandat_actuel.est_actuel = False
-            mandat_actuel.save()
-            
-            messages.success(request, f'Le mandat "{mandat_actuel.nom}" a été terminé et tous les membres ont été archivés.')
-        else:
+        try:
+            # Archiver les membres du bureau actuel et terminer le mandat
+            resultat = cloturer_mandat(archiver_doyens=False, creer_suivant=False)
+            messages.success(request, f'Le mandat "{resultat.mandat.nom}" a été terminé et tous les membres ont été archivés.')
+        except MandatDejaTermine:
             messages.warning(request, 'Aucun mandat actuel trouvé.')
         
         return redirect('detail_fizato')
@@ -520,51 +722,19 @@ def terminer_mandat_bureau(request):
     comite_doyen = ComiteDoyen.objects.filter(est_actif=True).select_related('membre', 'membre__association')
     
     if request.method == 'POST':
-        # Automatiser le processus complet
-        date_fin = timezone.now().date()
-        
-        # 1. Terminer le mandat actuel
-        mandat_actuel.est_actuel = False
-        mandat_actuel.date_fin = date_fin
-        mandat_actuel.motif_fin = "Fin de mandat - Transition automatique"
-        mandat_actuel.save()
-        
-        # 2. Archiver tous les membres du bureau actuel
-        nb_bureau_archives = 0
-        for membre_bureau in membres_bureau:
-            membre_bureau.est_actuel = False
-            membre_bureau.date_fin = date_fin
-            membre_bureau.mandat = mandat_actuel
-            membre_bureau.save()
-            nb_bureau_archives += 1
-        
-        # 3. Archiver tous les membres du comité des doyens
-        nb_doyen_archives = 0
-        for doyen in comite_doyen:
-            doyen.est_actif = False
-            doyen.date_fin = date_fin
-            doyen.mandat = mandat_actuel
-            doyen.save()
-            nb_doyen_archives += 1
-        
-        # 4. Créer automatiquement le nouveau mandat
-        from datetime import date
-        annee_actuelle = date_fin.year
-        nouveau_nom = f"{annee_actuelle + 1}-{annee_actuelle + 2}"
-        
-        nouveau_mandat = Mandat.objects.create(
-            nom=nouveau_nom,
-            description=f"Mandat automatiquement créé après la fin du mandat {mandat_actuel.nom}",
-            date_debut=date_fin,
-            est_actuel=True
-        )
+        # Automatiser le processus complet : clôture, archivage et nouveau mandat
+        try:
+            resultat = cloturer_mandat(mandat=mandat_actuel)
+        except MandatDejaTermine as e:
+            messages.error(request, str(e))
+            return redirect('detail_fizato')
         
         messages.success(
             request, 
-            f'✅ Mandat "{mandat_actuel.nom}" terminé et archivé.<br>'
-            f'📋 {nb_bureau_archives} membres du bureau archivés.<br>'
-            f'👥 {nb_doyen_archives} membres du comité des doyens archivés.<br>'
-            f'🆕 Nouveau mandat "{nouveau_mandat.nom}" créé et activé.<br>'
+            f'✅ Mandat "{resultat.mandat.nom}" terminé et archivé.<br>'
+            f'📋 {resultat.nb_bureau} membres du bureau archivés.<br>'
+            f'👥 {resultat.nb_doyens} membres du comité des doyens archivés.<br>'
+            f'🆕 Nouveau mandat "{resultat.nouveau_mandat.nom}" créé et activé.<br>'
             f'➡️ Vous pouvez maintenant constituer le nouveau bureau.'
         )
         return redirect('detail_fizato')
@@ -584,7 +754,8 @@ def creer_mandat(request):
         form = CreerMandatForm(request.POST)
         if form.is_valid():
             # Marquer tous les autres mandats comme non actuels
-            Mandat.objects.all().update(est_actuel=False)
+            journaliser_queryset(Mandat.objects.filter(est_actuel=True), MODIFICATION)
+            Mandat.objects.all().update(est_actuel=False, updated_at=timezone.now())
             
             # Créer le nouveau mandat (sans date de fin par défaut)
             mandat = form.save(commit=False)
@@ -602,6 +773,7 @@ def creer_mandat(request):
 
 
 @login_required
+@page_conditionnelle(etat_historique_fizato)
 def historique_fizato(request):
     """Afficher l'historique des mandats et des bureaux (tous les mandats)"""
     # Récupérer tous les mandats, triés par ordre chronologique
@@ -671,30 +843,17 @@ def historique_fizato(request):
 def vider_historique(request):
     """Vider tout l'historique (supprimer tous les mandats terminés et leurs données)"""
     if request.method == 'POST':
-        # Supprimer tous les mandats terminés et leurs relations
-        mandats_termines = Mandat.objects.filter(est_actuel=False)
-        count_mandats = mandats_termines.count()
-        
-        # Supprimer tous les MembreBureau et ComiteDoyen liés aux mandats terminés
-        count_bureau = MembreBureau.objects.filter(mandat__in=mandats_termines).count()
-        count_comite = ComiteDoyen.objects.filter(mandat__in=mandats_termines).count()
-        
-        # Supprimer aussi les MembreBureau et ComiteDoyen archivés sans mandat
-        count_bureau += MembreBureau.objects.filter(est_actuel=False, mandat__isnull=True).count()
-        count_comite += ComiteDoyen.objects.filter(est_actif=False, mandat__isnull=True).count()
+        # Supprimer tous les mandats terminés et leurs relations, par lots (en arrière-plan si l'historique est gros)
+        tache, rapport = lancer('purge.historique', taille=taille_historique(), cree_par=request.user)
         
-        # Effectuer les suppressions
-        MembreBureau.objects.filter(mandat__in=mandats_termines).delete()
-        ComiteDoyen.objects.filter(mandat__in=mandats_termines).delete()
-        MembreBureau.objects.filter(est_actuel=False, mandat__isnull=True).delete()
-        ComiteDoyen.objects.filter(est_actif=False, mandat__isnull=True).delete()
-        mandats_termines.delete()
-        
-        messages.success(
-            request, 
-            f'Historique vidé avec succès ! '
-            f'{count_mandats} mandat(s), {count_bureau} membre(s) du bureau et {count_comite} membre(s) du comité des doyens supprimés.'
-        )
+        if tache is None:
+            messages.success(
+                request, 
+                f'Historique vidé : {rapport["mandats"]} mandat(s), {rapport["bureau"]} membre(s) du bureau '
+                f'et {rapport["comite"]} membre(s) du comité des doyens supprimés.'
+            )
+        else:
+            messages.info(request, f'Le vidage de l\'historique est {message_mise_en_file(tache)}')
     
     return redirect('historique_fizato')
 
@@ -705,24 +864,15 @@ def supprimer_mandat_archive(request, mandat_id):
     if request.method == 'POST':
         try:
             mandat = get_object_or_404(Mandat, id=mandat_id, est_actuel=False)
-            
-            # Compter les éléments à supprimer
-            count_bureau = MembreBureau.objects.filter(mandat=mandat).count()
-            count_comite = ComiteDoyen.objects.filter(mandat=mandat).count()
-            
-            # Supprimer les données liées
-            MembreBureau.objects.filter(mandat=mandat).delete()
-            ComiteDoyen.objects.filter(mandat=mandat).delete()
-            
-            # Supprimer le mandat
             nom_mandat = mandat.nom
-            mandat.delete()
             
-            messages.success(
-                request, 
-                f'Archive "{nom_mandat}" supprimée avec succès ! '
-                f'{count_bureau} membre(s) du bureau et {count_comite} membre(s) du comité des doyens supprimés.'
-            )
+            # Supprimer les données liées puis le mandat (en arrière-plan si l'archive est grosse)
+            tache, rapport = lancer('purge.mandat', mandat.id, taille=taille_mandat(mandat.id), cree_par=request.user)
+            
+            if tache is None:
+                messages.success(request, f'Archive "{nom_mandat}" supprimée.')
+            else:
+                messages.info(request, f'La suppression de l\'archive "{nom_mandat}" est {message_mise_en_file(tache)}')
         except Exception as e:
             messages.error(request, f'Erreur lors de la suppression : {str(e)}')
     
@@ -765,10 +915,8 @@ def supprimer_comite_doyen(request, doyen_id):
 @admin_required
 def ajouter_info_fizato(request):
     """Ajouter ou modifier les informations de FIZATO"""
-    try:
-        info_fizato = InfoFizato.objects.first()
-    except InfoFizato.DoesNotExist:
-        info_fizato = None
+    # Lecture en base : le formulaire modifie l'instance, qui ne doit pas être celle du cache
+    info_fizato = InfoFizato.obtenir()
     
     if request.method == 'POST':
         form = InfoFizatoForm(request.POST, request.FILES, instance=info_fizato)
@@ -826,7 +974,8 @@ def ajouter_membre_bureau(request):
                     )
                     if anciens_presidents.exists():
                         # Désactiver l'ancien président
-                        anciens_presidents.update(est_actuel=False)
+                        journaliser_queryset(anciens_presidents, MODIFICATION)
+                        anciens_presidents.update(est_actuel=False, updated_at=timezone.now())
                         messages.info(request, f'L\'ancien président a été remplacé par {form.cleaned_data["membre"]}.')
                 else:
                     # Pour les autres fonctions, on peut avoir plusieurs personnes
@@ -871,3 +1020,133 @@ def detail_membre_bureau(request, membre_bureau_id):
     return render(request, 'membres/detail_membre_bureau.html', {
         'membre_bureau': membre_bureau
     })
+
+
+# ================================
+# SERVICE DES FICHIERS MÉDIA
+# ================================
+
+def servir_media(request, chemin):
+    """
+    Servir un fichier de MEDIA_ROOT avec en-têtes de cache, requêtes
+    conditionnelles (ETag / Last-Modified) et plages d'octets (Range).
+    Les photos des membres sont réservées aux utilisateurs connectés.
+    """
+    try:
+        chemin_complet = safe_join(settings.MEDIA_ROOT, chemin)
+    except SuspiciousFileOperation:
+        raise Http404
+    # Les contrôles portent sur le chemin résolu : « logos/../photos/x.jpg »
+    # ou « ./photos/x.jpg » désignent bien un fichier de photos/
+    chemin = os.path.relpath(chemin_complet, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+    try:
+        stat = os.stat(chemin_complet)
+    except OSError:
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+    
+    prive = any(chemin.startswith(dossier) for dossier in settings.MEDIA_DOSSIERS_PRIVES)
+    if prive and not request.user.is_authenticated:
+        return HttpResponseForbidden()
+    
+    etag = etag_fichier(stat)
+    en_tetes = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control(chemin, prive=prive),
+        'Accept-Ranges': 'bytes',
+    }
+    
+    # If-None-Match / If-Modified-Since : 304 sans relire le fichier
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        for nom, valeur in en_tetes.items():
+            response[nom] = valeur
+        return response
+    
+    content_type = mimetypes.guess_type(chemin_complet)[0] or 'application/octet-stream'
+    
+    # Envoi délégué au serveur web frontal
+    if settings.MEDIA_ENVOI_DELEGUE:
+        response = HttpResponse(content_type=content_type)
+        if settings.MEDIA_ENVOI_DELEGUE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = settings.MEDIA_X_ACCEL_PREFIXE + chemin
+        else:
+            response['X-Sendfile'] = chemin_complet
+    else:
+        plage = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range or if_range == etag:
+            try:
+                plage = analyser_plage(request.META.get('HTTP_RANGE'), stat.st_size)
+            except PlageInvalide:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+        
+        if plage:
+            debut, fin = plage
+            response = StreamingHttpResponse(lire_plage(chemin_complet, debut, fin), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {debut}-{fin}/{stat.st_size}'
+            response['Content-Length'] = fin - debut + 1
+            instrumentation.incrementer('medias.octets_servis', fin - debut + 1)
+        else:
+            response = FileResponse(open(chemin_complet, 'rb'), content_type=content_type)
+            instrumentation.incrementer('medias.octets_servis', stat.st_size)
+    
+    for nom, valeur in en_tetes.items():
+        response[nom] = valeur
+    return response
+
+
+def liste_profils(request):
+    """Administration : captures de profilage (voir profilage.py)"""
+    from django.contrib import admin
+
+    return render(request, 'admin/profils.html', {
+        **admin.site.each_context(request),
+        'title': 'Profils de requêtes',
+        'captures': profilage.captures(),
+        'actif': getattr(settings, 'PROFILAGE_ACTIF', False),
+    })
+
+
+def detail_profil(request, nom):
+    """Administration : fonctions les plus coûteuses d'une capture, ou le fichier .prof (?telecharger=1)"""
+    from django.contrib import admin
+
+    chemin = profilage.chemin_capture(nom)
+    if chemin is None:
+        raise Http404
+    if request.GET.get('telecharger'):
+        return FileResponse(open(chemin, 'rb'), as_attachment=True, filename=f'{nom}.prof')
+    capture = next((c for c in profilage.captures() if c['nom'] == nom), {'nom': nom})
+    return render(request, 'admin/profil_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'Profil {nom}',
+        'capture': capture,
+        'fonctions': profilage.fonctions_couteuses(nom),
+    })
+
+
+def _jeton_metriques_valide(request):
+    jeton = getattr(settings, 'METRIQUES_JETON', '')
+    if not jeton:
+        return False
+    autorisation = request.META.get('HTTP_AUTHORIZATION', '')
+    return hmac.compare_digest(autorisation.encode('utf-8'), f'Bearer {jeton}'.encode('utf-8'))
+
+
+def metriques_prometheus(request):
+    """
+    Métriques au format Prometheus : personnel connecté, jeton METRIQUES_JETON
+    (Authorization: Bearer) ou adresse de METRIQUES_IPS_AUTORISEES (vide par défaut)
+    """
+    adresse_autorisee = request.META.get('REMOTE_ADDR') in getattr(settings, 'METRIQUES_IPS_AUTORISEES', ())
+    if not (adresse_autorisee or _jeton_metriques_valide(request) or request.user.is_staff):
+        return HttpResponseForbidden('Accès réservé')
+    response = HttpResponse(metriques.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
+
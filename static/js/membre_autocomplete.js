@@ -0,0 +1,128 @@
+/* Autocomplétion des membres (membres.forms.MembreAutocompleteWidget) */
+(function () {
+    'use strict';
+
+    var DELAI = 200;
+    var LONGUEUR_MINIMALE = 2;
+
+    function initialiser(bloc) {
+        if (bloc.dataset.initialise) {
+            return;
+        }
+        bloc.dataset.initialise = '1';
+
+        var valeur = bloc.querySelector('[data-role="valeur"]');
+        var saisie = bloc.querySelector('[data-role="saisie"]');
+        var resultats = bloc.querySelector('[data-role="resultats"]');
+        var minuterie = null;
+        var requete = null;
+        var actif = -1;
+
+        function fermer() {
+            resultats.classList.add('d-none');
+            resultats.innerHTML = '';
+            actif = -1;
+        }
+
+        function choisir(element) {
+            valeur.value = element.dataset.id;
+            saisie.value = element.textContent;
+            saisie.setCustomValidity('');
+            fermer();
+        }
+
+        function afficher(liste) {
+            resultats.innerHTML = '';
+            actif = -1;
+            if (!liste.length) {
+                var vide = document.createElement('div');
+                vide.className = 'list-group-item text-muted small';
+                vide.textContent = 'Aucun membre trouvé';
+                resultats.appendChild(vide);
+            }
+            liste.forEach(function (membre) {
+                var element = document.createElement('button');
+                element.type = 'button';
+                element.className = 'list-group-item list-group-item-action';
+                element.dataset.id = membre.id;
+                element.textContent = membre.texte;
+                element.addEventListener('mousedown', function (evenement) {
+                    evenement.preventDefault();
+                    choisir(element);
+                });
+                resultats.appendChild(element);
+            });
+            resultats.classList.remove('d-none');
+        }
+
+        function rechercher() {
+            var texte = saisie.value.trim();
+            if (texte.length < LONGUEUR_MINIMALE) {
+                fermer();
+                return;
+            }
+            if (requete) {
+                requete.abort();
+            }
+            requete = new AbortController();
+            var url = bloc.dataset.url + '?q=' + encodeURIComponent(texte);
+            fetch(url, {signal: requete.signal, headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+                .then(function (reponse) { return reponse.json(); })
+                .then(function (donnees) { afficher(donnees.resultats); })
+                .catch(function () {});
+        }
+
+        function surligner(index) {
+            var elements = resultats.querySelectorAll('[data-id]');
+            if (!elements.length) {
+                return;
+            }
+            actif = (index + elements.length) % elements.length;
+            elements.forEach(function (element, i) {
+                element.classList.toggle('active', i === actif);
+            });
+            elements[actif].scrollIntoView({block: 'nearest'});
+        }
+
+        saisie.addEventListener('input', function () {
+            // Le texte ne correspond plus au membre choisi
+            valeur.value = '';
+            clearTimeout(minuterie);
+            minuterie = setTimeout(rechercher, DELAI);
+        });
+        saisie.addEventListener('keydown', function (evenement) {
+            if (evenement.key === 'ArrowDown') {
+                evenement.preventDefault();
+                surligner(actif + 1);
+            } else if (evenement.key === 'ArrowUp') {
+                evenement.preventDefault();
+                surligner(actif - 1);
+            } else if (evenement.key === 'Enter' && actif >= 0) {
+                evenement.preventDefault();
+                choisir(resultats.querySelectorAll('[data-id]')[actif]);
+            } else if (evenement.key === 'Escape') {
+                fermer();
+            }
+        });
+        saisie.addEventListener('blur', fermer);
+        if (saisie.form) {
+            saisie.form.addEventListener('submit', function (evenement) {
+                if (saisie.required && !valeur.value) {
+                    saisie.setCustomValidity('Choisissez un membre dans la liste.');
+                    saisie.reportValidity();
+                    evenement.preventDefault();
+                }
+            });
+        }
+    }
+
+    function initialiserTout() {
+        document.querySelectorAll('.membre-autocomplete').forEach(initialiser);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', initialiserTout);
+    } else {
+        initialiserTout();
+    }
+})();